@@ -0,0 +1,323 @@
+"""
+Delegator v5.2.1 バッチ実行CLI
+マニフェストに列挙した複数自治体のデータセットをプロセスプールで並列に読み込み・最適化し、
+完了したものから順にスケジュール（CSV/Parquet/JSON Lines、既定はCSV）と結果サマリー（JSON Lines）を書き出す
+
+- Streamlitを読み込まないヘッドレス実行（cron・ジョブスケジューラー向け）
+- スケジュールは子プロセスで一時ファイルに書き出してから配置し、親へはサマリーのみを返す
+- 終了コード: 0=全件成功、1=一部のデータセットが失敗、2=マニフェスト・引数の誤り、130=中断
+- 進捗は1データセット1行で標準出力へ（失敗の詳細は標準エラー出力）
+
+マニフェスト（JSON）:
+    {
+      "defaults": {"strategy": "greedy_priority", "end_year": 2040},
+      "datasets": [
+        {"name": "city_a", "equipment_csv": "a/equipment.csv", "inspection_csv": "a/inspection.csv",
+         "budget": 50000000, "capacity": 200},
+        ...
+      ]
+    }
+CSVのマニフェストは1行1データセットで同じ列名（options以外）。相対パスはマニフェストの場所から解決する。
+
+使用例:
+    python batch_v5_2_1.py manifest.json --output-dir out --workers 4
+    python batch_v5_2_1.py manifest.csv --output-dir out --format parquet --fail-fast  # pyarrowが必要
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from delegator_v5_2_1 import (
+    BASE_YEAR,
+    SOLVER_STRATEGIES,
+    OptSeqSchedulerScalable,
+    Resource,
+    peak_rss_mb
+)
+
+# 終了コード
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+# 出力形式と拡張子
+FORMATS = {'parquet': '.parquet', 'csv': '.csv', 'json': '.jsonl'}
+
+# スケジュールの書き出し単位（行数）
+WRITE_CHUNK_ROWS = 100000
+
+# データセットの既定値（max_equipmentは実質無制限）
+DATASET_DEFAULTS = {
+    'start_year': BASE_YEAR,
+    'end_year': 2040,
+    'max_equipment': 10 ** 8,
+    'strategy': 'greedy_priority',
+    'budget': None,
+    'capacity': None,
+    'seed': None,
+    'options': None
+}
+REQUIRED_FIELDS = ('name', 'equipment_csv', 'inspection_csv')
+INTEGER_FIELDS = ('start_year', 'end_year', 'max_equipment', 'seed')
+NUMBER_FIELDS = ('budget', 'capacity')
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and value != value) or value == ''
+
+
+def load_manifest(path: str, defaults: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """マニフェスト（JSON/CSV）を読み込み、既定値を補完・検証したデータセット一覧を返す（誤りはValueError）"""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    if path.lower().endswith('.csv'):
+        manifest_defaults = {}
+        entries = pd.read_csv(path, dtype=str, keep_default_na=False).to_dict('records')
+    else:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if isinstance(manifest, list):
+            manifest = {'datasets': manifest}
+        if not isinstance(manifest, dict) or not isinstance(manifest.get('datasets'), list):
+            raise ValueError(f"{path}: expected a list of datasets or an object with a 'datasets' list")
+        manifest_defaults = manifest.get('defaults', {})
+        entries = manifest['datasets']
+    
+    datasets, names = [], set()
+    for position, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"{path}: dataset #{position} is not an object")
+        entry = {key: value for key, value in entry.items() if not _is_missing(value)}
+        dataset = {**DATASET_DEFAULTS, **manifest_defaults, **(defaults or {}), **entry}
+        label = dataset.get('name', f"#{position}")
+        
+        unknown = set(dataset) - set(DATASET_DEFAULTS) - set(REQUIRED_FIELDS)
+        if unknown:
+            raise ValueError(f"{path}: dataset {label} has unknown fields {sorted(unknown)}")
+        missing = [field for field in REQUIRED_FIELDS if _is_missing(dataset.get(field))]
+        if missing:
+            raise ValueError(f"{path}: dataset {label} is missing {missing}")
+        
+        dataset['name'] = str(dataset['name'])
+        if dataset['name'] in names:
+            raise ValueError(f"{path}: duplicate dataset name {dataset['name']!r}")
+        if os.sep in dataset['name'] or (os.altsep and os.altsep in dataset['name']):
+            raise ValueError(f"{path}: dataset name {dataset['name']!r} must not contain path separators")
+        names.add(dataset['name'])
+        
+        try:
+            for field in INTEGER_FIELDS:
+                if dataset[field] is not None:
+                    dataset[field] = int(dataset[field])
+            for field in NUMBER_FIELDS:
+                if dataset[field] is not None:
+                    dataset[field] = float(dataset[field])
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{path}: dataset {label} has an invalid number: {e}") from None
+        if dataset['options'] is not None and not isinstance(dataset['options'], dict):
+            raise ValueError(f"{path}: dataset {label} options must be an object")
+        if dataset['strategy'] not in SOLVER_STRATEGIES:
+            raise ValueError(f"{path}: dataset {label} uses unknown strategy {dataset['strategy']!r}")
+        
+        for field in ('equipment_csv', 'inspection_csv'):
+            dataset[field] = os.path.join(base_dir, dataset[field])
+        datasets.append(dataset)
+    
+    if not datasets:
+        raise ValueError(f"{path}: no datasets")
+    return datasets
+
+
+def schedule_path(output_dir: str, name: str, fmt: str) -> str:
+    return os.path.join(output_dir, f"{name}_schedule{FORMATS[fmt]}")
+
+
+def write_schedule(frame: pd.DataFrame, path: str, fmt: str) -> None:
+    """スケジュール表をWRITE_CHUNK_ROWS行ずつ一時ファイルへ書き出し、完了後に置き換える"""
+    partial = f"{path}.partial"
+    try:
+        if fmt == 'parquet':
+            pyarrow = importlib.import_module('pyarrow')
+            parquet = importlib.import_module('pyarrow.parquet')
+            schema = pyarrow.Schema.from_pandas(frame, preserve_index=False)
+            with parquet.ParquetWriter(partial, schema) as writer:
+                for start in range(0, len(frame), WRITE_CHUNK_ROWS):
+                    chunk = frame.iloc[start:start + WRITE_CHUNK_ROWS]
+                    writer.write_table(pyarrow.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        elif fmt == 'csv':
+            frame.to_csv(partial, index=False, encoding='utf-8', chunksize=WRITE_CHUNK_ROWS)
+        else:
+            with open(partial, 'w', encoding='utf-8') as f:
+                for start in range(0, len(frame), WRITE_CHUNK_ROWS):
+                    chunk = frame.iloc[start:start + WRITE_CHUNK_ROWS]
+                    f.write(chunk.to_json(orient='records', lines=True, force_ascii=False))
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+
+def run_dataset(dataset: Dict[str, Any], output_dir: str, fmt: str, cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """1データセットを読み込み・最適化してスケジュールを書き出し、サマリーを返す（子プロセスで実行）"""
+    timings = {}
+    start = time.perf_counter()
+    scheduler = OptSeqSchedulerScalable(dataset['start_year'], dataset['end_year'],
+                                        max_equipment=dataset['max_equipment'])
+    scheduler.load_equipment_data(dataset['equipment_csv'], dataset['inspection_csv'],
+                                  cache_dir=cache_dir, seed=dataset['seed'])
+    timings['load'] = time.perf_counter() - start
+    
+    years = range(dataset['start_year'], dataset['end_year'] + 1)
+    if dataset['budget'] is not None:
+        scheduler.add_resource(Resource(name="Budget", capacity_per_year={year: dataset['budget'] for year in years},
+                                        demand='cost'))
+    if dataset['capacity'] is not None:
+        scheduler.add_resource(Resource(name="Crew", capacity_per_year={year: dataset['capacity'] for year in years},
+                                        demand='count'))
+    
+    start = time.perf_counter()
+    result = scheduler.solve_parallel(dataset['strategy'], **(dataset['options'] or {}))
+    timings['solve'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    path = schedule_path(output_dir, dataset['name'], fmt)
+    write_schedule(scheduler.schedule_frame(result), path, fmt)
+    timings['write'] = time.perf_counter() - start
+    
+    statistics = result['statistics']
+    return {
+        'name': dataset['name'],
+        'status': 'ok',
+        'output': path,
+        'equipment': len(scheduler.equipment),
+        'statistics': {
+            key: statistics[key]
+            for key in ('strategy', 'scheduled_tasks', 'total_tasks', 'scheduling_ratio', 'total_cost', 'total_penalty')
+        },
+        'timings': timings,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+# ログ形式（子プロセスの出力も同じ標準エラー出力へ）
+LOG_FORMAT = '%(asctime)s %(processName)s %(levelname)s %(name)s: %(message)s'
+
+
+def _init_worker(log_level: int) -> None:
+    logging.basicConfig(level=log_level, format=LOG_FORMAT)
+
+
+def run_batch(datasets: List[Dict[str, Any]], output_dir: str, fmt: str = 'csv', workers: Optional[int] = None,
+              cache_dir: Optional[str] = None, fail_fast: bool = False, log_level: int = logging.WARNING,
+              progress=print) -> List[Dict[str, Any]]:
+    """データセットをプロセスプールで並列に処理し、完了順にサマリーをresults.jsonlへ追記
+    
+    失敗したデータセットはstatus='failed'として記録し、fail_fast時は未着手のものを取り消す（status='cancelled'）。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(datasets)))
+    summaries: List[Dict[str, Any]] = []
+    
+    with open(os.path.join(output_dir, 'results.jsonl'), 'w', encoding='utf-8') as log, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(log_level,)) as pool:
+        start = time.perf_counter()
+        pending = {pool.submit(run_dataset, dataset, output_dir, fmt, cache_dir): dataset for dataset in datasets}
+        
+        def record(summary: Dict[str, Any]) -> None:
+            summaries.append(summary)
+            log.write(json.dumps(summary, ensure_ascii=False) + '\n')
+            log.flush()
+            progress(_progress_line(summary, len(summaries), len(datasets), time.perf_counter() - start))
+        
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                dataset = pending.pop(future)
+                if future.cancelled():
+                    record({'name': dataset['name'], 'status': 'cancelled'})
+                    continue
+                error = future.exception()
+                if error is None:
+                    record(future.result())
+                    continue
+                record({'name': dataset['name'], 'status': 'failed', 'error': f"{type(error).__name__}: {error}"})
+                print(''.join(traceback.format_exception(type(error), error, error.__traceback__)), file=sys.stderr)
+                if fail_fast or isinstance(error, BrokenProcessPool):
+                    for other in list(pending):
+                        if other.cancel():
+                            record({'name': pending.pop(other)['name'], 'status': 'cancelled'})
+    return summaries
+
+
+def _progress_line(summary: Dict[str, Any], completed: int, total: int, elapsed: float) -> str:
+    prefix = f"[{completed}/{total} {elapsed:7.1f}s] {summary['name']}"
+    if summary['status'] != 'ok':
+        return f"{prefix}: {summary['status']}" + (f" ({summary['error']})" if 'error' in summary else '')
+    statistics, timings = summary['statistics'], summary['timings']
+    return (f"{prefix}: ok {statistics['scheduled_tasks']}/{statistics['total_tasks']} tasks "
+            f"({statistics['scheduling_ratio']:.1%}), penalty {statistics['total_penalty']:,.0f}, "
+            f"load {timings['load']:.1f}s solve {timings['solve']:.1f}s write {timings['write']:.1f}s "
+            f"-> {summary['output']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Delegator v5.2.1 バッチ実行（複数データセットの並列最適化）')
+    parser.add_argument('manifest', help='データセット一覧（JSON/CSV）')
+    parser.add_argument('--output-dir', default='batch_output', help='スケジュール・results.jsonl の出力先')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='csv',
+                        help='スケジュールの出力形式（parquetはpyarrowが必要）')
+    parser.add_argument('--workers', type=int, default=None, help='並列プロセス数（省略時はCPU数）')
+    parser.add_argument('--strategy', default=None, help='全データセットの最適化戦略を上書き')
+    parser.add_argument('--cache-dir', default=None, help='構築済みフリートのキャッシュ先（読み込みの再利用）')
+    parser.add_argument('--fail-fast', action='store_true', help='失敗したら未着手のデータセットを取り消す')
+    parser.add_argument('--quiet', action='store_true', help='進捗を表示しない')
+    parser.add_argument('--log-level', default='WARNING', help='ログレベル（子プロセスを含む）')
+    args = parser.parse_args(argv)
+    
+    log_level = logging.getLevelName(args.log_level.upper())
+    if not isinstance(log_level, int):
+        parser.error(f"unknown log level {args.log_level!r}")
+    logging.basicConfig(level=log_level, format=LOG_FORMAT)
+    
+    try:
+        datasets = load_manifest(args.manifest, defaults={'strategy': args.strategy} if args.strategy else None)
+        if args.format == 'parquet':
+            importlib.import_module('pyarrow.parquet')
+    except ImportError:
+        print("error: --format parquet requires pyarrow (pip install pyarrow)", file=sys.stderr)
+        return EXIT_USAGE
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    
+    progress = (lambda line: None) if args.quiet else (lambda line: print(line, flush=True))
+    progress(f"Delegator v5.2.1 batch: {len(datasets)} datasets -> {args.output_dir} ({args.format}), "
+             f"started {datetime.now().isoformat(timespec='seconds')}")
+    try:
+        summaries = run_batch(datasets, args.output_dir, fmt=args.format, workers=args.workers,
+                              cache_dir=args.cache_dir, fail_fast=args.fail_fast, log_level=log_level,
+                              progress=progress)
+    except KeyboardInterrupt:
+        print("interrupted", file=sys.stderr)
+        return EXIT_INTERRUPTED
+    
+    failed = [summary['name'] for summary in summaries if summary['status'] != 'ok']
+    progress(f"finished: {len(summaries) - len(failed)} ok, {len(failed)} failed or cancelled")
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""
+Delegator v5.2.1 ベンチマークスイート
+決定的な合成フリート（公園・点検CSV）を1k/10k/100k/1M遊具で生成し、
+読み込み・劣化計算・最適化・出力の各フェーズを繰り返し計測してJSONに記録する
+
+- 規模ごとに別プロセスで計測し、ピークRSSを規模単位で記録
+- 各フェーズの実行時間はパーセンタイル（p50/p90/p95）・最小・最大・平均で集計
+- モジュール読み込み・スケジューラー初期化の時間を新しいインタープリターで計測（遅延読み込みの回帰検出）
+- --compare で過去のJSONとp50を比較し、閾値を超える悪化があれば終了コード1
+
+使用例:
+    python benchmark_v5_2_1.py --sizes 1000 10000 --repeats 5 --output bench.json
+    python benchmark_v5_2_1.py --sizes 1000 10000 --compare bench_v5_2_0.json
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from delegator_v5_2_1 import (
+    BASE_YEAR,
+    EQUIPMENT_TYPE_COLUMNS,
+    GRADES,
+    MULTI_INSTANCE_TYPES,
+    OptSeqSchedulerScalable,
+    _expand_equipment_frame,
+    peak_rss_mb
+)
+
+# 既定の計測規模（遊具数）
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+
+# 合成データの保存先
+DEFAULT_DATA_DIR = 'benchmark_data'
+
+# 計測フェーズ
+PHASES = ('load', 'degradation', 'solve', 'export')
+
+# 集計するパーセンタイル
+PERCENTILES = (50, 90, 95)
+
+# 新しいインタープリターでの読み込み・初期化時間の計測スクリプト（遅延読み込みの効果を記録）
+IMPORT_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import delegator_v5_2_1
+imported = time.perf_counter()
+delegator_v5_2_1.OptSeqSchedulerScalable()
+initialized = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'init': initialized - imported,
+    'modules': [name for name in HEAVY_MODULES if name in sys.modules]
+}))
+'''
+HEAVY_MODULES = ('numpy', 'pandas', 'multiprocessing', 'concurrent.futures', 'joblib', 'pulp')
+
+# 公園あたりの単一設置遊具の設置確率（EQUIPMENT_TYPE_COLUMNSのベンチ以外の順）と、ベンチ数の平均
+SINGLE_TYPE_PROBABILITY = (0.7, 0.6, 0.3, 0.5)
+BENCH_MEAN = 1.5
+
+
+def synthetic_paths(n_assets: int, data_dir: str = DEFAULT_DATA_DIR) -> Tuple[str, str]:
+    """合成データの(設備CSV, 点検CSV)のパス"""
+    return (os.path.join(data_dir, f'input_park_playequipment_{n_assets}.csv'),
+            os.path.join(data_dir, f'inspectionList_parkEquipment_{n_assets}.csv'))
+
+
+def generate_synthetic_fleet(n_assets: int, data_dir: str = DEFAULT_DATA_DIR, seed: int = 0,
+                             history: int = 2, overwrite: bool = False) -> Tuple[str, str]:
+    """n_assets遊具の公園・点検CSVを生成（同じseed・規模なら同一内容）
+    
+    公園ごとの遊具構成と設置年を乱数で決め、スケジューラーと同じ展開規則で遊具IDを付与する。
+    最後の公園は展開順の末尾の遊具を減らし、設備CSVの遊具数をn_assetsちょうどにする。
+    点検履歴は遊具あたりhistory件（古い点検ほど判定が良い）で、最新判定は築年数に応じて悪化する。
+    """
+    equipment_csv, inspection_csv = synthetic_paths(n_assets, data_dir)
+    if not overwrite and os.path.exists(equipment_csv) and os.path.exists(inspection_csv):
+        return equipment_csv, inspection_csv
+    
+    os.makedirs(data_dir, exist_ok=True)
+    rng = np.random.default_rng([seed, n_assets])
+    single_types = [t for t in EQUIPMENT_TYPE_COLUMNS if t not in MULTI_INSTANCE_TYPES]
+    multi_types = [t for t in EQUIPMENT_TYPE_COLUMNS if t in MULTI_INSTANCE_TYPES]
+    
+    # 公園の遊具構成（遊具数がn_assetsに達するまで公園を追加）
+    n_parks = n_assets // 3 + 10
+    while True:
+        singles = rng.random((n_parks, len(single_types))) < np.array(SINGLE_TYPE_PROBABILITY)
+        benches = rng.poisson(BENCH_MEAN, (n_parks, len(multi_types)))
+        per_park = singles.sum(axis=1) + benches.sum(axis=1)
+        if per_park.sum() >= n_assets:
+            break
+        n_parks *= 2
+    n_parks = int(np.searchsorted(np.cumsum(per_park), n_assets)) + 1
+    
+    equipment_df = pd.DataFrame({
+        '公園番号': np.arange(1, n_parks + 1),
+        '公園名': [f'合成公園{i:07d}' for i in range(1, n_parks + 1)],
+        '西暦年': rng.integers(1965, 2021, n_parks)
+    })
+    for j, eq_type in enumerate(single_types):
+        equipment_df[eq_type] = singles[:n_parks, j].astype(int)
+    for j, eq_type in enumerate(multi_types):
+        equipment_df[eq_type] = benches[:n_parks, j]
+    
+    # 最後の公園の超過分を展開順（タイプ列の順）の末尾から減らす
+    excess = int(per_park[:n_parks].sum()) - n_assets
+    for eq_type in reversed(EQUIPMENT_TYPE_COLUMNS):
+        removed = min(int(equipment_df.at[n_parks - 1, eq_type]), excess)
+        equipment_df.at[n_parks - 1, eq_type] -= removed
+        excess -= removed
+    equipment_df.to_csv(equipment_csv, index=False)
+    
+    # 点検履歴（遊具×history件）
+    fleet = _expand_equipment_frame(equipment_df, n_assets)
+    n = len(fleet)
+    ages = BASE_YEAR - fleet['install_year'].to_numpy()
+    latest = np.clip(np.round(ages / 15 + rng.normal(0, 0.8, n)), 0, len(GRADES) - 1).astype(int)
+    last_year = rng.integers(BASE_YEAR - 2, BASE_YEAR, n)
+    last_month = rng.integers(1, 13, n)
+    
+    k = np.repeat(np.arange(history), n)  # 0が最新
+    rows = np.tile(np.arange(n), history)
+    grades = np.maximum(latest[rows] - k, 0)
+    years = last_year[rows] - 2 * k
+    park_numbers = fleet['park_name'].map(dict(zip(equipment_df['公園名'], equipment_df['公園番号']))).to_numpy()
+    inspection_df = pd.DataFrame({
+        'equipment_id': fleet['equipment_id'].to_numpy()[rows],
+        '公園番号': park_numbers[rows],
+        '公園名': fleet['park_name'].to_numpy()[rows],
+        '遊具種類': fleet['equipment_type'].to_numpy()[rows],
+        '劣化判定': np.array(GRADES)[grades],
+        '点検年月': pd.Series(years).astype(str).str.cat(pd.Series(last_month[rows]).astype(str).str.zfill(2), sep='-'),
+        '設置年': fleet['install_year'].to_numpy()[rows]
+    })
+    inspection_df.to_csv(inspection_csv, index=False)
+    return equipment_csv, inspection_csv
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """実行時間の集計（秒）"""
+    values = np.asarray(samples, dtype=float)
+    summary = {f'p{q}': float(np.percentile(values, q)) for q in PERCENTILES}
+    summary.update({
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'mean': float(values.mean()),
+        'runs': [float(v) for v in values]
+    })
+    return summary
+
+
+def measure_size(equipment_csv: str, inspection_csv: str, n_assets: int, repeats: int = 3,
+                 strategy: str = 'greedy_priority', end_year: int = 2040) -> Dict[str, Any]:
+    """1規模の各フェーズをrepeats回ずつ計測（最後の読み込み以降のスケジューラー内部のフェーズ別計測も記録）"""
+    timings: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+    scheduler = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        scheduler = OptSeqSchedulerScalable(BASE_YEAR, end_year, max_equipment=n_assets)
+        scheduler.enable_profiling()
+        scheduler.load_equipment_data(equipment_csv, inspection_csv, seed=0)
+        timings['load'].append(time.perf_counter() - start)
+    
+    rows = scheduler.fleet.rows
+    for _ in range(repeats):
+        start = time.perf_counter()
+        scheduler.degradation_engine.scores(rows['install_year'], rows['inspection_grade'])
+        timings['degradation'].append(time.perf_counter() - start)
+    
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = scheduler.solve_parallel(strategy)
+        timings['solve'].append(time.perf_counter() - start)
+    
+    for _ in range(repeats):
+        start = time.perf_counter()
+        gantt = scheduler.export_gantt_data(result)
+        pd.DataFrame(gantt).to_csv(os.devnull, index=False)
+        timings['export'].append(time.perf_counter() - start)
+    
+    statistics = result['statistics']
+    return {
+        'equipment': len(scheduler.equipment),
+        'tasks': len(scheduler.tasks),
+        'phases': {phase: summarize(samples) for phase, samples in timings.items()},
+        'breakdown': scheduler.profiler.report(),
+        'peak_rss_mb': peak_rss_mb(),
+        'scheduled_ratio': statistics['scheduling_ratio'],
+        'total_penalty': statistics['total_penalty']
+    }
+
+
+def _measure_in_child(args) -> Dict[str, Any]:
+    import logging
+    logging.disable(logging.INFO)
+    return measure_size(*args)
+
+
+def measure_import(repeats: int = 5) -> Dict[str, Any]:
+    """新しいインタープリターでのモジュール読み込み・スケジューラー初期化時間と、読み込み直後の重いモジュール"""
+    script = f"HEAVY_MODULES = {HEAVY_MODULES!r}\n" + IMPORT_PROBE
+    samples: Dict[str, List[float]] = {'import': [], 'init': []}
+    modules: List[str] = []
+    for _ in range(repeats):
+        completed = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+        measured = json.loads(completed.stdout.splitlines()[-1])
+        samples['import'].append(measured['import'])
+        samples['init'].append(measured['init'])
+        modules = measured['modules']
+    return {**{phase: summarize(values) for phase, values in samples.items()}, 'modules': modules}
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, repeats: int = 3, strategy: str = 'greedy_priority',
+                  data_dir: str = DEFAULT_DATA_DIR, seed: int = 0, end_year: int = 2040) -> Dict[str, Any]:
+    """規模ごとに合成データを用意し、別プロセスで計測した結果をまとめる"""
+    report = {
+        'version': 'v5.2.1',
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'system': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__
+        },
+        'config': {'repeats': repeats, 'strategy': strategy, 'seed': seed, 'end_year': end_year},
+        'results': {}
+    }
+    
+    report['import'] = measure_import(max(repeats, 5))
+    print(f"📥 import p50 {report['import']['import']['p50']:.3f}s, init p50 {report['import']['init']['p50'] * 1000:.2f}ms"
+          f" (読み込み済み: {', '.join(report['import']['modules']) or 'なし'})")
+    
+    context = mp.get_context('spawn')  # 規模ごとのピークRSSを分離
+    for n_assets in sizes:
+        print(f"📦 {n_assets:,}遊具: 合成データ準備中...")
+        start = time.perf_counter()
+        paths = generate_synthetic_fleet(n_assets, data_dir=data_dir, seed=seed)
+        print(f"   └ 準備完了: {time.perf_counter() - start:.2f}秒")
+        
+        with context.Pool(1) as pool:
+            measured = pool.apply(_measure_in_child, ((*paths, n_assets, repeats, strategy, end_year),))
+        report['results'][str(n_assets)] = measured
+        phases = measured['phases']
+        print("   └ " + ", ".join(f"{phase} p50 {phases[phase]['p50']:.3f}s" for phase in PHASES) +
+              f", peak RSS {measured['peak_rss_mb']:.0f}MB")
+    return report
+
+
+def compare_reports(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.2,
+                    min_seconds: float = 0.01) -> List[Dict[str, Any]]:
+    """両方に含まれる規模・フェーズのp50を比較し、threshold（比率）を超える悪化を返す
+    
+    min_seconds未満の差は計測誤差として無視する。ピークRSSも同じ閾値で比較する。
+    """
+    regressions = []
+    if 'import' in current and 'import' in baseline:
+        now, before = current['import']['import']['p50'], baseline['import']['import']['p50']
+        if now - before > min_seconds and now > before * (1 + threshold):
+            regressions.append({'size': None, 'metric': 'import.p50', 'baseline': before, 'current': now})
+    for size, result in current['results'].items():
+        base = baseline.get('results', {}).get(size)
+        if base is None:
+            continue
+        for phase in PHASES:
+            if phase not in base.get('phases', {}):
+                continue
+            now, before = result['phases'][phase]['p50'], base['phases'][phase]['p50']
+            if now - before > min_seconds and now > before * (1 + threshold):
+                regressions.append({'size': size, 'metric': f'{phase}.p50', 'baseline': before, 'current': now})
+        if 'peak_rss_mb' in base and result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + threshold):
+            regressions.append({'size': size, 'metric': 'peak_rss_mb',
+                                'baseline': base['peak_rss_mb'], 'current': result['peak_rss_mb']})
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Delegator v5.2.1 ベンチマーク（合成フリート）')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='遊具数（複数指定可）')
+    parser.add_argument('--repeats', type=int, default=3, help='フェーズごとの繰り返し回数')
+    parser.add_argument('--strategy', default='greedy_priority', help='最適化戦略')
+    parser.add_argument('--end-year', type=int, default=2040, help='計画終了年')
+    parser.add_argument('--seed', type=int, default=0, help='合成データの乱数シード')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='合成データの保存先')
+    parser.add_argument('--output', default=None, help='結果JSON（省略時は日時付きファイル名）')
+    parser.add_argument('--compare', default=None, help='比較する過去の結果JSON')
+    parser.add_argument('--threshold', type=float, default=0.2, help='悪化と判定する比率')
+    args = parser.parse_args(argv)
+    
+    print("🚀 Delegator v5.2.1 ベンチマーク開始")
+    report = run_benchmark(args.sizes, repeats=args.repeats, strategy=args.strategy,
+                           data_dir=args.data_dir, seed=args.seed, end_year=args.end_year)
+    
+    output = args.output or f"delegator_v5_2_1_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"📁 結果保存: {output}")
+    
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, threshold=args.threshold)
+        for item in regressions:
+            scope = f"{item['size']}遊具 " if item['size'] else ''
+            print(f"⚠️ 性能低下: {scope}{item['metric']} "
+                  f"{item['baseline']:.3f} → {item['current']:.3f}")
+        if regressions:
+            return 1
+        print(f"✅ 性能低下なし（閾値{args.threshold:.0%}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""
+Delegator v5.2.1: 地区分割スケジューリング（共有資源の配分調整つき）
+タスクを公園・地区単位の部分問題に分割して並列に解き、全体で共有する年度別資源（予算・施工件数など）は
+マスター側で地区ごとの配分を反復調整する（資源配分型の分解法）
+
+1. 各共有資源の年度別容量を、地区の需要（その年度に実施可能なタスクの消費量×年あたり遅延ペナルティ）の比で配分する
+2. 地区の部分問題を配分容量で並列に解き、地区の遅延ペナルティが改善した解のみ採用する
+3. 各地区は使用量を保持し、未使用分を回収して、待機圧力の密度が大きい地区から順に待機タスクの消費量まで
+   再配分する。待機タスクを配置できる容量を受け取った地区のみ2で解き直す
+4. 容量を受け取る地区がなくなるか反復回数に達したら終了する
+
+配分の合計は常に全体容量以下のため、各反復の解はそのまま全体でも実行可能。全体の貪欲解（warm_start）と
+全体容量での仕上げ（final_polish）はいずれも全タスクを走査するため既定では行わない。
+
+Author: CWD Agent
+Version: v5.2.1
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from delegator_v5_2_1 import (
+    SOLVER_STRATEGIES,
+    SchedulingProblem,
+    SolverEngine,
+    YearSlotIndex,
+    greedy_first_fit
+)
+from delegator_scenarios_v5_2_1 import SharedProblem
+
+logger = logging.getLogger(__name__)
+
+# 1ワーカーあたりのジョブ数（地区をタスク数で均してジョブにまとめる）
+JOBS_PER_WORKER = 4
+
+
+def subproblem(problem: SchedulingProblem, tasks: np.ndarray, capacity: np.ndarray) -> SchedulingProblem:
+    """指定タスクと配分容量による部分問題"""
+    return SchedulingProblem(
+        start_year=problem.start_year,
+        end_year=problem.end_year,
+        earliest_start=problem.earliest_start[tasks],
+        latest_end=problem.latest_end[tasks],
+        cost=problem.cost[tasks],
+        priority=problem.priority[tasks],
+        penalty_coefficient=problem.penalty_coefficient[tasks],
+        capacity=capacity,
+        demand=problem.demand[:, tasks],
+        resource_names=problem.resource_names
+    )
+
+
+def solve_regions(problem: SchedulingProblem, jobs: List[Tuple[np.ndarray, np.ndarray]], strategy: str,
+                  options: Optional[Dict[str, Any]] = None) -> List[np.ndarray]:
+    """(タスク番号, 資源×年度の配分容量) の地区ごとに部分問題を解き、実施年配列を返す"""
+    engine = SOLVER_STRATEGIES.get(strategy).configure(**(options or {}))
+    return [engine.solve(subproblem(problem, tasks, capacity)) for tasks, capacity in jobs]
+
+
+# --- 子プロセス側の状態（initializerで共有メモリに接続） ---
+
+_worker_problem: Optional[SchedulingProblem] = None
+_worker_blocks = []
+
+
+def _init_worker(spec: Dict[str, Any]) -> None:
+    global _worker_problem, _worker_blocks
+    logging.disable(logging.INFO)  # 地区ごとのログは抑制
+    _worker_problem, _worker_blocks = SharedProblem.attach(spec)
+
+
+def _solve_job(args) -> List[np.ndarray]:
+    jobs, strategy, options = args
+    return solve_regions(_worker_problem, jobs, strategy, options)
+
+
+def balance_jobs(sizes: np.ndarray, n_jobs: int) -> List[List[int]]:
+    """地区をタスク数の大きい順に最も軽いジョブへ割り当てる"""
+    n_jobs = max(1, min(n_jobs, len(sizes)))
+    jobs: List[List[int]] = [[] for _ in range(n_jobs)]
+    loads = np.zeros(n_jobs)
+    for g in np.argsort(-sizes, kind='stable').tolist():
+        j = int(np.argmin(loads))
+        jobs[j].append(g)
+        loads[j] += sizes[g]
+    return [job for job in jobs if job]
+
+
+def window_totals(amounts: np.ndarray, regions: np.ndarray, n_regions: int, n_years: int,
+                  first: np.ndarray, stop: np.ndarray) -> np.ndarray:
+    """項目×地区×年度の合計（項目×タスクの量を、タスクの年度インデックス[first, stop)の各年度に計上）"""
+    first = np.clip(first, 0, n_years)
+    stop = np.clip(stop, 0, n_years)
+    size = n_regions * (n_years + 1)
+    totals = np.zeros((len(amounts), n_regions, n_years + 1))
+    for r, amount in enumerate(amounts):
+        counted = (amount > 0) & (stop > first)
+        cell = regions[counted] * (n_years + 1)
+        # 区間の始点に加算・終点で減算し、年度方向の累積和で各年度の合計にする
+        totals[r] = (np.bincount(cell + first[counted], weights=amount[counted], minlength=size) -
+                     np.bincount(cell + stop[counted], weights=amount[counted], minlength=size)
+                     ).reshape(n_regions, n_years + 1)
+    return np.maximum(np.cumsum(totals, axis=2)[:, :, :n_years], 0.0)
+
+
+def waiting_window(problem: SchedulingProblem, years: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """タスク別の待機年度インデックス[first, stop)（最早開始年から実施年の前年まで、未配置は最遅完了年まで）"""
+    first = problem.earliest_start - problem.start_year
+    latest = problem.latest_end - problem.start_year + 1
+    stop = np.where(years >= 0, years - problem.start_year, latest)
+    return first, np.minimum(stop, latest)
+
+
+def initial_allocation(problem: SchedulingProblem, regions: np.ndarray, n_regions: int) -> np.ndarray:
+    """資源×地区×年度の初期配分（その年度に実施可能なタスクの消費量×年あたり遅延ペナルティの地区比で按分）"""
+    claims = window_totals(problem.demand * problem.penalty_per_year, regions, n_regions, problem.n_years,
+                           problem.earliest_start - problem.start_year, problem.latest_end - problem.start_year + 1)
+    total = claims.sum(axis=1, keepdims=True)
+    share = np.divide(claims, total, out=np.full_like(claims, 1.0 / n_regions), where=total > 0)
+    return problem.capacity[:, None, :] * share
+
+
+def region_usage(problem: SchedulingProblem, years: np.ndarray, regions: np.ndarray, n_regions: int) -> np.ndarray:
+    """資源×地区×年度の使用量"""
+    placed = np.flatnonzero(years >= 0)
+    cell = regions[placed] * problem.n_years + years[placed] - problem.start_year
+    return np.array([
+        np.bincount(cell, weights=problem.demand[r, placed], minlength=n_regions * problem.n_years)
+        for r in range(len(problem.capacity))
+    ]).reshape(len(problem.capacity), n_regions, problem.n_years)
+
+
+def region_penalty(problem: SchedulingProblem, years: np.ndarray, regions: np.ndarray, n_regions: int) -> np.ndarray:
+    """地区別の遅延ペナルティ（未配置タスクは計画期間終了翌年の実施とみなす）"""
+    effective = np.where(years >= 0, years, problem.end_year + 1)
+    delay = np.maximum(effective - problem.earliest_start, 0)
+    return np.bincount(regions, weights=problem.penalty_per_year * delay, minlength=n_regions)
+
+
+def reallocate(problem: SchedulingProblem, years: np.ndarray, usage: np.ndarray, regions: np.ndarray,
+               n_regions: int) -> Tuple[np.ndarray, np.ndarray]:
+    """使用量を保持し、未使用の容量を待機圧力の密度が大きい地区から順に待機タスクの消費量まで配分
+    
+    密度は待機タスクの年あたり遅延ペナルティ÷待機タスクの消費量が年度容量に占める割合（全資源の合計）。
+    按分ではタスク1件に満たない端数が多数の地区に散って使われないため、地区ごとにまとめて割り当てる。
+    全資源で同じ順位を使い、予算と施工件数が別々の地区へ渡って使えなくなるのを避ける。
+    戻り値は (新しい配分, 追加した容量)。
+    """
+    first, stop = waiting_window(problem, years)
+    n_years = problem.n_years
+    waiting = window_totals(problem.demand, regions, n_regions, n_years, first, stop)
+    pressure = window_totals(problem.penalty_per_year[None, :], regions, n_regions, n_years, first, stop)[0]
+    capacity = problem.capacity[:, None, :]
+    load = np.divide(waiting, capacity, out=np.zeros_like(waiting), where=capacity > 0).sum(axis=0)
+    urgency = np.divide(pressure, load, out=np.zeros_like(pressure), where=load > 0)
+    pool = np.maximum(problem.capacity - usage.sum(axis=1), 0.0)[:, None, :]
+    
+    ranked = np.broadcast_to(np.argsort(-urgency, axis=0, kind='stable'), waiting.shape)
+    requested = np.take_along_axis(waiting, ranked, axis=1)
+    ahead = np.cumsum(requested, axis=1) - requested
+    grant = np.zeros_like(waiting)
+    np.put_along_axis(grant, ranked, np.clip(pool - ahead, 0.0, requested), axis=1)
+    return usage + grant, grant
+
+
+def receiving_regions(problem: SchedulingProblem, years: np.ndarray, grant: np.ndarray, regions: np.ndarray,
+                      n_regions: int) -> np.ndarray:
+    """いずれかの年度に、待機タスクの最小消費量以上の容量を全資源で受け取った地区（解き直す地区）"""
+    first, stop = waiting_window(problem, years)
+    waiting = np.flatnonzero(stop > np.maximum(first, 0))
+    smallest = np.full((len(problem.capacity), n_regions), np.inf)
+    for r in range(len(problem.capacity)):
+        np.minimum.at(smallest[r], regions[waiting], problem.demand[r, waiting])
+    fits = np.all(grant >= smallest[:, :, None] * (1 - 1e-9), axis=0)
+    return np.flatnonzero(fits.any(axis=1))
+
+
+def polish(problem: SchedulingProblem, years: np.ndarray, order: np.ndarray) -> np.ndarray:
+    """全体容量で配置済みタスクを前倒しし、未配置タスクを配置する（地区間の余りを活用）"""
+    start_year = problem.start_year
+    index = YearSlotIndex(problem.capacity, problem.demand)
+    index.load(problem.usage(years))
+    entries = YearSlotIndex.sparse_demand(problem.demand)
+    years = years.copy()
+    earliest, latest = problem.earliest_start.tolist(), problem.latest_end.tolist()
+    
+    for t in order.tolist():
+        if years[t] >= 0:
+            i = int(years[t]) - start_year
+            if i <= max(earliest[t] - start_year, 0):
+                continue
+            index.release(i, entries[t])
+            j = index.first_fit(earliest[t] - start_year, latest[t] - start_year, entries[t])
+            index.reserve(j, entries[t])  # 解放した年度に戻せるため j <= i
+            years[t] = start_year + j
+        else:
+            j = index.first_fit(earliest[t] - start_year, latest[t] - start_year, entries[t])
+            if j >= 0:
+                index.reserve(j, entries[t])
+                years[t] = start_year + j
+    return years
+
+
+class DecompositionEngine(SolverEngine):
+    """公園・地区単位に分割した部分問題を並列に解き、共有資源の配分を反復調整するエンジン
+    
+    regions はタスク別の地区番号（scheduler.task_regions() で作成）。省略時はタスク行順に
+    n_regions（既定はワーカー数）の連続ブロックへ分割する（タスク行は公園順に並ぶ）。
+    """
+    name = 'decomposition'
+    description = '地区分割＋共有資源の配分調整'
+    time_budget = 5.0
+    
+    regions: Optional[np.ndarray] = None   # タスク別の地区番号
+    n_regions: Optional[int] = None        # regions省略時の分割数
+    sub_strategy: str = 'greedy_priority'  # 部分問題の戦略
+    sub_options: Optional[Dict[str, Any]] = None
+    iterations: int = 10                   # 配分調整の反復回数の上限
+    tolerance: float = 1e-4                # 遅延ペナルティの相対改善がこれ未満の反復で終了
+    min_region_tasks: int = 500            # タスク数がこれ未満の地区は隣接する地区と束ねる（配分の端数を抑える）
+    max_workers: Optional[int] = None      # ワーカー数（省略時はCPUコア数、1は同一プロセス）
+    warm_start: bool = False               # 全体の貪欲解を初期解・初期配分に使う（全体の求解1回分の時間が加わる）
+    final_polish: bool = False             # 最終解に全体容量での前倒し・未配置タスクの配置を適用（全タスクを走査）
+    
+    def budget_for(self, n_tasks: int) -> float:
+        # 反復ごとに部分問題（地区ごとの改善フェーズを含む）を解き直すため、その合計とプロセス起動の余裕
+        sub_engine = SOLVER_STRATEGIES.get(self.sub_strategy).configure(**(self.sub_options or {}))
+        n_regions = len(np.unique(self.regions)) if self.regions is not None else (self.n_regions or 1)
+        sub_budget = sub_engine.budget_for(n_tasks) + sub_engine.local_search_time * (n_regions - 1)
+        return super().budget_for(n_tasks) + max(self.iterations, 1) * sub_budget + 5.0
+    
+    def partition(self, problem: SchedulingProblem, n_workers: int) -> Tuple[np.ndarray, int]:
+        """タスク別の地区番号（0始まりの連番）と地区数（小さい地区は番号順に隣接する地区と束ねる）"""
+        if self.regions is not None:
+            regions = np.asarray(self.regions)
+            if len(regions) != problem.n_tasks:
+                raise ValueError(f"regions has {len(regions)} entries for {problem.n_tasks} tasks")
+            labels, regions = np.unique(regions, return_inverse=True)
+            # 地区の累積タスク数をmin_region_tasks刻みで区切り、地区を分割せずに束ねる
+            sizes = np.bincount(regions, minlength=len(labels))
+            bundles = (np.cumsum(sizes) - sizes) // max(self.min_region_tasks, 1)
+            _, bundles = np.unique(bundles, return_inverse=True)
+            return bundles[regions].astype(np.int64), int(bundles.max()) + 1 if bundles.size else 1
+        n_regions = max(1, min(self.n_regions or n_workers, problem.n_tasks))
+        return np.arange(problem.n_tasks) * n_regions // max(problem.n_tasks, 1), n_regions
+    
+    def solve(self, problem: SchedulingProblem) -> np.ndarray:
+        start_time = time.time()
+        if problem.lifecycle is not None:
+            logger.warning("Decomposition does not support lifecycle plans; solving without decomposition")
+            return greedy_first_fit(problem, self.order(problem))
+        
+        max_workers = self.max_workers or os.cpu_count() or 1
+        regions, n_regions = self.partition(problem, max_workers)
+        order = np.argsort(regions, kind='stable')
+        bounds = np.searchsorted(regions[order], np.arange(n_regions + 1))
+        region_tasks = [order[bounds[g]:bounds[g + 1]] for g in range(n_regions)]
+        sizes = np.diff(bounds).astype(float)
+        
+        # 初期配分は地区の需要比のみで決まるため、全体の求解は不要
+        years = np.full(problem.n_tasks, -1, dtype=np.int64)
+        allocation = initial_allocation(problem, regions, n_regions)
+        if self.warm_start:
+            years = greedy_first_fit(problem, self.order(problem))
+            allocation, _ = reallocate(problem, years, region_usage(problem, years, regions, n_regions),
+                                       regions, n_regions)
+        penalty = region_penalty(problem, years, regions, n_regions)
+        
+        logger.info(f"Decomposition: {problem.n_tasks} tasks in {n_regions} regions on {max_workers} workers")
+        
+        pool, shared = None, None
+        if max_workers > 1 and n_regions > 1:
+            shared = SharedProblem(problem)
+            pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(shared.spec,))
+        
+        history, resolved = [], []
+        targets = np.arange(n_regions)
+        try:
+            for iteration in range(max(self.iterations, 1)):
+                job_regions = [targets[job] for job in balance_jobs(sizes[targets], max_workers * JOBS_PER_WORKER)]
+                args = [
+                    ([(region_tasks[g], allocation[:, g, :]) for g in job], self.sub_strategy, self.sub_options)
+                    for job in job_regions
+                ]
+                if pool is not None and len(args) > 1:
+                    results = list(pool.map(_solve_job, args))
+                else:
+                    results = [solve_regions(problem, *arg) for arg in args]
+                
+                candidate = years.copy()
+                for job, job_years in zip(job_regions, results):
+                    for g, region_years in zip(job, job_years):
+                        candidate[region_tasks[g]] = region_years
+                
+                # 遅延ペナルティが悪化した地区は前回の解を維持（前回の使用量は今回の配分以下のため実行可能）
+                candidate_penalty = region_penalty(problem, candidate, regions, n_regions)
+                worse = candidate_penalty > penalty
+                candidate[worse[regions]] = years[worse[regions]]
+                years, penalty = candidate, np.minimum(candidate_penalty, penalty)
+                improved = not history or penalty.sum() < history[-1] * (1 - self.tolerance)
+                history.append(float(penalty.sum()))
+                resolved.append(len(targets))
+                if not improved:
+                    break
+                
+                usage = region_usage(problem, years, regions, n_regions)
+                allocation, grant = reallocate(problem, years, usage, regions, n_regions)
+                targets = receiving_regions(problem, years, grant, regions, n_regions)
+                if not len(targets):
+                    break
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if shared is not None:
+                shared.close()
+        
+        if self.final_polish:
+            years = polish(problem, years, self.order(problem))
+        self.info = {
+            'regions': n_regions,
+            'objective_history': history,
+            'resolved_regions': resolved,
+            'objective': problem.objective(years),
+            'time': time.time() - start_time
+        }
+        return years
+
+
+SOLVER_STRATEGIES.register(DecompositionEngine())
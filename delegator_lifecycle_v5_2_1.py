@@ -0,0 +1,341 @@
+"""
+Delegator v5.2.1: 複数年ライフサイクル（周期修繕・更新）タスク生成
+設備ごとに計画期間内の介入候補（周期修繕の連鎖・スコアをリセットする更新・相互排他の代替案）を生成し、
+ソルバーが実施年を確定するたびに同じ設備の後続タスクの劣化スコア射影を差分更新する
+
+劣化スコアは DegradationEngine と同じ 年齢項＋判定項 に分解し、表として事前計算する。
+- 年齢項: 経過年数別の1次元表（設置年、更新後は更新年からの経過年数で参照）
+- 判定項: 介入なしの設備×年度の射影（現判定＋劣化傾向）と、介入後の経過年数別の射影（a判定＋劣化傾向）
+確定時の再評価は直前の介入年から表を引き直すだけで、dataclassや劣化曲線の再計算は行わない。
+
+Author: CWD Agent
+Version: v5.2.1
+"""
+
+import logging
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from delegator_v5_2_1 import (
+    BASE_YEAR,
+    GRADES,
+    GRADE_CODES,
+    DEFAULT_INSPECTION_GRADE,
+    GRADE_SCORE_TABLE,
+    PENALTY_COEFFICIENT_SCALE,
+    PRIORITY_THRESHOLDS
+)
+
+logger = logging.getLogger(__name__)
+
+# タスク種別（kind配列のコード）
+TASK_REPAIR = 0
+TASK_RENEWAL = 1
+
+# 周期修繕の間隔（年）
+DEFAULT_REPAIR_INTERVAL = 5
+
+# 修繕が必要とみなす劣化スコア（c判定）と更新候補を作る劣化スコア（d判定）
+REPAIR_THRESHOLD = 0.4
+RENEWAL_THRESHOLD = 0.6
+
+# 事象キー（設備×年度）の年度方向の桁幅
+_KEY_SPAN = 10000
+
+
+class LifecycleModel:
+    """設備別の劣化スコア表とライフサイクルタスクの属性（設備・種別・排他グループ）を保持するモデル
+    
+    タスク属性はタスク行順の配列で、generate_lifecycle_tasks() が登録したタスク列に対応する。
+    配列のみを保持するため、シナリオ計算の子プロセスへそのままpickleで渡せる。
+    """
+    
+    def __init__(self, scheduler, repair_interval: int = DEFAULT_REPAIR_INTERVAL,
+                 repair_threshold: float = REPAIR_THRESHOLD, renewal_threshold: float = RENEWAL_THRESHOLD):
+        if repair_interval < 1:
+            raise ValueError(f"repair_interval must be >= 1, got {repair_interval}")
+        self.start_year = scheduler.start_year
+        self.end_year = scheduler.end_year
+        self.n_years = self.end_year - self.start_year + 1
+        self.repair_interval = repair_interval
+        self.repair_threshold = repair_threshold
+        self.renewal_threshold = renewal_threshold
+        
+        engine = scheduler.degradation_engine
+        self.age_weight = engine.age_weight
+        self.inspection_weight = engine.inspection_weight
+        
+        rows = scheduler.fleet.rows
+        self.install_years = rows['install_year'].astype(np.int64)
+        
+        # 経過年数別の年齢項（設置からの最大経過年数まで）
+        max_age = max(int(self.end_year - self.install_years.min()) if rows.size else 0, self.n_years) + 1
+        self._age_table = self.age_weight * engine.curve.age_factor(np.arange(max_age + 1, dtype=float))
+        
+        self._base = np.zeros((rows.size, self.n_years))
+        self._fresh = np.zeros((rows.size, self.n_years + 1))
+        self.refresh(rows, np.arange(rows.size))
+        
+        # タスク属性（bind_tasksで設定）
+        self.task_asset = np.zeros(0, dtype=np.int64)
+        self.earliest_start = np.zeros(0, dtype=np.int64)
+        self.kind = np.zeros(0, dtype=np.int8)
+        self.group = np.zeros(0, dtype=np.int64)
+    
+    def _inspection_term(self, codes: np.ndarray) -> np.ndarray:
+        """判定コード（実数、a=0〜e=4）の判定項（グレード間は線形補間）"""
+        clipped = np.clip(codes, 0, len(GRADES) - 1)
+        return self.inspection_weight * np.interp(clipped, np.arange(len(GRADES)), GRADE_SCORE_TABLE[:len(GRADES)])
+    
+    def refresh(self, rows, assets) -> None:
+        """指定設備の判定項の表を現在の点検判定・劣化傾向から再計算"""
+        assets = np.asarray(assets, dtype=np.int64)
+        codes = rows['inspection_grade'][assets].astype(float)
+        codes[codes < 0] = GRADE_CODES[DEFAULT_INSPECTION_GRADE]
+        trends = np.maximum(rows['inspection_trend'][assets], 0.0)  # 介入なしで判定は改善しない
+        
+        calendar = np.arange(self.start_year, self.end_year + 1)
+        self._base[assets] = self._inspection_term(codes[:, None] + trends[:, None] * (calendar[None, :] - BASE_YEAR))
+        self._fresh[assets] = self._inspection_term(trends[:, None] * np.arange(self.n_years + 1)[None, :])
+    
+    @property
+    def n_tasks(self) -> int:
+        return len(self.task_asset)
+    
+    def scores(self, assets: np.ndarray, years: np.ndarray, age_origin: np.ndarray, reset_year: np.ndarray) -> np.ndarray:
+        """設備・年度別の劣化スコア（age_origin: 設置年または更新年、reset_year: 直前の介入年、なしは-1）"""
+        age = self._age_table[np.clip(years - age_origin, 0, len(self._age_table) - 1)]
+        base = self._base[assets, np.clip(years - self.start_year, 0, self.n_years - 1)]
+        fresh = self._fresh[assets, np.clip(years - reset_year, 0, self.n_years)]
+        return np.clip(age + np.where(reset_year >= 0, fresh, base), 0.0, 1.0)
+    
+    def projected_scores(self) -> np.ndarray:
+        """介入なしの設備×年度の劣化スコア射影"""
+        n_assets = len(self.install_years)
+        calendar = np.arange(self.start_year, self.end_year + 1)
+        assets = np.repeat(np.arange(n_assets), self.n_years)
+        years = np.tile(calendar, n_assets)
+        scores = self.scores(assets, years, self.install_years[assets], np.full(years.size, -1))
+        return scores.reshape(n_assets, self.n_years)
+    
+    # --- タスク候補の生成 ---
+    
+    def candidates(self, earliest_starts: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """設備別の介入候補（設備, 種別, 最早開始年, 最遅完了年, 排他グループ）を設備順に列挙
+        
+        周期修繕: 最早開始年から repair_interval 年ごとの重ならない窓（最終窓は計画期間末まで）。
+        2周期目以降は介入なしの射影が repair_threshold 以上の周期のみ候補とする。
+        更新: 射影が renewal_threshold に達する年以降を窓とし、その年を含む修繕周期と相互排他とする。
+        """
+        n_assets = len(self.install_years)
+        interval = self.repair_interval
+        first = np.maximum(np.asarray(earliest_starts, dtype=np.int64), self.start_year)
+        projected = self.projected_scores()
+        
+        # 設備×周期の修繕窓
+        n_cycles = -(-self.n_years // interval)
+        cycle_start = first[:, None] + interval * np.arange(n_cycles)[None, :]
+        in_horizon = cycle_start <= self.end_year
+        cycle_end = np.minimum(cycle_start + interval - 1, self.end_year)
+        cycle_score = projected[np.arange(n_assets)[:, None], np.clip(cycle_start - self.start_year, 0, self.n_years - 1)]
+        # 初回修繕は単発タスクと同じく常に候補とする
+        repair = (np.arange(n_cycles) == 0)[None, :] | (in_horizon & (cycle_score >= self.repair_threshold))
+        
+        # 更新候補（射影が閾値に達する最初の年、最早開始年以降）
+        calendar = np.arange(self.start_year, self.end_year + 1)
+        reached = (projected >= self.renewal_threshold) & (calendar[None, :] >= first[:, None])
+        has_renewal = reached.any(axis=1)
+        renewal_start = calendar[np.argmax(reached, axis=1)]
+        renewal_cycle = np.minimum((renewal_start - first) // interval, n_cycles - 1)
+        
+        # 相互排他グループは更新を持つ設備ごとに1つ（グループ番号 = 設備行番号）
+        exclusive = has_renewal[:, None] & (np.arange(n_cycles)[None, :] == renewal_cycle[:, None])
+        
+        # 設備ごとに [周期修繕..., 更新] の順で並べる
+        kind = np.concatenate([np.full((n_assets, n_cycles), TASK_REPAIR), np.full((n_assets, 1), TASK_RENEWAL)], axis=1)
+        starts = np.concatenate([cycle_start, renewal_start[:, None]], axis=1)
+        ends = np.concatenate([cycle_end, np.full((n_assets, 1), self.end_year)], axis=1)
+        groups = np.where(np.concatenate([exclusive, has_renewal[:, None]], axis=1), np.arange(n_assets)[:, None], -1)
+        keep = np.concatenate([repair, has_renewal[:, None]], axis=1)
+        assets = np.broadcast_to(np.arange(n_assets)[:, None], keep.shape)
+        return assets[keep], kind[keep].astype(np.int8), starts[keep], ends[keep], groups[keep]
+    
+    def bind_tasks(self, task_asset: np.ndarray, earliest_start: np.ndarray, kind: np.ndarray, group: np.ndarray) -> None:
+        """タスク行順の属性を設定"""
+        self.task_asset = np.asarray(task_asset, dtype=np.int64)
+        self.earliest_start = np.asarray(earliest_start, dtype=np.int64)
+        self.kind = np.asarray(kind, dtype=np.int8)
+        self.group = np.asarray(group, dtype=np.int64)
+    
+    def initial_scores(self, tasks: Optional[np.ndarray] = None) -> np.ndarray:
+        """介入を確定する前のタスク別劣化スコア（最早開始年時点の射影）"""
+        tasks = np.arange(self.n_tasks) if tasks is None else np.asarray(tasks, dtype=np.int64)
+        assets = self.task_asset[tasks]
+        return self.scores(assets, self.earliest_start[tasks], self.install_years[assets], np.full(tasks.size, -1))
+    
+    # --- 配置結果の評価 ---
+    
+    def _last_event(self, years: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """各タスクの最早開始年より前に同じ設備で実施する介入（maskのタスク）の最も遅い実施年（なければ-1）"""
+        events = np.flatnonzero((years >= 0) & mask)
+        keys = self.task_asset[events] * _KEY_SPAN + (years[events] - self.start_year + 1)
+        order = np.argsort(keys, kind='stable')
+        keys, event_years = keys[order], years[events][order]
+        
+        queries = self.task_asset * _KEY_SPAN + (self.earliest_start - self.start_year + 1)
+        pos = np.searchsorted(keys, queries, side='left') - 1
+        found = pos >= 0
+        found[found] = keys[pos[found]] // _KEY_SPAN == self.task_asset[found]
+        last = np.full(self.n_tasks, -1, dtype=np.int64)
+        last[found] = event_years[pos[found]]
+        return last
+    
+    def evaluate(self, years: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """配置結果に対する有効タスクのマスクとペナルティ係数
+        
+        無効タスク: 同じ排他グループの代替案が配置済みの未配置タスク、
+        および先行する介入によって最早開始年の劣化スコアが repair_threshold 未満になった修繕。
+        """
+        years = np.asarray(years, dtype=np.int64)
+        last_any = self._last_event(years, np.ones(self.n_tasks, dtype=bool))
+        last_renewal = self._last_event(years, self.kind == TASK_RENEWAL)
+        age_origin = np.where(last_renewal >= 0, last_renewal, self.install_years[self.task_asset])
+        scores = self.scores(self.task_asset, self.earliest_start, age_origin, last_any)
+        
+        superseded = (self.kind == TASK_REPAIR) & (last_any >= 0) & (scores < self.repair_threshold)
+        placed = years >= 0
+        done_groups = self.group[placed & (self.group >= 0)]
+        excluded = ~placed & (self.group >= 0) & np.isin(self.group, done_groups)
+        return ~(superseded | excluded), scores * PENALTY_COEFFICIENT_SCALE
+    
+    def prune(self, years: np.ndarray) -> np.ndarray:
+        """配置済みの無効タスク（不要化した修繕）を未配置に戻した実施年配列"""
+        active, _ = self.evaluate(years)
+        return np.where(active, years, -1)
+    
+    def tracker(self) -> 'LifecycleTracker':
+        """1回の求解用の差分更新状態"""
+        return LifecycleTracker(self)
+
+
+class LifecycleTracker:
+    """ソルバーの確定ごとに同じ設備の後続タスクの劣化スコアを表引きで再評価する状態
+    
+    確定したタスクの排他グループの代替案と、スコアが repair_threshold 未満になった後続の修繕を無効化する。
+    無効化したタスクが配置済みの場合は commit() の戻り値として返し、呼び出し側で資源を解放する。
+    """
+    
+    def __init__(self, model: LifecycleModel):
+        self.model = model
+        n = model.n_tasks
+        self.years = [-1] * n
+        self.inactive = [False] * n
+        self._done_groups = set()
+        self._asset = model.task_asset.tolist()
+        self._earliest = model.earliest_start.tolist()
+        self._kind = model.kind.tolist()
+        self._group = model.group.tolist()
+        self._install = model.install_years.tolist()
+        self._age_table = model._age_table.tolist()
+        self._base = model._base.tolist()
+        self._fresh = model._fresh.tolist()
+        
+        order = np.argsort(model.task_asset, kind='stable')
+        bounds = np.searchsorted(model.task_asset[order], np.arange(len(model.install_years) + 1))
+        self._asset_tasks = {}
+        for t in range(n):
+            a = self._asset[t]
+            if a not in self._asset_tasks:
+                self._asset_tasks[a] = order[bounds[a]:bounds[a + 1]].tolist()
+    
+    def admits(self, t: int) -> bool:
+        """タスクtが配置対象か（無効化・代替案配置済みでない）"""
+        if self.inactive[t]:
+            return False
+        g = self._group[t]
+        return g < 0 or g not in self._done_groups
+    
+    def _score(self, u: int) -> float:
+        """タスクuの最早開始年時点の劣化スコア（確定済みの先行介入を反映、LifecycleModel.scoresと同じ表引き）"""
+        model = self.model
+        a, earliest = self._asset[u], self._earliest[u]
+        last_any = last_renewal = -1
+        for v in self._asset_tasks[a]:
+            year = self.years[v]
+            if 0 <= year < earliest:
+                last_any = max(last_any, year)
+                if self._kind[v] == TASK_RENEWAL:
+                    last_renewal = max(last_renewal, year)
+        
+        age_origin = last_renewal if last_renewal >= 0 else self._install[a]
+        age = self._age_table[min(max(earliest - age_origin, 0), len(self._age_table) - 1)]
+        if last_any >= 0:
+            inspection = self._fresh[a][min(earliest - last_any, model.n_years)]
+        else:
+            inspection = self._base[a][min(max(earliest - model.start_year, 0), model.n_years - 1)]
+        return min(max(age + inspection, 0.0), 1.0)
+    
+    def commit(self, t: int, year: int) -> List[int]:
+        """タスクtの実施年を確定し、不要化した配置済みタスクを返す"""
+        self.years[t] = year
+        if self._group[t] >= 0:
+            self._done_groups.add(self._group[t])
+        
+        released = []
+        for u in self._asset_tasks[self._asset[t]]:
+            if u == t or self.inactive[u] or self._kind[u] != TASK_REPAIR or self._earliest[u] <= year:
+                continue
+            if self._score(u) < self.model.repair_threshold:
+                self.inactive[u] = True
+                if self.years[u] >= 0:
+                    released.append(u)
+                    self.years[u] = -1
+        return released
+
+
+def generate_lifecycle_tasks(scheduler, repair_interval: int = DEFAULT_REPAIR_INTERVAL,
+                             repair_threshold: float = REPAIR_THRESHOLD,
+                             renewal_threshold: float = RENEWAL_THRESHOLD) -> LifecycleModel:
+    """読み込み済みの設備から周期修繕・更新の候補タスク列を生成し、既存タスクを置き換える
+    
+    タスクID: 初回修繕は repair_{設備ID}（単発タスクと同じ）、2周期目以降は repair_{設備ID}_{最早開始年}、
+    更新は renewal_{設備ID}。費用は設備の repair_cost / renewal_cost。
+    """
+    start_time = time.time()
+    fleet = scheduler.fleet
+    rows = fleet.rows
+    model = LifecycleModel(scheduler, repair_interval, repair_threshold, renewal_threshold)
+    
+    # 初回修繕の最早開始年（単発タスクと同じく設置5年後以降）
+    earliest_starts = np.maximum(model.install_years + 5, BASE_YEAR)
+    assets, kind, starts, ends, groups = model.candidates(earliest_starts)
+    
+    equipment_ids = np.array(fleet.equipment_ids, dtype=object)[assets]
+    first_cycle = np.ones(len(assets), dtype=bool)
+    first_cycle[1:] = assets[1:] != assets[:-1]
+    repair_ids = np.where(first_cycle, 'repair_' + equipment_ids,
+                          'repair_' + equipment_ids + '_' + starts.astype(str).astype(object))
+    task_ids = np.where(kind == TASK_RENEWAL, 'renewal_' + equipment_ids, repair_ids)
+    costs = np.where(kind == TASK_RENEWAL, rows['renewal_cost'][assets], rows['repair_cost'][assets])
+    
+    model.bind_tasks(assets, starts, kind, groups)
+    scores = model.initial_scores()
+    
+    fleet.clear_tasks()
+    fleet.extend_tasks(
+        task_ids.tolist(),
+        equipment_rows=assets,
+        durations=1,
+        earliest_starts=starts,
+        latest_ends=ends,
+        costs=costs,
+        priorities=np.searchsorted(PRIORITY_THRESHOLDS, scores, side='right') + 1,
+        penalty_coefficients=scores * PENALTY_COEFFICIENT_SCALE
+    )
+    
+    logger.info(f"Generated {len(task_ids)} lifecycle tasks for {rows.size} equipment "
+                f"({int((kind == TASK_REPAIR).sum())} repairs, {int((kind == TASK_RENEWAL).sum())} renewals) "
+                f"in {time.time() - start_time:.3f}s")
+    return model
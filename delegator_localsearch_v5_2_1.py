@@ -0,0 +1,196 @@
+"""
+Delegator v5.2.1: 貪欲配置後の局所探索による改善フェーズ
+タスク→年度の割当を焼きなまし法で改善する（移動: 年度の変更・2タスクの年度交換、先送りとの入れ替えを含む）
+
+計画期間外への先送り（未配置）は年度スロット D（容量制約なし）として扱い、配置・除外も同じ移動で表す。
+各移動の評価は対象タスクの遅延ペナルティ差分と、消費する資源の年度別使用量の確認のみでO(1)。
+時間予算内で最良解を保持し続けるanytime方式で、最良解の更新ごとにコールバックを呼び出す。
+
+Author: CWD Agent
+Version: v5.2.1
+"""
+
+import logging
+import math
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from delegator_v5_2_1 import (
+    SchedulingProblem,
+    YearSlotIndex
+)
+
+logger = logging.getLogger(__name__)
+
+# 交換移動を選ぶ確率（残りは年度変更）
+SWAP_PROBABILITY = 0.5
+
+# 経過時間・温度を更新する反復間隔
+CHECK_INTERVAL = 256
+
+# 時間予算の終了時の温度（初期温度に対する比）
+FINAL_TEMPERATURE_RATIO = 1e-3
+
+
+def improve_schedule(problem: SchedulingProblem, years: np.ndarray, time_budget: float = 1.0,
+                     seed: Optional[int] = None, callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                     max_iterations: Optional[int] = None,
+                     initial_temperature: Optional[float] = None) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """初期解（タスク別実施年、未配置は-1）を焼きなまし法で改善し、最良解と探索情報を返す
+    
+    time_budget: 探索時間の上限（秒）。max_iterations を指定するとその反復数でも打ち切る。
+    callback: 最良解の更新ごとに {'objective', 'years', 'iteration', 'elapsed'} を受け取る関数。
+    initial_temperature: 省略時は1年遅延あたりペナルティの中央値の半分。
+    """
+    start_time = time.time()
+    rng = random.Random(seed)
+    start_year, n_years = problem.start_year, problem.n_years
+    deferred = n_years  # 先送りスロット
+    n_tasks = problem.n_tasks
+    
+    capacity = problem.capacity.tolist()
+    entries = YearSlotIndex.sparse_demand(problem.demand)
+    used = problem.usage(years).tolist()
+    penalty_per_year = problem.penalty_per_year.tolist()
+    earliest_starts = problem.earliest_start.tolist()
+    # タスク別の選択可能スロット [lo, hi]（hi+1 を先送りとして扱う）
+    lo = np.clip(problem.earliest_start - start_year, 0, n_years).tolist()
+    hi = np.clip(problem.latest_end - start_year, -1, n_years - 1).tolist()
+    
+    def delay(t: int, k: int) -> int:
+        """スロットkに置いたタスクtの遅延年数（先送りは計画期間終了翌年の実施）"""
+        return max(k + start_year - earliest_starts[t], 0)
+    
+    # スロット別のタスク一覧（位置索引でO(1)削除）
+    slot = [int(y) - start_year if y >= 0 else deferred for y in np.asarray(years).tolist()]
+    members: List[List[int]] = [[] for _ in range(n_years + 1)]
+    position = [0] * n_tasks
+    for t in range(n_tasks):
+        position[t] = len(members[slot[t]])
+        members[slot[t]].append(t)
+    
+    # 最良解からの差分（最良解以降に動かしたタスク→最良解でのスロット）。最良解は終了時に一度だけ復元する
+    best_diff: Dict[int, int] = {}
+    
+    def move(t: int, k: int) -> None:
+        old = slot[t]
+        if t not in best_diff:
+            best_diff[t] = old
+        bucket = members[old]
+        last = bucket.pop()
+        if last != t:
+            bucket[position[t]] = last
+            position[last] = position[t]
+        position[t] = len(members[k])
+        members[k].append(t)
+        slot[t] = k
+        if old < deferred:
+            for r, d in entries[t]:
+                used[r][old] -= d
+        if k < deferred:
+            for r, d in entries[t]:
+                used[r][k] += d
+    
+    def fits_exchange(k: int, out: int, into: int) -> bool:
+        """スロットkからタスクoutを除きintoを加えても容量内か（先送りスロットは常に可）"""
+        if k == deferred:
+            return True
+        change: Dict[int, float] = {}
+        for r, d in entries[into]:
+            change[r] = change.get(r, 0.0) + d
+        if out >= 0:
+            for r, d in entries[out]:
+                change[r] = change.get(r, 0.0) - d
+        return all(used[r][k] + d <= capacity[r][k] for r, d in change.items() if d > 0)
+    
+    def random_slot(t: int) -> int:
+        k = rng.randint(lo[t], max(hi[t], lo[t] - 1) + 1)
+        return k if k <= hi[t] else deferred
+    
+    objective = problem.objective(np.asarray(years))
+    baseline = objective
+    best_objective = objective
+    
+    if initial_temperature is None:
+        positive = problem.penalty_per_year[problem.penalty_per_year > 0]
+        initial_temperature = 0.5 * float(np.median(positive)) if positive.size else 1.0
+    temperature = initial_temperature
+    
+    iteration = accepted = improvements = 0
+    elapsed = 0.0
+    while n_tasks:
+        if iteration % CHECK_INTERVAL == 0:
+            elapsed = time.time() - start_time
+            if elapsed >= time_budget:
+                break
+            temperature = initial_temperature * FINAL_TEMPERATURE_RATIO ** (elapsed / time_budget)
+        if max_iterations is not None and iteration >= max_iterations:
+            break
+        iteration += 1
+        
+        t = rng.randrange(n_tasks)
+        i = slot[t]
+        j = random_slot(t)
+        if j == i:
+            continue
+        
+        if rng.random() < SWAP_PROBABILITY and members[j]:
+            # 交換: スロットjのタスクuとスロットを入れ替える
+            u = members[j][rng.randrange(len(members[j]))]
+            if not (i == deferred or lo[u] <= i <= hi[u]):
+                continue
+            delta = (penalty_per_year[t] * (delay(t, j) - delay(t, i)) +
+                     penalty_per_year[u] * (delay(u, i) - delay(u, j)))
+            if not (delta <= 0 or (temperature > 0 and rng.random() < math.exp(-delta / temperature))):
+                continue
+            if not (fits_exchange(j, u, t) and fits_exchange(i, t, u)):
+                continue
+            move(t, deferred)  # 一旦先送りして容量を解放してから入れ替え
+            move(u, i)
+            move(t, j)
+        else:
+            # 年度変更（配置・先送りを含む）
+            delta = penalty_per_year[t] * (delay(t, j) - delay(t, i))
+            if not (delta <= 0 or (temperature > 0 and rng.random() < math.exp(-delta / temperature))):
+                continue
+            if not fits_exchange(j, -1, t):
+                continue
+            move(t, j)
+        
+        accepted += 1
+        objective += delta
+        if objective < best_objective - 1e-9:
+            best_objective = objective
+            best_diff.clear()
+            improvements += 1
+            if callback is not None:
+                callback({
+                    'objective': best_objective,
+                    'years': np.array([start_year + k if k < deferred else -1 for k in slot], dtype=np.int64),
+                    'iteration': iteration,
+                    'elapsed': time.time() - start_time
+                })
+    
+    for t, k in best_diff.items():
+        slot[t] = k
+    best_years = np.array([start_year + k if k < deferred else -1 for k in slot], dtype=np.int64)
+    best_objective = problem.objective(best_years)  # 差分の累積誤差を除いた値
+    elapsed = time.time() - start_time
+    info = {
+        'baseline_objective': baseline,
+        'objective': best_objective,
+        'penalty_reduction': baseline - best_objective,
+        'penalty_reduction_ratio': (baseline - best_objective) / baseline if baseline > 0 else 0.0,
+        'cost_change': float(problem.cost[best_years >= 0].sum() - problem.cost[np.asarray(years) >= 0].sum()),
+        'iterations': iteration,
+        'accepted': accepted,
+        'improvements': improvements,
+        'time': elapsed,
+        'seed': seed
+    }
+    logger.info(f"Local search: objective {baseline:,.0f} -> {best_objective:,.0f} "
+                f"({info['penalty_reduction_ratio']:.2%} reduction, {iteration} iterations in {elapsed:.3f}s)")
+    return best_years, info
@@ -0,0 +1,269 @@
+"""
+Delegator v5.2.1: 厳密整数計画（MILP）スケジューリングバックエンド
+PuLP同梱のCBCソルバーで年度別資源制約（予算・施工件数など）下の遅延ペナルティ総額を最小化
+
+変数 x[t, y] はタスクtを年度yに実施する場合に1。実施可能な(t, y)の組のみを変数化し、
+制約行列は配列演算で疎に組み立ててMPSファイルへ直接書き出す（PuLPの式オブジェクトは生成しない）。
+計画期間内に実施しないタスクは終了翌年に実施したものとして費用・ペナルティを計上する。
+目的関数は他の戦略と同じ SchedulingProblem.objective（遅延ペナルティ総額）で、費用は全タスクで
+実施年によらず一定のため目的関数に含めない（費用総額は結果統計の total_cost で別途報告）。
+ライフサイクル計画では相互排他の代替案（修繕か更新か）を1件以下とする制約を加える。
+ただしライフサイクル計画のMILPは線形の代理モデルで、ペナルティ係数を問題作成時の penalty_coefficient に
+固定している（実際の係数は SchedulingProblem.effective() が配置に応じて再評価する）。このため解は
+無効タスクを除いた（LifecycleModel.prune）後に正しい目的関数で評価し、基本戦略の貪欲解より悪ければ採用しない。
+
+Author: CWD Agent
+Version: v5.2.1
+"""
+
+import io
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from delegator_v5_2_1 import (
+    PENALTY_RATE,
+    SOLVER_STRATEGIES,
+    SchedulingProblem,
+    SolverEngine,
+    greedy_first_fit,
+    lazy_import
+)
+
+pd = lazy_import('pandas')
+
+# 初期解・比較対象とする貪欲配置の戦略（自身の並べ替え順に加えて評価）
+GREEDY_STRATEGIES = ('greedy_priority', 'cost_optimal', 'penalty_minimization')
+
+logger = logging.getLogger(__name__)
+
+# CBC解ファイルの状態行（例: "Optimal - objective value -1234.5"）
+STATUS_PATTERN = re.compile(r'^(?P<status>.*?)\s*-\s*objective value\s+(?P<value>\S+)')
+
+
+def cbc_path() -> str:
+    """PuLP同梱のCBC実行ファイルのパスを返す"""
+    try:
+        import pulp
+    except ImportError as e:
+        raise ImportError("MILP backend requires pulp (pip install pulp)") from e
+    
+    solver = pulp.PULP_CBC_CMD(msg=False)
+    if not solver.available():
+        raise RuntimeError(f"CBC solver is not executable: {solver.path}")
+    return solver.path
+
+
+def build_assignment_pairs(problem: SchedulingProblem) -> Tuple[np.ndarray, np.ndarray]:
+    """実施可能な(タスク, 年度インデックス)の組を配列で列挙"""
+    first = np.maximum(problem.earliest_start, problem.start_year) - problem.start_year
+    last = np.minimum(problem.latest_end, problem.end_year) - problem.start_year
+    lengths = np.maximum(last - first + 1, 0)
+    
+    pair_task = np.repeat(np.arange(problem.n_tasks), lengths)
+    offsets = np.cumsum(lengths) - lengths
+    pair_year = first[pair_task] + np.arange(pair_task.size) - offsets[pair_task]
+    return pair_task, pair_year
+
+
+def _names(prefix: str, n: int) -> np.ndarray:
+    """MPS固定形式用の8文字名（X0000000形式）"""
+    return np.char.add(prefix, np.char.zfill(np.arange(n).astype(str), 7))
+
+
+def _column_lines(columns: np.ndarray, rows: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """COLUMNSセクションの行を一括整形"""
+    values = np.char.rjust(np.char.mod('%.12e', values), 19)
+    return np.char.add(np.char.add(np.char.add('    ', np.char.ljust(columns, 10)), np.char.ljust(rows, 10)), values)
+
+
+def write_mps(path: str, problem: SchedulingProblem, pair_task: np.ndarray, pair_year: np.ndarray,
+              objective: np.ndarray) -> None:
+    """割当モデルをMPS固定形式で書き出す
+    
+    行: C[タスク] Σ_y x ≤ 1, C[資源r・年度y] Σ_t demand[r, t]·x ≤ capacity[r, y],
+        C[排他グループg] Σ_{t∈g, y} x ≤ 1（ライフサイクル計画のみ）
+    """
+    n_tasks, n_pairs = problem.n_tasks, pair_task.size
+    n_resources, n_years = problem.capacity.shape
+    
+    # 排他グループ（グループ番号を連番に詰める、グループなしは-1）
+    groups = np.full(n_tasks, -1, dtype=np.int64)
+    if problem.lifecycle is not None:
+        grouped = problem.lifecycle.group >= 0
+        groups[grouped] = np.unique(problem.lifecycle.group[grouped], return_inverse=True)[1]
+    n_groups = int(groups.max()) + 1 if n_tasks else 0
+    
+    n_rows = n_tasks + n_resources * n_years
+    row_names = _names('C', n_rows + n_groups)
+    col_names = _names('X', n_pairs)
+    
+    # 列ごとに (タスク行, 排他グループ行, 資源行×R, 目的関数) を並べ、係数0の要素は除外
+    pair_group = groups[pair_task]
+    resource_rows = n_tasks + np.arange(n_resources)[None, :] * n_years + pair_year[:, None]
+    entry_rows = np.column_stack([
+        row_names[pair_task],
+        row_names[n_rows + np.maximum(pair_group, 0)] if n_groups else row_names[pair_task],
+        row_names[resource_rows],
+        np.full(n_pairs, 'OBJ', dtype=row_names.dtype)
+    ]).ravel()
+    entry_values = np.column_stack([
+        np.ones(n_pairs),
+        (pair_group >= 0).astype(float),
+        problem.demand[:, pair_task].T,
+        objective
+    ]).ravel()
+    keep = entry_values != 0
+    entry_columns = np.repeat(col_names, n_resources + 3)[keep]
+    
+    rhs = np.concatenate([np.ones(n_tasks), problem.capacity.ravel(), np.ones(n_groups)])
+    
+    with open(path, 'w') as f:
+        f.write("*SENSE:Minimize\nNAME          MODEL\nROWS\n N  OBJ\n")
+        f.write('\n'.join(np.char.add(' L  ', row_names).tolist()))
+        f.write("\nCOLUMNS\n    MARK      'MARKER'                 'INTORG'\n")
+        if n_pairs:
+            f.write('\n'.join(_column_lines(entry_columns, entry_rows[keep], entry_values[keep]).tolist()))
+            f.write('\n')
+        f.write("    MARK      'MARKER'                 'INTEND'\nRHS\n")
+        f.write('\n'.join(_column_lines(np.full(rhs.size, 'RHS', dtype=row_names.dtype), row_names, rhs).tolist()))
+        f.write("\nBOUNDS\n")
+        if n_pairs:
+            f.write('\n'.join(np.char.add(' BV BND       ', col_names).tolist()))
+            f.write('\n')
+        f.write("ENDATA\n")
+
+
+def write_mip_start(path: str, pair_task: np.ndarray, pair_year: np.ndarray, start_years: np.ndarray,
+                    start_year: int) -> None:
+    """CBCの初期解ファイル（-mips）を書き出す"""
+    values = (start_years[pair_task] - start_year == pair_year).astype(int)
+    col_names = _names('X', pair_task.size)
+    lines = np.char.add(np.char.add(np.char.add(np.arange(pair_task.size).astype(str), ' '), col_names),
+                        np.char.add(' ', np.char.add(values.astype(str), ' 0')))
+    with open(path, 'w') as f:
+        f.write("Stopped on time - objective value 0\n")
+        f.write('\n'.join(lines.tolist()))
+        f.write('\n')
+
+
+def read_solution(path: str, n_pairs: int) -> Tuple[str, np.ndarray]:
+    """CBC解ファイルから状態行と列値を読み取る"""
+    with open(path) as f:
+        status = f.readline().strip()
+        body = f.read().replace('**', '  ')
+    
+    values = np.zeros(n_pairs)
+    if body.strip():
+        table = pd.read_csv(io.StringIO(body), sep=r'\s+', header=None, usecols=[1, 2], names=['name', 'value'])
+        columns = table[table['name'].str.startswith('X')]
+        values[columns['name'].str[1:].astype(np.int64).to_numpy()] = columns['value'].to_numpy(dtype=float)
+    return status, values
+
+
+def prune(problem: SchedulingProblem, years: np.ndarray) -> np.ndarray:
+    """ライフサイクル計画で配置済みの無効タスクを未配置に戻した実施年配列（solve_parallelが適用するものと同じ）"""
+    return years if problem.lifecycle is None else problem.lifecycle.prune(years)
+
+
+class MilpEngine(SolverEngine):
+    """CBCによる厳密整数計画エンジン（貪欲解で初期化、時間制限・MIPギャップ指定可）"""
+    name = 'milp'
+    description = 'CBCによる厳密整数計画'
+    time_budget = 600.0
+    
+    time_limit: Optional[float] = 60.0  # 解法時間上限（秒）
+    mip_gap: float = 0.01               # 相対MIPギャップ
+    threads: Optional[int] = None       # CBCスレッド数
+    warm_start: bool = True             # 貪欲解を初期解に使用
+    
+    def greedy_solution(self, problem: SchedulingProblem) -> Tuple[np.ndarray, float]:
+        """自身と基本戦略の並べ替え順による貪欲解のうち目的関数値が最小のもの（無効タスク除外済み）と、その値"""
+        orders = [self.order(problem)] + [SOLVER_STRATEGIES.get(name).order(problem) for name in GREEDY_STRATEGIES]
+        best_years, best_objective = None, np.inf
+        for order in orders:
+            years = prune(problem, greedy_first_fit(problem, order))
+            objective = problem.objective(years)
+            if objective < best_objective:
+                best_years, best_objective = years, objective
+        return best_years, best_objective
+    
+    def solve(self, problem: SchedulingProblem) -> np.ndarray:
+        greedy_years, greedy_objective = self.greedy_solution(problem)
+        pair_task, pair_year = build_assignment_pairs(problem)
+        if pair_task.size == 0:
+            return greedy_years
+        
+        # 終了翌年実施との差分ペナルティ（負値ほど早期実施の便益が大きい）
+        penalty_per_year = problem.penalty_coefficient * problem.cost * PENALTY_RATE
+        deferred_years = problem.end_year + 1 - problem.start_year
+        objective = penalty_per_year[pair_task] * (pair_year - deferred_years)
+        
+        build_start = time.time()
+        with tempfile.TemporaryDirectory(prefix='delegator_milp_') as tmpdir:
+            mps_path = os.path.join(tmpdir, 'model.mps')
+            mst_path = os.path.join(tmpdir, 'start.mst')
+            sol_path = os.path.join(tmpdir, 'model.sol')
+            write_mps(mps_path, problem, pair_task, pair_year, objective)
+            
+            cmd = [cbc_path(), mps_path]
+            if self.warm_start:
+                write_mip_start(mst_path, pair_task, pair_year, greedy_years, problem.start_year)
+                cmd += ['-mips', mst_path]
+            if self.time_limit is not None:
+                cmd += ['-sec', str(self.time_limit)]
+            cmd += ['-ratio', str(self.mip_gap)]
+            if self.threads:
+                cmd += ['-threads', str(self.threads)]
+            cmd += ['-solve', '-printingOptions', 'all', '-solution', sol_path]
+            build_time = time.time() - build_start
+            
+            logger.info(f"MILP model: {pair_task.size} variables, {problem.n_tasks + problem.capacity.size} constraints "
+                        f"(built in {build_time:.3f}s)")
+            
+            solve_start = time.time()
+            completed = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+            cbc_time = time.time() - solve_start
+            logger.debug(completed.stdout)
+            
+            if completed.returncode != 0 or not os.path.exists(sol_path):
+                logger.warning(f"CBC failed (exit {completed.returncode}); falling back to greedy schedule")
+                self.info = {'mip_status': 'error', 'build_time': build_time, 'cbc_time': cbc_time}
+                return greedy_years
+            
+            status, values = read_solution(sol_path, pair_task.size)
+        
+        # CBCの目的関数値は終了翌年実施との差分のため、全タスク未実施時のペナルティを足して総額に換算
+        match = STATUS_PATTERN.match(status)
+        mip_objective = None
+        if match and problem.lifecycle is None:
+            deferred_penalty = penalty_per_year * np.maximum(problem.end_year + 1 - problem.earliest_start, 0)
+            mip_objective = float(match.group('value')) + float(deferred_penalty.sum())
+        status = match.group('status') if match else status
+        self.info = {'mip_status': status, 'mip_objective': mip_objective, 'build_time': build_time,
+                     'cbc_time': cbc_time, 'variables': int(pair_task.size)}
+        if status.startswith('Infeasible') or status.startswith('Integer infeasible'):
+            logger.warning(f"CBC returned '{status}'; falling back to greedy schedule")
+            self.info['objective'] = greedy_objective
+            return greedy_years
+        
+        chosen = values > 0.5
+        years = np.full(problem.n_tasks, -1, dtype=np.int64)
+        years[pair_task[chosen]] = problem.start_year + pair_year[chosen]
+        years = prune(problem, years)
+        
+        # 返す解の遅延ペナルティ総額（他の戦略の記録値 SchedulingProblem.objective と同じ尺度）
+        objective = problem.objective(years)
+        if objective > greedy_objective:
+            years, objective = greedy_years, greedy_objective
+        self.info['objective'] = objective
+        return years
+
+
+SOLVER_STRATEGIES.register(MilpEngine())
@@ -0,0 +1,220 @@
+"""
+Delegator v5.2.1: ポートフォリオ並列ソルバー
+複数のソルバー構成（並べ替えキー・同順位の乱数化・局所探索のシード・任意でMILP）をプロセスプールで同時に実行し、
+共有の暫定最良解（incumbent）を更新しながら期限までに得られた最良のスケジュールを返す
+
+問題配列は共有メモリ（SharedProblem）で子プロセスへ公開し、暫定最良解は共有メモリ上の
+目的関数値・実施年配列とロックで保持する。局所探索の構成は一定時間ごとに暫定最良解から再出発するため、
+コア数を増やすほど同じ経過時間でより良い解が得られる。
+
+Author: CWD Agent
+Version: v5.2.1
+"""
+
+import logging
+import math
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from delegator_v5_2_1 import (
+    SOLVER_STRATEGIES,
+    SchedulingProblem,
+    SolverEngine
+)
+from delegator_localsearch_v5_2_1 import improve_schedule
+from delegator_scenarios_v5_2_1 import SharedProblem
+
+logger = logging.getLogger(__name__)
+
+# ポートフォリオの基本戦略
+BASE_STRATEGIES = ('greedy_priority', 'cost_optimal', 'penalty_minimization')
+
+# 局所探索の構成が暫定最良解から再出発する間隔（秒）
+RESTART_INTERVAL = 1.0
+
+# 局所探索中に暫定最良解へ書き込む最小間隔（秒）
+PUBLISH_INTERVAL = 0.05
+
+
+def default_portfolio(n_workers: int, local_search: bool = True, include_milp: bool = False,
+                      seed: int = 0) -> List[Dict[str, Any]]:
+    """既定の構成一覧（基本戦略の貪欲配置 → MILP → 同順位乱数化＋局所探索をワーカー数まで）
+    
+    構成は {'strategy', 'options', 'local_search', 'seed'} の辞書。貪欲配置はすぐ終わるため、
+    残りのワーカーは期限まで局所探索（またはMILP）を続ける。
+    """
+    configs = [{'strategy': name, 'options': {}, 'local_search': False} for name in BASE_STRATEGIES]
+    if include_milp:
+        configs.append({'strategy': 'milp', 'options': {}, 'local_search': False})
+    if local_search:
+        n_search = max(n_workers - int(include_milp), 1)
+        for k in range(n_search):
+            configs.append({
+                'strategy': BASE_STRATEGIES[k % len(BASE_STRATEGIES)],
+                'options': {'tie_break_seed': seed + k} if k >= len(BASE_STRATEGIES) else {},
+                'local_search': True,
+                'seed': seed + k
+            })
+    return configs
+
+
+def config_label(config: Dict[str, Any]) -> str:
+    """構成の表示名"""
+    label = config['strategy']
+    if 'tie_break_seed' in config.get('options', {}):
+        label += f"/tie{config['options']['tie_break_seed']}"
+    if config.get('local_search'):
+        label += f"+ls{config.get('seed')}"
+    return label
+
+
+class Incumbent:
+    """プロセス間で共有する暫定最良解（目的関数値・実施年配列・更新した構成番号）"""
+    
+    def __init__(self, n_tasks: int, context=None):
+        context = context or mp.get_context()
+        self.lock = context.Lock()
+        self.value = context.RawValue('d', math.inf)
+        self.owner = context.RawValue('q', -1)
+        self.years = context.RawArray('q', max(n_tasks, 1))
+        self.n_tasks = n_tasks
+    
+    def _array(self) -> np.ndarray:
+        return np.frombuffer(self.years, dtype=np.int64, count=self.n_tasks)
+    
+    def offer(self, objective: float, years: np.ndarray, owner: int) -> bool:
+        """より良い解なら暫定最良解を更新"""
+        if objective >= self.value.value:  # ロックなしの事前判定（更新はロック内で再確認）
+            return False
+        with self.lock:
+            if objective >= self.value.value:
+                return False
+            self._array()[:] = years
+            self.value.value = objective
+            self.owner.value = owner
+            return True
+    
+    def snapshot(self):
+        """(目的関数値, 実施年配列のコピー, 構成番号)"""
+        with self.lock:
+            return self.value.value, self._array().copy(), self.owner.value
+
+
+def run_config(problem: SchedulingProblem, incumbent: Incumbent, index: int, config: Dict[str, Any],
+               deadline: float) -> Dict[str, Any]:
+    """1構成を期限まで実行し、暫定最良解を更新しながら構成別の結果を返す"""
+    start_time = time.time()
+    label = config_label(config)
+    if start_time >= deadline:
+        return {'config': label, 'objective': math.inf, 'time': 0.0, 'skipped': True}
+    
+    options = dict(config.get('options', {}))
+    if config['strategy'] == 'milp':
+        options.setdefault('time_limit', max(deadline - start_time, 1.0))
+    engine = SOLVER_STRATEGIES.get(config['strategy']).configure(**options)
+    years = engine.solve(problem)
+    objective = problem.objective(years)
+    incumbent.offer(objective, years, index)
+    best = objective
+    
+    if config.get('local_search') and problem.lifecycle is None:
+        rounds = 0
+        last_publish = [0.0]
+        
+        def publish(state: Dict[str, Any]) -> None:
+            now = time.time()
+            if now - last_publish[0] >= PUBLISH_INTERVAL:
+                incumbent.offer(state['objective'], state['years'], index)
+                last_publish[0] = now
+        
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0.01:
+                break
+            # 他の構成の解の方が良ければそこから再出発
+            shared_objective, shared_years, _ = incumbent.snapshot()
+            if shared_objective < objective:
+                years, objective = shared_years, shared_objective
+            years, stats = improve_schedule(problem, years, time_budget=min(RESTART_INTERVAL, remaining),
+                                            seed=config.get('seed', 0) * 1000 + rounds, callback=publish)
+            objective = stats['objective']
+            incumbent.offer(objective, years, index)
+            best = min(best, objective)
+            rounds += 1
+    
+    return {'config': label, 'objective': best, 'time': time.time() - start_time, 'skipped': False}
+
+
+# --- 子プロセス側の状態（initializerで共有メモリに接続） ---
+
+_worker_problem: Optional[SchedulingProblem] = None
+_worker_incumbent: Optional[Incumbent] = None
+_worker_blocks = []
+
+
+def _init_worker(spec: Dict[str, Any], incumbent: Incumbent) -> None:
+    global _worker_problem, _worker_incumbent, _worker_blocks
+    logging.disable(logging.INFO)  # 子プロセスの構成ごとのログは抑制
+    _worker_problem, _worker_blocks = SharedProblem.attach(spec)
+    _worker_incumbent = incumbent
+
+
+def _run_config(args) -> Dict[str, Any]:
+    index, config, deadline = args
+    return run_config(_worker_problem, _worker_incumbent, index, config, deadline)
+
+
+class PortfolioEngine(SolverEngine):
+    """複数のソルバー構成をプロセスプールで同時に実行し、期限までの最良解を採用するエンジン"""
+    name = 'portfolio'
+    description = '複数構成の並列競争（暫定最良解を共有）'
+    
+    time_limit: float = 10.0                         # 期限（秒）
+    max_workers: Optional[int] = None                # ワーカー数（省略時はCPUコア数）
+    configs: Optional[List[Dict[str, Any]]] = None   # 構成一覧（省略時はdefault_portfolio）
+    include_milp: bool = False                       # 既定構成にMILPを含める
+    seed: int = 0                                    # 既定構成の乱数シードの起点
+    
+    def budget_for(self, n_tasks: int) -> float:
+        # 期限まで探索を続けるため、期限とプロセス起動の余裕を上限とする
+        return self.time_limit + 5.0
+    
+    def solve(self, problem: SchedulingProblem) -> np.ndarray:
+        start_time = time.time()
+        max_workers = self.max_workers or os.cpu_count() or 1
+        configs = self.configs or default_portfolio(max_workers, include_milp=self.include_milp, seed=self.seed)
+        deadline = start_time + self.time_limit
+        context = mp.get_context()
+        incumbent = Incumbent(problem.n_tasks, context)
+        tasks = [(index, config, deadline) for index, config in enumerate(configs)]
+        
+        logger.info(f"Portfolio: {len(configs)} configurations on {max_workers} workers, {self.time_limit:.1f}s limit")
+        if max_workers == 1:
+            runs = [run_config(problem, incumbent, *task) for task in tasks]
+        else:
+            shared = SharedProblem(problem)
+            try:
+                with ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=_init_worker,
+                                         initargs=(shared.spec, incumbent)) as pool:
+                    runs = list(pool.map(_run_config, tasks))
+            finally:
+                shared.close()
+        
+        objective, years, owner = incumbent.snapshot()
+        self.info = {
+            'winner': config_label(configs[owner]) if owner >= 0 else None,
+            'objective': objective,
+            'workers': max_workers,
+            'configs': runs,
+            'wall_time': time.time() - start_time
+        }
+        logger.info(f"Portfolio best: {objective:,.0f} by {self.info['winner']} in {self.info['wall_time']:.3f}s")
+        return years if owner >= 0 else np.full(problem.n_tasks, -1, dtype=np.int64)
+
+
+SOLVER_STRATEGIES.register(PortfolioEngine())
@@ -0,0 +1,191 @@
+"""
+Delegator v5.2.1: ローリングホライズン再計画
+30〜50年の長期計画を、直近N年度は年度単位（詳細）・その先は数年単位のブロック（集約）で解き、
+先頭年度の配置のみを確定して1年ずつ前進する
+
+- 各ウィンドウの問題は「詳細年度＋集約ブロック（容量は年度の合計）」のスロットで構成し、
+  対象タスクはウィンドウ内に最早開始年がある未確定タスクに限るため、計画期間が延びても1回の再計画の規模は一定
+- 前回ウィンドウの詳細年度の配置を初期解として読み込み、収まらなくなったタスクと集約ブロック・
+  新たにウィンドウへ入ったタスクのみを部分戦略の順序で配置する（warm start）
+- 集約ブロックの配置は容量の見込みを確保する仮配置で、毎回配置し直す（引き継ぐと後から入る高優先度の
+  タスクが締め出され、全期間一括の貪欲解より悪化する）
+
+Author: CWD Agent
+Version: v5.2.1
+"""
+
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from delegator_v5_2_1 import (
+    SOLVER_STRATEGIES,
+    SchedulingProblem,
+    SolverEngine,
+    YearSlotIndex,
+    greedy_first_fit
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RollingWindow:
+    """計画期間の一部を詳細年度＋集約ブロックのスロットで表した部分問題"""
+    
+    def __init__(self, problem: SchedulingProblem, first_year: int, detail_years: int, aggregate_years: int,
+                 block_years: int, fixed: np.ndarray):
+        start_year, end_year = problem.start_year, problem.end_year
+        self.first_year = first_year
+        self.detail_end = min(first_year + detail_years - 1, end_year)
+        self.last_year = min(self.detail_end + aggregate_years, end_year)
+        self.n_detail = self.detail_end - first_year + 1
+        
+        # 年度→スロット（詳細年度は1年1スロット、集約部分は計画開始年起点の暦年区切りのブロック）
+        window_years = np.arange(first_year, self.last_year + 1)
+        year_slot = np.arange(len(window_years))
+        aggregate = window_years > self.detail_end
+        blocks = (window_years[aggregate] - start_year) // block_years
+        year_slot[aggregate] = self.n_detail + np.unique(blocks, return_inverse=True)[1]
+        self.n_slots = int(year_slot[-1]) + 1
+        
+        # 対象タスク: 未確定・最遅完了年がウィンドウ開始以降・最早開始年がウィンドウ内
+        self.tasks = np.flatnonzero(~fixed & (problem.latest_end >= first_year) &
+                                    (problem.earliest_start <= self.last_year))
+        first = np.clip(problem.earliest_start[self.tasks], first_year, self.last_year) - first_year
+        last = np.clip(problem.latest_end[self.tasks], first_year, self.last_year) - first_year
+        
+        offset = first_year - start_year
+        capacity = np.zeros((len(problem.capacity), self.n_slots))
+        np.add.at(capacity.T, year_slot, problem.capacity[:, offset:offset + len(window_years)].T)
+        
+        # スロット番号を年度とみなした問題（集約ブロック内の遅延はブロック数で近似）
+        self.problem = SchedulingProblem(
+            start_year=first_year,
+            end_year=first_year + self.n_slots - 1,
+            earliest_start=first_year + year_slot[first],
+            latest_end=first_year + year_slot[last],
+            cost=problem.cost[self.tasks],
+            priority=problem.priority[self.tasks],
+            penalty_coefficient=problem.penalty_coefficient[self.tasks],
+            capacity=capacity,
+            demand=problem.demand[:, self.tasks],
+            resource_names=problem.resource_names
+        )
+    
+    def initial_slots(self, planned_year: np.ndarray) -> np.ndarray:
+        """前回の詳細年度の配置をこのウィンドウのスロットへ対応付け（対応しないタスクは-1）"""
+        slots = np.full(len(self.tasks), -1, dtype=np.int64)
+        years = planned_year[self.tasks]
+        detail = (years >= self.first_year) & (years <= self.detail_end)
+        slots[detail] = years[detail] - self.first_year
+        return slots
+    
+    def warm_start(self, engine: SolverEngine, slots: np.ndarray) -> np.ndarray:
+        """初期配置のうち収まるものを部分戦略の順序で読み込み、残りを貪欲配置してスロット配列を返す"""
+        problem = self.problem
+        index = YearSlotIndex(problem.capacity, problem.demand)
+        entries = YearSlotIndex.sparse_demand(problem.demand)
+        first = (problem.earliest_start - self.first_year).tolist()
+        last = (problem.latest_end - self.first_year).tolist()
+        initial = slots.tolist()
+        result = [-1] * problem.n_tasks
+        
+        order = engine.order(problem).tolist()
+        for t in order:
+            i = initial[t]
+            if i >= 0 and first[t] <= i <= last[t] and index.fits(i, entries[t]):
+                index.reserve(i, entries[t])
+                result[t] = i
+        for t in order:
+            if result[t] < 0:
+                i = index.first_fit(first[t], last[t], entries[t])
+                if i >= 0:
+                    index.reserve(i, entries[t])
+                    result[t] = i
+        return np.array(result, dtype=np.int64)
+
+
+class RollingHorizonEngine(SolverEngine):
+    """直近detail_years年度を詳細に、その先を集約して解き、1年ずつ前進するローリングホライズンエンジン
+    
+    local_search_time は全ウィンドウ合計の改善フェーズの時間予算（各ウィンドウに等分）。
+    warm_start=False の場合は各ウィンドウを部分戦略の solve() で解き直す（MILP等を部分戦略にする場合）。
+    """
+    name = 'rolling'
+    description = 'ローリングホライズン（詳細＋集約年度、前回解から再開）'
+    time_budget = 2.0
+    
+    detail_years: int = 5                   # 詳細に計画する年度数（先頭年度のみ確定）
+    aggregate_years: int = 10               # 詳細年度の先で集約して考慮する年数
+    block_years: int = 5                    # 集約ブロックの年数
+    step_years: int = 1                     # 1回に確定して前進する年数
+    sub_strategy: str = 'greedy_priority'   # ウィンドウごとの戦略
+    sub_options: Optional[Dict[str, Any]] = None
+    warm_start: bool = True                 # 前回ウィンドウの配置から再開
+    
+    def solve(self, problem: SchedulingProblem) -> np.ndarray:
+        start_time = time.time()
+        if problem.lifecycle is not None:
+            logger.warning("Rolling horizon does not support lifecycle plans; solving the full horizon")
+            return greedy_first_fit(problem, self.order(problem))
+        if self.detail_years < 1 or self.block_years < 1 or self.step_years < 1:
+            raise ValueError("detail_years, block_years and step_years must be positive")
+        
+        step = min(self.step_years, self.detail_years)
+        n_rolls = max(-(-(problem.n_years - self.detail_years) // step), 0) + 1
+        options = dict(self.sub_options or {})
+        options.setdefault('local_search_time', self.local_search_time / n_rolls)
+        engine = SOLVER_STRATEGIES.get(self.sub_strategy).configure(**options)
+        
+        years = np.full(problem.n_tasks, -1, dtype=np.int64)
+        fixed = np.zeros(problem.n_tasks, dtype=bool)
+        planned_year = np.full(problem.n_tasks, -1, dtype=np.int64)
+        
+        roll_times, window_tasks, kept = [], [], 0
+        first_year = problem.start_year
+        while first_year <= problem.end_year:
+            roll_start = time.time()
+            window = RollingWindow(problem, first_year, self.detail_years, self.aggregate_years,
+                                   self.block_years, fixed)
+            if self.warm_start:
+                initial = window.initial_slots(planned_year)
+                slots = window.warm_start(engine, initial)
+                kept += int(np.sum((initial >= 0) & (slots == initial)))
+                slot_years = engine.improve(window.problem, np.where(slots >= 0, first_year + slots, -1))
+                slots = np.where(slot_years >= 0, slot_years - first_year, -1)
+            else:
+                slot_years = engine.solve(window.problem)
+                slots = np.where(slot_years >= 0, slot_years - first_year, -1)
+            
+            # 先頭step年度（最後のウィンドウでは詳細年度すべて）の配置を確定
+            final = window.detail_end >= problem.end_year
+            commit = (slots >= 0) & (slots < (window.n_detail if final else step))
+            tasks = window.tasks
+            years[tasks[commit]] = first_year + slots[commit]
+            fixed[tasks[commit]] = True
+            
+            detail = (slots >= 0) & (slots < window.n_detail)
+            planned_year[tasks] = np.where(detail, first_year + slots, -1)
+            
+            roll_times.append(time.time() - roll_start)
+            window_tasks.append(len(tasks))
+            if final:
+                break
+            first_year += step
+        
+        self.info = {
+            'rolls': len(roll_times),
+            'roll_times': roll_times,
+            'mean_roll_time': float(np.mean(roll_times)) if roll_times else 0.0,
+            'max_window_tasks': max(window_tasks, default=0),
+            'warm_start_kept': kept,
+            'time': time.time() - start_time
+        }
+        logger.info(f"Rolling horizon: {len(roll_times)} windows, at most {self.info['max_window_tasks']} tasks, "
+                    f"{self.info['mean_roll_time'] * 1000:.1f}ms per window")
+        return years
+
+
+SOLVER_STRATEGIES.register(RollingHorizonEngine())
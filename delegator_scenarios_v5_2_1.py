@@ -0,0 +1,246 @@
+"""
+Delegator v5.2.1: 予算・施工能力シナリオの並列一括計算
+予算・施工件数・計画期間の組み合わせ（数百通り）をプロセスプールで解き、Pareto分析用の結果表を返す
+
+問題配列（タスク列・資源×年度の容量行列・資源×タスクの消費量行列）は共有メモリに一度だけ配置し、
+子プロセスは複製・pickleなしで読み取り専用のビューとして参照する。
+シナリオごとに差し替えるのは容量行列の該当資源行と計画期間のみ。
+
+Author: CWD Agent
+Version: v5.2.1
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+import time
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from delegator_v5_2_1 import (
+    PENALTY_RATE,
+    SOLVER_STRATEGIES,
+    SchedulingProblem,
+    lazy_import
+)
+
+# 結果表の作成時のみ読み込む（SharedProblemを使う並列戦略の子プロセスでは不要）
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# 共有メモリに配置するSchedulingProblemの配列
+SHARED_FIELDS = ('earliest_start', 'latest_end', 'cost', 'priority', 'penalty_coefficient', 'capacity', 'demand')
+
+# 資源名以外に指定できるシナリオ項目
+SCENARIO_KEYS = ('end_year', 'strategy')
+
+# Pareto判定の軸（最小化・最大化）
+# total_penaltyは未配置タスクの先送りペナルティを含むため、予算を絞るほど費用は下がりペナルティは上がる
+PARETO_MINIMIZE = ('total_cost', 'total_penalty')
+PARETO_MAXIMIZE = ('coverage',)
+
+
+def expand_grid(grid: Any) -> List[Dict[str, Any]]:
+    """シナリオ指定を展開（{項目: 値リスト}は直積、シナリオ辞書のリストはそのまま）"""
+    if isinstance(grid, Mapping):
+        keys = list(grid)
+        values = [v if isinstance(v, (list, tuple, range, np.ndarray)) else [v] for v in grid.values()]
+        return [dict(zip(keys, combination)) for combination in itertools.product(*values)]
+    return [dict(scenario) for scenario in grid]
+
+
+class SharedProblem:
+    """SchedulingProblemの配列を共有メモリに配置し、子プロセスから複製なしで参照する"""
+    
+    def __init__(self, problem: SchedulingProblem):
+        self._blocks: List[shared_memory.SharedMemory] = []
+        arrays = {}
+        for name in SHARED_FIELDS:
+            array = np.ascontiguousarray(getattr(problem, name))
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self._blocks.append(block)
+            arrays[name] = (block.name, array.shape, array.dtype.str)
+        
+        # 子プロセスへ渡す記述子（配列本体は含まない）
+        self.spec = {
+            'arrays': arrays,
+            'start_year': problem.start_year,
+            'end_year': problem.end_year,
+            'resource_names': list(problem.resource_names),
+            'lifecycle': problem.lifecycle  # 設備別の劣化スコア表（小さいためpickleで渡す）
+        }
+    
+    @staticmethod
+    def attach(spec: Dict[str, Any]) -> Tuple[SchedulingProblem, List[shared_memory.SharedMemory]]:
+        """記述子から共有メモリ上の読み取り専用ビューで問題を復元"""
+        blocks = []
+        arrays = {}
+        for name, (block_name, shape, dtype) in spec['arrays'].items():
+            block = shared_memory.SharedMemory(name=block_name)
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            array.flags.writeable = False
+            blocks.append(block)
+            arrays[name] = array
+        problem = SchedulingProblem(
+            start_year=spec['start_year'],
+            end_year=spec['end_year'],
+            resource_names=spec['resource_names'],
+            lifecycle=spec.get('lifecycle'),
+            **arrays
+        )
+        return problem, blocks
+    
+    def close(self) -> None:
+        """共有メモリを解放"""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def evaluate_scenario(problem: SchedulingProblem, scenario: Dict[str, Any],
+                      strategy: str = "greedy_priority", options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """1シナリオを解いて集計指標を返す（problemの配列は変更しない）"""
+    strategy = scenario.get('strategy', strategy)
+    end_year = int(scenario.get('end_year', problem.end_year))
+    n_years = end_year - problem.start_year + 1
+    
+    # 指定資源の年度別容量を一律値で差し替え
+    capacity = problem.capacity[:, :n_years].copy()
+    for name, value in scenario.items():
+        if name not in SCENARIO_KEYS:
+            capacity[problem.resource_names.index(name)] = value
+    
+    scenario_problem = SchedulingProblem(
+        start_year=problem.start_year,
+        end_year=end_year,
+        earliest_start=problem.earliest_start,
+        latest_end=problem.latest_end,
+        cost=problem.cost,
+        priority=problem.priority,
+        penalty_coefficient=problem.penalty_coefficient,
+        capacity=capacity,
+        demand=problem.demand,
+        resource_names=problem.resource_names,
+        lifecycle=problem.lifecycle
+    )
+    
+    engine = SOLVER_STRATEGIES.get(strategy).configure(**(options or {}))
+    start_time = time.time()
+    years = engine.solve(scenario_problem)
+    if problem.lifecycle is not None:
+        years = problem.lifecycle.prune(years)
+    solve_time = time.time() - start_time
+    
+    active, penalty_coefficient = scenario_problem.effective(years)
+    placed = years >= 0
+    # 未配置タスクはグリッド共通の最長計画期間の翌年実施とみなす（計画期間の異なるシナリオ間で比較可能）
+    effective = np.where(placed, years, problem.end_year + 1)
+    delay = np.maximum(effective - problem.earliest_start, 0)
+    penalties = penalty_coefficient * delay * problem.cost * PENALTY_RATE
+    return {
+        **scenario,
+        'strategy': strategy,
+        'end_year': end_year,
+        'total_cost': float(problem.cost[placed].sum()),
+        'scheduled_penalty': float(penalties[placed].sum()),
+        'total_penalty': float(penalties[active].sum()),
+        'objective': scenario_problem.objective(years),
+        'scheduled_tasks': int(placed.sum()),
+        'coverage': float(placed.sum() / active.sum()) if active.any() else 0.0,
+        'solve_time': solve_time
+    }
+
+
+# --- 子プロセス側の状態（initializerで共有メモリに接続） ---
+
+_worker_problem: Optional[SchedulingProblem] = None
+_worker_blocks: List[shared_memory.SharedMemory] = []
+
+
+def _init_worker(spec: Dict[str, Any]) -> None:
+    global _worker_problem, _worker_blocks
+    _worker_problem, _worker_blocks = SharedProblem.attach(spec)
+
+
+def _run_scenario(args: Tuple[Dict[str, Any], str, Dict[str, Any]]) -> Dict[str, Any]:
+    scenario, strategy, options = args
+    return evaluate_scenario(_worker_problem, scenario, strategy, options)
+
+
+def pareto_front(frame: pd.DataFrame, minimize=PARETO_MINIMIZE, maximize=PARETO_MAXIMIZE) -> np.ndarray:
+    """他のどの行にも支配されない行（全軸で同等以上かついずれかで優越する行がない）"""
+    values = np.column_stack(
+        [frame[c].to_numpy(dtype=float) for c in minimize] + [-frame[c].to_numpy(dtype=float) for c in maximize]
+    )
+    no_worse = np.all(values[:, None, :] <= values[None, :, :], axis=2)
+    better = np.any(values[:, None, :] < values[None, :, :], axis=2)
+    dominated = np.any(no_worse & better, axis=0)
+    return ~dominated
+
+
+def solve_scenarios(scheduler, grid: Any, strategy: str = "greedy_priority",
+                    max_workers: Optional[int] = None, **options) -> pd.DataFrame:
+    """シナリオ群を共有メモリ＋プロセスプールで一括計算し、1シナリオ1行の結果表を返す
+    
+    grid: {項目: 値リスト}（直積で展開）またはシナリオ辞書のリスト。
+    項目は資源名（Budget, Crew, 登録済み資源。全年度一律の容量）、end_year、strategy。
+    end_yearが計画期間を超える場合、容量の未定義な年度がある登録済み資源はgridで容量を指定する（ValueError）。
+    total_penaltyは未配置タスクを最長のend_yearの翌年実施とみなした遅延ペナルティ総額（scheduled_penaltyは配置分のみ）。
+    max_workers=1またはシナリオ1件の場合はプロセスを起動せず同一プロセスで計算する。
+    """
+    start_time = time.time()
+    scenarios = expand_grid(grid)
+    if not scenarios:
+        return pd.DataFrame()
+    
+    # 最長の計画期間で問題を作成し、各シナリオは年度方向に切り出して使う
+    end_years = [int(s.get('end_year', scheduler.end_year)) for s in scenarios]
+    if min(end_years) < scheduler.start_year:
+        raise ValueError(f"Scenario end_year must be >= start_year {scheduler.start_year}")
+    problem = scheduler.build_problem(end_year=max(end_years))
+    
+    # 登録済み資源は計画期間外の年度に容量がない（0扱いで全件未配置になる）ため、グリッドで容量を指定しない限り拒否
+    for name, resource in scheduler.resources.items():
+        for scenario, end_year in zip(scenarios, end_years):
+            missing = [y for y in range(scheduler.end_year + 1, end_year + 1) if y not in resource.capacity_per_year]
+            if missing and name not in scenario:
+                raise ValueError(f"Resource {name} has no capacity for {missing[0]}-{missing[-1]} "
+                                 f"(scenario end_year {end_year}); register those years or include {name} in the grid")
+    
+    unknown = {key for s in scenarios for key in s} - set(problem.resource_names) - set(SCENARIO_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown scenario keys: {sorted(unknown)} "
+                         f"(resources: {problem.resource_names}, options: {list(SCENARIO_KEYS)})")
+    
+    max_workers = max_workers or os.cpu_count() or 1
+    logger.info(f"Solving {len(scenarios)} scenarios over {problem.n_tasks} tasks with {max_workers} workers")
+    
+    if max_workers == 1 or len(scenarios) == 1:
+        rows = [evaluate_scenario(problem, s, strategy, options) for s in scenarios]
+    else:
+        shared = SharedProblem(problem)
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                     initargs=(shared.spec,)) as pool:
+                chunksize = max(1, len(scenarios) // (max_workers * 4))
+                rows = list(pool.map(_run_scenario, [(s, strategy, options) for s in scenarios],
+                                     chunksize=chunksize))
+        finally:
+            shared.close()
+    
+    frame = pd.DataFrame(rows)
+    frame.insert(0, 'scenario', np.arange(len(frame)))
+    frame['pareto'] = pareto_front(frame)
+    
+    logger.info(f"Solved {len(frame)} scenarios in {time.time() - start_time:.3f}s "
+                f"({int(frame['pareto'].sum())} on the Pareto front)")
+    return frame
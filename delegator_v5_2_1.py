@@ -7,22 +7,428 @@ Version: v5.2.1
 Date: 2025-07-25
 """
 
-import pandas as pd
+from __future__ import annotations
+
 import numpy as np
 from typing import Dict, List, Any, Optional, Tuple
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import ItemsView, Mapping, ValuesView
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
 import json
 import logging
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
-import multiprocessing as mp
-from joblib import Parallel, delayed
+import contextlib
+import copy
+import functools
+import hashlib
+import importlib
+import math
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
 import time
 
-# ログ設定
-logging.basicConfig(level=logging.INFO)
+# ログ設定（ハンドラー・レベルの設定は利用側のアプリケーションに任せる）
 logger = logging.getLogger(__name__)
 
+
+class _LazyModule:
+    """属性の初回参照時に読み込むモジュールの代理（重い依存の読み込みを使用する処理まで遅延）"""
+    
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+    
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+    
+    def __repr__(self) -> str:
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> _LazyModule:
+    """属性の初回参照時に読み込まれるモジュールを返す"""
+    return _LazyModule(name)
+
+
+# pandasはCSV読み込み・表形式の出力でのみ使用（求解・子プロセスでは読み込まない）
+pd = lazy_import('pandas')
+
+# 基準年（築年数・最早開始年の算出に使用）
+BASE_YEAR = 2025
+
+# 設備CSVの遊具タイプ列（この順序で遊具IDを採番）
+EQUIPMENT_TYPE_COLUMNS = ['踏み板式ブランコ', 'スベリ台', 'ﾌｨｰﾙﾄﾞｱｽﾚﾁｯｸ遊具', 'スプリング遊具', 'ベンチ']
+
+# 複数設置を個別の遊具として展開するタイプ
+MULTI_INSTANCE_TYPES = {'ベンチ'}
+
+# 遊具IDに使用するタイプ表記
+EQUIPMENT_ID_LABELS = {'ﾌｨｰﾙﾄﾞｱｽﾚﾁｯｸ遊具': 'Athletic遊具'}
+
+# 点検グレード別の劣化補正値
+GRADE_SCORES = {'a': 0.1, 'b': 0.3, 'c': 0.5, 'd': 0.7, 'e': 0.9}
+DEFAULT_INSPECTION_GRADE = 'b'
+
+# 遅延ペナルティ率（1年・係数1あたりコストの0.1%）
+PENALTY_RATE = 0.001
+
+# 劣化スコアからタスクのペナルティ係数への換算倍率
+PENALTY_COEFFICIENT_SCALE = 1000
+
+# 優先度2〜5に昇格する劣化スコアの閾値
+PRIORITY_THRESHOLDS = [0.2, 0.4, 0.6, 0.8]
+
+# 点検履歴CSVの分割読み込み行数（メモリ使用量は設備数に比例し、履歴行数に依存しない）
+INSPECTION_CHUNK_ROWS = 200000
+
+# 読み込み済みフリートのディスクキャッシュ形式（互換性のない変更時に更新）と既定の保存先
+FLEET_CACHE_VERSION = 2
+DEFAULT_FLEET_CACHE_DIR = '.fleet_cache'
+
+
+def _coerce_equipment_counts(column: Optional[pd.Series], length: int) -> np.ndarray:
+    """遊具数の列を整数配列に変換（空欄・欠損・非整数は0）"""
+    if column is None:
+        return np.zeros(length, dtype=np.int64)
+    
+    if pd.api.types.is_numeric_dtype(column):
+        counts = np.trunc(column.to_numpy(dtype=float, na_value=np.nan))
+    else:
+        text = column.astype('string').str.strip()
+        counts = pd.to_numeric(text.where(text.str.fullmatch(r'[+-]?\d+', na=False)), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    
+    counts = np.nan_to_num(counts, nan=0.0)
+    return np.clip(counts, 0, None).astype(np.int64)
+
+
+def _expand_equipment_frame(equipment_df: pd.DataFrame, max_equipment: int) -> pd.DataFrame:
+    """公園単位の設備データを遊具単位の行に展開"""
+    n_parks = len(equipment_df)
+    install_years = pd.to_numeric(equipment_df['西暦年'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    valid_park = ~np.isnan(install_years)
+    
+    # (公園, タイプ) ごとの遊具数行列
+    counts = np.column_stack([
+        _coerce_equipment_counts(equipment_df.get(eq_type), n_parks)
+        for eq_type in EQUIPMENT_TYPE_COLUMNS
+    ])
+    counts[~valid_park] = 0
+    
+    multi = np.array([eq_type in MULTI_INSTANCE_TYPES for eq_type in EQUIPMENT_TYPE_COLUMNS])
+    instances = np.where(multi, counts, np.minimum(counts, 1)).ravel()
+    
+    # 公園→タイプ→連番の順に展開し、上限件数で打ち切り
+    cell = np.repeat(np.arange(instances.size), instances)[:max_equipment]
+    offsets = np.cumsum(instances) - instances
+    instance_no = np.arange(cell.size) - offsets[cell] + 1
+    park_idx, type_idx = np.divmod(cell, len(EQUIPMENT_TYPE_COLUMNS))
+    
+    # ベンチの複数設置は連番付きID
+    numbered = multi[type_idx] & (counts.ravel()[cell] > 1)
+    type_names = np.array(EQUIPMENT_TYPE_COLUMNS, dtype=object)[type_idx]
+    single_labels = np.array([EQUIPMENT_ID_LABELS.get(t, t) for t in EQUIPMENT_TYPE_COLUMNS], dtype=object)[type_idx]
+    
+    labels = pd.Series(single_labels)
+    labels[numbered] = (pd.Series(type_names[numbered]) + '_' + pd.Series(instance_no[numbered]).astype(str).str.zfill(2)).to_numpy()
+    equipment_ids = 'eq_' + pd.Series(np.arange(cell.size)).astype(str).str.zfill(4) + '_' + labels
+    
+    return pd.DataFrame({
+        'equipment_id': equipment_ids.to_numpy(dtype=object),
+        'park_name': equipment_df['公園名'].to_numpy(dtype=object)[park_idx],
+        'equipment_type': type_names,
+        'install_year': install_years[park_idx].astype(np.int64)
+    })
+
+
+def _inspection_years(values: pd.Series) -> np.ndarray:
+    """点検年月（YYYY-MM、YYYY/MM/DD等）を年単位の実数に変換（不明はNaN、重複値は一度だけ解析）"""
+    codes, uniques = pd.factorize(values)
+    parts = pd.Series(uniques, dtype=object).astype(str).str.extract(r'^\s*(\d{4})[-/](\d{1,2})')
+    parsed = (parts[0].astype(float) + (parts[1].astype(float) - 1) / 12).to_numpy()
+    return np.append(parsed, np.nan)[codes]  # 欠損（コード-1）は末尾のNaNを参照
+
+
+def _latest_inspections(frame: pd.DataFrame) -> pd.DataFrame:
+    """equipment_idごとの最新判定の行（点検年月の新しい行、同一年月は後の行が優先）"""
+    return frame.sort_values(['_year', '_row'], na_position='first').drop_duplicates('equipment_id', keep='last')
+
+
+def _reduce_inspection_chunk(chunk: pd.DataFrame, first_row: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """点検履歴の1チャンクをequipment_idごとの最新判定と傾向集計量に縮約"""
+    chunk = chunk.dropna(subset=['equipment_id'])
+    ids = chunk['equipment_id'].to_numpy()
+    grades = chunk['劣化判定'] if '劣化判定' in chunk.columns else pd.Series(DEFAULT_INSPECTION_GRADE, index=chunk.index)
+    years = _inspection_years(chunk['点検年月']) if '点検年月' in chunk.columns else np.full(len(chunk), np.nan)
+    
+    latest = _latest_inspections(pd.DataFrame({
+        'equipment_id': ids,
+        '劣化判定': grades.to_numpy(),
+        '_year': years,
+        '_row': np.arange(first_row, first_row + len(chunk))
+    }))
+    
+    # 判定コードの経年回帰用の累積量（点検年月・判定が有効な行のみ）
+    grade_index, grade_values = pd.factorize(grades)
+    codes = np.append(grade_codes(list(grade_values)), -1).astype(float)[grade_index]
+    valid = ~np.isnan(years) & (codes >= 0)
+    x = years[valid] - BASE_YEAR
+    y = codes[valid]
+    sums = pd.DataFrame({'_n': 1.0, '_sx': x, '_sy': y, '_sxy': x * y, '_sxx': x * x},
+                        index=pd.Index(ids[valid], name='equipment_id')).groupby(level=0).sum()
+    return latest, sums
+
+
+def _merge_inspection_chunks(latest: pd.DataFrame, sums: pd.DataFrame, pending: List[Tuple[pd.DataFrame, pd.DataFrame]]
+                             ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """確定済みの最新判定・傾向集計量に、保留中のチャンク別の縮約結果を併合"""
+    latest_frames = [chunk_latest for chunk_latest, _ in pending]
+    sums_frames = [chunk_sums for _, chunk_sums in pending]
+    if len(latest):
+        latest_frames.insert(0, latest)
+    if len(sums):
+        sums_frames.insert(0, sums)
+    latest = _latest_inspections(pd.concat(latest_frames, ignore_index=True))
+    sums = pd.concat(sums_frames).groupby(level=0).sum()
+    return latest, sums
+
+
+def _load_inspection_frame(inspection_csv: str, chunksize: int = INSPECTION_CHUNK_ROWS) -> pd.DataFrame:
+    """点検履歴をチャンク単位で読み込み、equipment_idごとの最新判定と劣化傾向を返す
+    
+    保持するのは設備数に比例する集計量のみで、メモリ使用量は履歴の行数に依存しない。
+    チャンクごとの縮約結果は保留し、保留分が確定済みの設備数に達したときだけ併合する（併合の総コストは
+    チャンク数×設備数に比例せず、保留分は確定済みの設備数＋1チャンク分以下）。
+    grade_trendは判定コード（a=0〜e=4）の年あたり変化量（最小二乗の傾き、履歴2時点未満は0）。
+    """
+    columns = ('equipment_id', '劣化判定', '点検年月')
+    latest = pd.DataFrame(columns=['equipment_id', '劣化判定', '_year', '_row'])
+    sums = pd.DataFrame(columns=['_n', '_sx', '_sy', '_sxy', '_sxx'], dtype=float)
+    
+    try:
+        reader = pd.read_csv(inspection_csv, usecols=lambda c: c in columns,
+                             dtype={c: str for c in columns}, chunksize=chunksize)
+        first_row = 0
+        pending, pending_rows = [], 0
+        for chunk in reader:
+            chunk_latest, chunk_sums = _reduce_inspection_chunk(chunk, first_row)
+            first_row += len(chunk)
+            pending.append((chunk_latest, chunk_sums))
+            pending_rows += len(chunk_latest)
+            if pending_rows >= len(latest):
+                latest, sums = _merge_inspection_chunks(latest, sums, pending)
+                pending, pending_rows = [], 0
+        if pending:
+            latest, sums = _merge_inspection_chunks(latest, sums, pending)
+    except FileNotFoundError:
+        logger.warning(f"Inspection file {inspection_csv} not found, using default values")
+        return pd.DataFrame({'equipment_id': pd.Series(dtype=object), '劣化判定': pd.Series(dtype=object),
+                             '_inspected': pd.Series(dtype=bool), 'grade_trend': pd.Series(dtype=float)})
+    
+    # 最小二乗の傾き = (nΣxy - ΣxΣy) / (nΣxx - (Σx)^2)
+    denominator = sums['_n'] * sums['_sxx'] - sums['_sx'] ** 2
+    slope = (sums['_n'] * sums['_sxy'] - sums['_sx'] * sums['_sy']) / denominator.where(denominator > 1e-9)
+    trend = slope.fillna(0.0).rename('grade_trend')
+    
+    latest = latest[['equipment_id', '劣化判定']].assign(_inspected=True)
+    return latest.merge(trend, left_on='equipment_id', right_index=True, how='left').fillna({'grade_trend': 0.0})
+
+
+def file_digest(paths: List[str]) -> str:
+    """入力ファイル群の内容のSHA-256（ファイルの区切りも含めて識別、存在しないファイルは欠損として識別）"""
+    digest = hashlib.sha256()
+    for path in paths:
+        if not os.path.isfile(path):
+            # 点検ファイルが無い場合は既定の判定で読み込むため、欠損もキーの一部として扱う
+            digest.update(b'missing\0')
+            continue
+        digest.update(str(os.path.getsize(path)).encode() + b'\0')
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def peak_rss_mb() -> float:
+    """このプロセスのピークRSS（MB）"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+class _Span:
+    """PhaseProfilerの計測区間（入れ子の経路・時間・tracemallocの確保量を記録）"""
+    __slots__ = ('profiler', 'name', 'path', 'start', 'start_memory', 'child_peak', 'function_profiler')
+    
+    def __init__(self, profiler: 'PhaseProfiler', name: str):
+        self.profiler = profiler
+        self.name = name
+    
+    def __enter__(self) -> '_Span':
+        profiler = self.profiler
+        stack = profiler._stack
+        self.path = f"{stack[-1].path}/{self.name}" if stack else self.name
+        self.child_peak = 0
+        self.function_profiler = None
+        if profiler.memory:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)  # 親区間のここまでのピークを退避
+            tracemalloc.reset_peak()
+            self.start_memory = current
+        if profiler.function_profiler is not None and not stack:
+            self.function_profiler = profiler._start_function_profiler()
+        stack.append(self)
+        profiler._emit({'event': 'start', 'phase': self.name, 'path': self.path})
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        duration = time.perf_counter() - self.start
+        profiler = self.profiler
+        profiler._stack.pop()
+        record = profiler.records.get(self.path)
+        if record is None:
+            record = profiler.records[self.path] = {
+                'phase': self.name, 'depth': self.path.count('/'), 'calls': 0,
+                'total_time': 0.0, 'max_time': 0.0, 'last_time': 0.0
+            }
+        record['calls'] += 1
+        record['total_time'] += duration
+        record['max_time'] = max(record['max_time'], duration)
+        record['last_time'] = duration
+        
+        if profiler.memory:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self.child_peak)
+            if profiler._stack:
+                parent = profiler._stack[-1]
+                parent.child_peak = max(parent.child_peak, peak)
+            record['alloc_bytes'] = current - self.start_memory    # 区間内の正味の確保量
+            record['peak_bytes'] = peak - self.start_memory        # 区間開始時からのピーク増分
+        record['peak_rss_mb'] = peak_rss_mb()
+        if self.function_profiler is not None:
+            profiler.profiles[self.path] = profiler._stop_function_profiler(self.function_profiler)
+        profiler._emit(dict(record, event='end', path=self.path, duration=duration))
+
+
+class PhaseProfiler:
+    """処理フェーズの入れ子タイミング計測（無効時の span() は共有の空コンテキストを返すだけ）
+    
+    records は経路（'solve/placement' など）ごとの呼び出し回数・合計/最大/直近時間・ピークRSS。
+    memory=True で tracemalloc による区間内の確保量・ピーク増分を加え、function_profiler='cprofile' または
+    'pyinstrument' で最上位フェーズごとの関数プロファイル（テキスト）を profiles に保存する。
+    リスナーは {'event': 'start' | 'end', 'phase', 'path', ...} の辞書を受け取る関数。
+    """
+    
+    _NULL_SPAN = contextlib.nullcontext()
+    
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.function_profiler: Optional[str] = None
+        self.listeners: List[Any] = []
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.profiles: Dict[str, str] = {}
+        self._stack: List[_Span] = []
+        self._owns_tracemalloc = False  # enable()でtracemallocを開始した（呼び出し側の追跡は止めない）
+    
+    def enable(self, memory: bool = False, function_profiler: Optional[str] = None, listener=None) -> None:
+        """計測を有効化（memoryはtracemallocの開始を伴い、計測対象の処理が数倍遅くなる）"""
+        if function_profiler not in (None, 'cprofile', 'pyinstrument'):
+            raise ValueError(f"Unknown function profiler: {function_profiler} (available: cprofile, pyinstrument)")
+        if memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owns_tracemalloc = True
+        self.enabled = True
+        self.memory = memory
+        self.function_profiler = function_profiler
+        if listener is not None:
+            self.listeners.append(listener)
+    
+    def disable(self) -> None:
+        """計測を無効化（記録は保持、tracemallocは自身で開始した場合のみ停止）"""
+        if self._owns_tracemalloc:
+            import tracemalloc
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+        self.enabled = False
+        self.memory = False
+        self.function_profiler = None
+    
+    def reset(self) -> None:
+        """記録・関数プロファイルを消去"""
+        self.records = {}
+        self.profiles = {}
+    
+    def span(self, phase: str):
+        """with文で計測する区間（実行中の区間の子として記録）"""
+        return _Span(self, phase) if self.enabled else self._NULL_SPAN
+    
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """経路ごとの記録のコピー（JSON化可能）"""
+        return {path: dict(record) for path, record in self.records.items()}
+    
+    def _emit(self, event: Dict[str, Any]) -> None:
+        for listener in self.listeners:
+            listener(event)
+    
+    def _start_function_profiler(self):
+        if self.function_profiler == 'pyinstrument':
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    
+    def _stop_function_profiler(self, profiler) -> str:
+        if self.function_profiler == 'pyinstrument':
+            profiler.stop()
+            return profiler.output_text()
+        import io
+        import pstats
+        profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(30)
+        return output.getvalue()
+    
+    def __getstate__(self):
+        # 実行中の区間・リスナーは複製しない（st.cache_data等によるpickle用）
+        state = dict(self.__dict__)
+        state['_stack'] = []
+        state['listeners'] = []
+        return state
+
+
+def profiled(phase: str):
+    """スケジューラーのメソッド全体を self.profiler の区間として計測するデコレーター"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.profiler.span(phase):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
 @dataclass
 class State:
     """遊具の劣化状態を表すクラス"""
@@ -58,13 +464,16 @@ class Task:
     
     def penalty_late(self, delay_years: int) -> float:
         """遅延ペナルティを計算（現実的な保険支払額ベース）"""
-        return self.penalty_coefficient * delay_years * self.cost * 0.001  # 0.1% → 0.001 に調整
+        return self.penalty_coefficient * delay_years * self.cost * PENALTY_RATE
 
 @dataclass
 class Resource:
     """資源制約を表すクラス"""
     name: str
-    capacity_per_year: Dict[int, float]  # 年度別利用可能量
+    capacity_per_year: Dict[int, float]  # 年度別利用可能量（記載のない年度は0）
+    demand: Any = None  # タスク1件の消費量: 'cost' / 'count' / {task_id: 量}（Noneは'Budget'のみ'cost'）
+    parks: Optional[List[str]] = None            # 対象公園（地区別班など、Noneは全公園）
+    equipment_types: Optional[List[str]] = None  # 対象遊具種類（専門業者枠など、Noneは全種類）
 
 @dataclass
 class Equipment:
@@ -77,91 +486,1463 @@ class Equipment:
     repair_cost: float = 150000
     renewal_cost: float = 500000
 
+# 状態グレード（コード0〜4）
+GRADES = ['a', 'b', 'c', 'd', 'e']
+GRADE_CODES = {grade: code for code, grade in enumerate(GRADES)}
+
+# FleetStore行フラグ
+FLAG_EQUIPMENT = 1      # scheduler.equipment に登録済み
+FLAG_STATE = 2          # scheduler.states に登録済み
+FLAG_CURRENT_STATE = 4  # Equipment.current_state を保持
+
+
+class StringTable:
+    """文字列の重複を排除するインターン表"""
+    
+    def __init__(self):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+    
+    def intern(self, value: str) -> int:
+        """文字列をコードに変換（未登録なら追加）"""
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+    
+    def lookup(self, values) -> List[int]:
+        """登録済み文字列のコード一覧（未登録は除外、表は変更しない）"""
+        return [self._codes[v] for v in values if v in self._codes]
+    
+    def intern_many(self, values) -> np.ndarray:
+        """文字列列をコード配列に一括変換"""
+        if len(values) == 0:
+            return np.zeros(0, dtype=np.int32)
+        uniques, inverse = np.unique(np.asarray(values, dtype=object), return_inverse=True)
+        codes = np.array([self.intern(value) for value in uniques], dtype=np.int32)
+        return codes[inverse.ravel()]
+    
+    def __getitem__(self, code: int) -> str:
+        return self.values[code]
+    
+    def __len__(self) -> int:
+        return len(self.values)
+    
+    def restore(self, values: List[str]) -> None:
+        """保存済みの文字列一覧から表を復元"""
+        self.values = list(values)
+        self._codes = {value: code for code, value in enumerate(self.values)}
+
+
+class ColumnTable:
+    """伸長可能な並列配列テーブル（容量倍増で追記を償却O(1)化）"""
+    
+    def __init__(self, dtypes: Dict[str, Any], fill: Optional[Dict[str, Any]] = None):
+        self.dtypes = dtypes
+        self.fill = fill or {}
+        self.size = 0
+        self._data = {name: np.empty(0, dtype=dtype) for name, dtype in dtypes.items()}
+    
+    def __getitem__(self, name: str) -> np.ndarray:
+        """有効範囲の列ビューを返す"""
+        return self._data[name][:self.size]
+    
+    def grow(self, n: int) -> int:
+        """n行を確保して既定値で初期化し、先頭行番号を返す"""
+        start = self.size
+        required = start + n
+        capacity = len(next(iter(self._data.values()))) if self._data else 0
+        if required > capacity:
+            new_capacity = max(required, capacity * 2, 16)
+            for name, column in self._data.items():
+                grown = np.empty(new_capacity, dtype=column.dtype)
+                grown[:start] = column[:start]
+                self._data[name] = grown
+        for name, column in self._data.items():
+            column[start:required] = self.fill.get(name, 0)
+        self.size = required
+        return start
+    
+    def attach(self, columns: Dict[str, np.ndarray]) -> None:
+        """既存の列配列（メモリマップを含む）をそのまま採用"""
+        sizes = {len(column) for column in columns.values()}
+        if set(columns) != set(self.dtypes) or len(sizes) > 1:
+            raise ValueError(f"Column mismatch: expected {sorted(self.dtypes)}, got {sorted(columns)}")
+        self._data = {name: columns[name] for name in self.dtypes}
+        self.size = sizes.pop() if sizes else 0
+    
+    def clear(self) -> None:
+        """全行を削除（確保済みの容量は再利用）"""
+        self.size = 0
+    
+    @property
+    def nbytes(self) -> int:
+        return sum(column[:self.size].nbytes for column in self._data.values())
+
+
+class FleetStore:
+    """遊具・状態・タスクを列指向で保持するストア
+    
+    遊具1件につき1行（整数ID）を持ち、状態は遊具行の列として保持する。
+    公園名・遊具種類・点検年月はインターン表のコードで保持する。
+    """
+    
+    def __init__(self):
+        # 遊具行テーブル（状態列を含む）
+        self.equipment_ids: List[str] = []
+        self._equipment_index: Dict[str, int] = {}
+        self.rows = ColumnTable({
+            'flags': np.uint8,
+            'park': np.int32,
+            'equipment_type': np.int32,
+            'install_year': np.int32,
+            'repair_cost': np.float64,
+            'renewal_cost': np.float64,
+            'score': np.float64,
+            'grade': np.int8,
+            'inspection_grade': np.int8,
+            'inspection_trend': np.float64,  # 判定コードの年あたり変化量
+            'inspection_date': np.int32
+        }, fill={'grade': -1, 'inspection_grade': -1})
+        
+        # タスクテーブル
+        self.task_ids: List[str] = []
+        self._task_index: Dict[str, int] = {}
+        self.task_table = ColumnTable({
+            'equipment': np.int32,
+            'duration': np.int32,
+            'earliest_start': np.int32,
+            'latest_end': np.int32,
+            'cost': np.float64,
+            'priority': np.int8,
+            'penalty_coefficient': np.float64
+        })
+        
+        # 文字列インターン表
+        self.park_names = StringTable()
+        self.equipment_types = StringTable()
+        self.inspection_dates = StringTable()
+    
+    # --- 行の解決 ---
+    
+    def equipment_row(self, equipment_id: str) -> int:
+        """遊具IDの行番号（未登録はKeyError）"""
+        return self._equipment_index[equipment_id]
+    
+    def task_row(self, task_id: str) -> int:
+        """タスクIDの行番号（未登録はKeyError）"""
+        return self._task_index[task_id]
+    
+    def _resolve_rows(self, ids: List[str], index: Dict[str, int], id_list: List[str], table: ColumnTable) -> np.ndarray:
+        """ID列を行番号に変換し、未登録IDは新規行を確保"""
+        rows = np.fromiter((index.get(i, -1) for i in ids), dtype=np.int64, count=len(ids))
+        missing = np.flatnonzero(rows < 0)
+        if missing.size:
+            new_ids = list(dict.fromkeys(ids[pos] for pos in missing))
+            start = table.grow(len(new_ids))
+            for offset, new_id in enumerate(new_ids):
+                index[new_id] = start + offset
+            id_list.extend(new_ids)
+            rows[missing] = [index[ids[pos]] for pos in missing]
+        return rows
+    
+    def _equipment_rows(self, ids: List[str]) -> np.ndarray:
+        return self._resolve_rows(ids, self._equipment_index, self.equipment_ids, self.rows)
+    
+    def _task_rows(self, ids: List[str]) -> np.ndarray:
+        return self._resolve_rows(ids, self._task_index, self.task_ids, self.task_table)
+    
+    # --- 一括登録 ---
+    
+    def extend_fleet(self, equipment_ids: List[str], park_names, equipment_types, install_years,
+                     repair_costs, scores, inspection_grade_codes=None, inspection_date: str = "2025-01",
+                     renewal_costs=None, inspection_trends=None) -> np.ndarray:
+        """遊具と現在状態を一括登録し、行番号を返す"""
+        rows = self._equipment_rows(list(equipment_ids))
+        table = self.rows
+        scores = np.asarray(scores, dtype=np.float64)
+        
+        table['park'][rows] = self.park_names.intern_many(park_names)
+        table['equipment_type'][rows] = self.equipment_types.intern_many(equipment_types)
+        table['install_year'][rows] = install_years
+        table['repair_cost'][rows] = repair_costs
+        table['renewal_cost'][rows] = 500000 if renewal_costs is None else renewal_costs
+        table['score'][rows] = scores
+        table['grade'][rows] = score_to_grade_code(scores)
+        table['inspection_grade'][rows] = -1 if inspection_grade_codes is None else inspection_grade_codes
+        table['inspection_trend'][rows] = 0.0 if inspection_trends is None else inspection_trends
+        table['inspection_date'][rows] = self.inspection_dates.intern(inspection_date)
+        table['flags'][rows] = FLAG_EQUIPMENT | FLAG_STATE | FLAG_CURRENT_STATE
+        return rows
+    
+    def extend_tasks(self, task_ids: List[str], equipment_rows, durations, earliest_starts, latest_ends,
+                     costs, priorities, penalty_coefficients) -> np.ndarray:
+        """タスクを一括登録し、行番号を返す"""
+        rows = self._task_rows(list(task_ids))
+        table = self.task_table
+        table['equipment'][rows] = equipment_rows
+        table['duration'][rows] = durations
+        table['earliest_start'][rows] = earliest_starts
+        table['latest_end'][rows] = latest_ends
+        table['cost'][rows] = costs
+        table['priority'][rows] = priorities
+        table['penalty_coefficient'][rows] = penalty_coefficients
+        return rows
+    
+    def clear_tasks(self) -> None:
+        """タスクテーブルを空にする（遊具行は保持）"""
+        self.task_ids = []
+        self._task_index = {}
+        self.task_table.clear()
+    
+    # --- 単体登録（dataclassから） ---
+    
+    def _write_state(self, row: int, state: State) -> None:
+        table = self.rows
+        table['score'][row] = state.score
+        table['grade'][row] = GRADE_CODES.get(state.grade, -1)
+        table['inspection_date'][row] = self.inspection_dates.intern(state.inspection_date)
+    
+    def put_equipment(self, equipment: Equipment) -> int:
+        """Equipmentを登録（同一IDは上書き）"""
+        row = int(self._equipment_rows([equipment.id])[0])
+        table = self.rows
+        table['park'][row] = self.park_names.intern(equipment.park_name)
+        table['equipment_type'][row] = self.equipment_types.intern(equipment.equipment_type)
+        table['install_year'][row] = equipment.install_year
+        table['repair_cost'][row] = equipment.repair_cost
+        table['renewal_cost'][row] = equipment.renewal_cost
+        
+        flags = int(table['flags'][row]) | FLAG_EQUIPMENT
+        if equipment.current_state is not None:
+            self._write_state(row, equipment.current_state)
+            flags |= FLAG_CURRENT_STATE
+        else:
+            flags &= ~FLAG_CURRENT_STATE
+        table['flags'][row] = flags
+        return row
+    
+    def put_state(self, state: State) -> int:
+        """Stateを登録（同一IDは上書き）"""
+        row = int(self._equipment_rows([state.id])[0])
+        self._write_state(row, state)
+        self.rows['flags'][row] |= FLAG_STATE
+        return row
+    
+    def put_task(self, task: Task) -> int:
+        """Taskを登録（同一IDは上書き）"""
+        equipment_row = int(self._equipment_rows([task.equipment_id])[0])
+        row = int(self._task_rows([task.id])[0])
+        table = self.task_table
+        table['equipment'][row] = equipment_row
+        table['duration'][row] = task.duration
+        table['earliest_start'][row] = task.earliest_start
+        table['latest_end'][row] = task.latest_end
+        table['cost'][row] = task.cost
+        table['priority'][row] = task.priority
+        table['penalty_coefficient'][row] = task.penalty_coefficient
+        return row
+    
+    # --- dataclassビューの生成 ---
+    
+    def make_state(self, row: int) -> State:
+        table = self.rows
+        return State(
+            id=self.equipment_ids[row],
+            score=float(table['score'][row]),
+            grade='',  # __post_init__で自動設定
+            inspection_date=self.inspection_dates[int(table['inspection_date'][row])]
+        )
+    
+    def make_equipment(self, row: int) -> Equipment:
+        table = self.rows
+        return Equipment(
+            id=self.equipment_ids[row],
+            park_name=self.park_names[int(table['park'][row])],
+            equipment_type=self.equipment_types[int(table['equipment_type'][row])],
+            install_year=int(table['install_year'][row]),
+            current_state=self.make_state(row) if table['flags'][row] & FLAG_CURRENT_STATE else None,
+            repair_cost=float(table['repair_cost'][row]),
+            renewal_cost=float(table['renewal_cost'][row])
+        )
+    
+    def make_task(self, row: int) -> Task:
+        table = self.task_table
+        return Task(
+            id=self.task_ids[row],
+            equipment_id=self.equipment_ids[int(table['equipment'][row])],
+            duration=int(table['duration'][row]),
+            earliest_start=int(table['earliest_start'][row]),
+            latest_end=int(table['latest_end'][row]),
+            cost=float(table['cost'][row]),
+            priority=int(table['priority'][row]),
+            penalty_coefficient=float(table['penalty_coefficient'][row])
+        )
+    
+    # --- ディスクキャッシュ ---
+    
+    def save(self, path: str) -> None:
+        """列配列を.npy、ID・インターン表をJSONでディレクトリに保存（一時ディレクトリ経由で配置）"""
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=parent)
+        try:
+            for prefix, table in (('rows', self.rows), ('tasks', self.task_table)):
+                for name in table.dtypes:
+                    np.save(os.path.join(staging, f"{prefix}.{name}.npy"), table[name])
+            meta = {
+                'version': FLEET_CACHE_VERSION,
+                'equipment_ids': self.equipment_ids,
+                'task_ids': self.task_ids,
+                'park_names': self.park_names.values,
+                'equipment_types': self.equipment_types.values,
+                'inspection_dates': self.inspection_dates.values
+            }
+            with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            os.replace(staging, path)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+    
+    def restore(self, path: str, mmap: bool = True) -> None:
+        """save()で保存したディレクトリから復元（mmap=Trueは書き込み時コピーのメモリマップ）"""
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != FLEET_CACHE_VERSION:
+            raise ValueError(f"Unsupported fleet cache version: {meta.get('version')} (expected {FLEET_CACHE_VERSION})")
+        
+        mmap_mode = 'c' if mmap else None
+        columns = {
+            prefix: {
+                name: np.load(os.path.join(path, f"{prefix}.{name}.npy"), mmap_mode=mmap_mode)
+                for name in table.dtypes
+            }
+            for prefix, table in (('rows', self.rows), ('tasks', self.task_table))
+        }
+        self.rows.attach(columns['rows'])
+        self.task_table.attach(columns['tasks'])
+        
+        self.equipment_ids = meta['equipment_ids']
+        self._equipment_index = {equipment_id: row for row, equipment_id in enumerate(self.equipment_ids)}
+        self.task_ids = meta['task_ids']
+        self._task_index = {task_id: row for row, task_id in enumerate(self.task_ids)}
+        self.park_names.restore(meta['park_names'])
+        self.equipment_types.restore(meta['equipment_types'])
+        self.inspection_dates.restore(meta['inspection_dates'])
+    
+    @property
+    def is_empty(self) -> bool:
+        return self.rows.size == 0 and self.task_table.size == 0
+    
+    @property
+    def nbytes(self) -> int:
+        """列配列の合計バイト数"""
+        return self.rows.nbytes + self.task_table.nbytes
+
+
+class _FleetView(Mapping):
+    """FleetStoreの行をdataclassとして遅延生成する辞書互換ビュー"""
+    
+    def __init__(self, store: FleetStore):
+        self._store = store
+    
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+    
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} ({len(self)} items)>"
+
+
+class _RowView(_FleetView):
+    """遊具行テーブルのうち指定フラグを持つ行のビュー"""
+    flag = 0
+    
+    def _rows(self) -> np.ndarray:
+        return np.flatnonzero(self._store.rows['flags'] & self.flag)
+    
+    def _row(self, key: str) -> int:
+        row = self._store._equipment_index.get(key)
+        if row is None or not self._store.rows['flags'][row] & self.flag:
+            raise KeyError(key)
+        return row
+    
+    def __contains__(self, key) -> bool:
+        try:
+            self._row(key)
+        except (KeyError, TypeError):
+            return False
+        return True
+    
+    def __iter__(self):
+        ids = self._store.equipment_ids
+        return (ids[row] for row in self._rows())
+    
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._store.rows['flags'] & self.flag))
+
+
+class EquipmentView(_RowView):
+    """scheduler.equipment 互換ビュー"""
+    flag = FLAG_EQUIPMENT
+    
+    def __getitem__(self, key: str) -> Equipment:
+        return self._store.make_equipment(self._row(key))
+    
+    def __setitem__(self, key: str, equipment: Equipment) -> None:
+        self._store.put_equipment(equipment)
+
+
+class StateView(_RowView):
+    """scheduler.states 互換ビュー"""
+    flag = FLAG_STATE
+    
+    def __getitem__(self, key: str) -> State:
+        return self._store.make_state(self._row(key))
+    
+    def __setitem__(self, key: str, state: State) -> None:
+        self._store.put_state(state)
+
+
+class TaskView(_FleetView):
+    """scheduler.tasks 互換ビュー"""
+    
+    def __getitem__(self, key: str) -> Task:
+        return self._store.make_task(self._store.task_row(key))
+    
+    def __setitem__(self, key: str, task: Task) -> None:
+        self._store.put_task(task)
+    
+    def __contains__(self, key) -> bool:
+        return key in self._store._task_index
+    
+    def __iter__(self):
+        return iter(self._store.task_ids)
+    
+    def __len__(self) -> int:
+        return len(self._store.task_ids)
+
+
+def score_to_grade_code(scores) -> np.ndarray:
+    """劣化スコアを状態グレードコードに変換（State.__post_init__と同じ閾値）"""
+    return np.searchsorted(PRIORITY_THRESHOLDS, scores, side='right').astype(np.int8)
+
+
+def grade_codes(grades) -> np.ndarray:
+    """グレード文字列をコードに変換（不明は-1）"""
+    return np.fromiter((GRADE_CODES.get(g, -1) for g in grades), dtype=np.int8, count=len(grades))
+
+
+# 点検グレードコード別の劣化補正値（末尾は未点検・不明グレード用、コード-1で参照）
+GRADE_SCORE_TABLE = np.array([GRADE_SCORES[g] for g in GRADES] + [GRADE_SCORES[DEFAULT_INSPECTION_GRADE]])
+
+
+class DegradationCurve(ABC):
+    """年齢由来の劣化係数を配列で評価する劣化曲線の抽象基底クラス（サブクラスは age_factor() を実装）"""
+    name = ''
+    
+    @abstractmethod
+    def age_factor(self, ages: np.ndarray) -> np.ndarray:
+        """経過年数配列から劣化係数（0.0〜1.0目安）を計算"""
+
+
+class LinearCurve(DegradationCurve):
+    """耐用年数で線形に劣化する曲線（従来式）"""
+    name = 'linear'
+    
+    def __init__(self, service_life: float = 60):
+        self.service_life = service_life  # 完全劣化までの年数
+    
+    def age_factor(self, ages: np.ndarray) -> np.ndarray:
+        return np.minimum(ages / self.service_life, 1.0)
+
+
+class WeibullCurve(DegradationCurve):
+    """ワイブル分布の累積故障確率を劣化係数とする曲線"""
+    name = 'weibull'
+    
+    def __init__(self, shape: float = 3.0, scale: float = 40):
+        self.shape = shape  # 形状パラメータ（>1で摩耗故障型）
+        self.scale = scale  # 尺度パラメータ（特性寿命）
+    
+    def age_factor(self, ages: np.ndarray) -> np.ndarray:
+        ages = np.maximum(ages, 0)
+        return 1.0 - np.exp(-(ages / self.scale) ** self.shape)
+
+
+class MarkovCurve(DegradationCurve):
+    """年次グレード遷移行列による期待劣化レベルを劣化係数とする曲線"""
+    name = 'markov'
+    
+    # グレードa〜eの劣化レベル
+    LEVELS = np.linspace(0.0, 1.0, len(GRADES))
+    
+    def __init__(self, transition_matrix: Optional[np.ndarray] = None, max_age: int = 200):
+        if transition_matrix is None:
+            transition_matrix = self.default_transition_matrix()
+        self.transition_matrix = np.asarray(transition_matrix, dtype=float)
+        self.max_age = max_age
+        
+        # 設置時a判定からの経過年数別期待レベルを事前計算
+        expected = np.empty(max_age + 1)
+        distribution = np.eye(len(GRADES))[0]
+        for age in range(max_age + 1):
+            expected[age] = distribution @ self.LEVELS
+            distribution = distribution @ self.transition_matrix
+        self._expected_levels = expected
+    
+    @staticmethod
+    def default_transition_matrix(years_per_grade: float = 15) -> np.ndarray:
+        """各グレードに平均years_per_grade年滞留する遷移行列（e判定は吸収状態）"""
+        n = len(GRADES)
+        p_move = 1.0 / years_per_grade
+        matrix = np.eye(n) * (1 - p_move) + np.eye(n, k=1) * p_move
+        matrix[-1, -1] = 1.0
+        return matrix
+    
+    def age_factor(self, ages: np.ndarray) -> np.ndarray:
+        return self._expected_levels[np.clip(np.asarray(ages, dtype=np.int64), 0, self.max_age)]
+
+
+# 登録済み劣化曲線
+DEGRADATION_CURVES: Dict[str, type] = {
+    LinearCurve.name: LinearCurve,
+    WeibullCurve.name: WeibullCurve,
+    MarkovCurve.name: MarkovCurve
+}
+
+
+class DegradationEngine:
+    """設置年・点検グレード配列から劣化スコアを一括計算するエンジン"""
+    
+    def __init__(self, curve: Any = 'linear', age_weight: float = 0.6, inspection_weight: float = 0.4,
+                 base_year: int = BASE_YEAR):
+        if isinstance(curve, str):
+            if curve not in DEGRADATION_CURVES:
+                raise ValueError(f"Unknown degradation curve: {curve} (available: {list(DEGRADATION_CURVES)})")
+            curve = DEGRADATION_CURVES[curve]()
+        self.curve = curve
+        self.age_weight = age_weight
+        self.inspection_weight = inspection_weight
+        self.base_year = base_year
+    
+    def fingerprint(self) -> str:
+        """劣化曲線の種類・パラメータと重みの識別子（キャッシュキー用）"""
+        digest = hashlib.sha256(type(self.curve).__name__.encode())
+        for name, value in sorted(vars(self.curve).items()):
+            digest.update(name.encode())
+            digest.update(value.tobytes() if isinstance(value, np.ndarray) else repr(value).encode())
+        digest.update(repr((self.age_weight, self.inspection_weight, self.base_year)).encode())
+        return digest.hexdigest()
+    
+    def scores(self, install_years, inspection_grade_codes) -> np.ndarray:
+        """劣化スコア = 年齢係数と点検係数の加重平均（0.0〜1.0にクリップ）"""
+        ages = self.base_year - np.asarray(install_years, dtype=float)
+        age_factor = self.curve.age_factor(ages)
+        inspection_factor = GRADE_SCORE_TABLE[np.asarray(inspection_grade_codes, dtype=np.int64)]
+        degradation = self.age_weight * age_factor + self.inspection_weight * inspection_factor
+        return np.clip(degradation, 0.0, 1.0)
+
+
+@dataclass
+class SchedulingProblem:
+    """ソルバーエンジンに渡す配列形式のスケジューリング問題"""
+    start_year: int
+    end_year: int
+    earliest_start: np.ndarray       # タスク別最早開始年
+    latest_end: np.ndarray           # タスク別最遅完了年
+    cost: np.ndarray                 # タスク別コスト
+    priority: np.ndarray             # タスク別優先度
+    penalty_coefficient: np.ndarray  # タスク別遅延ペナルティ係数
+    capacity: np.ndarray             # 資源×年度の利用可能量行列
+    demand: np.ndarray               # 資源×タスクの消費量行列
+    resource_names: List[str] = field(default_factory=list)
+    lifecycle: Any = None            # 複数年ライフサイクル計画の状態射影（LifecycleModel、単発タスクはNone）
+    
+    @property
+    def n_tasks(self) -> int:
+        return len(self.cost)
+    
+    @property
+    def n_years(self) -> int:
+        return self.end_year - self.start_year + 1
+    
+    @property
+    def penalty_per_year(self) -> np.ndarray:
+        """1年遅延あたりのペナルティ"""
+        return self.penalty_coefficient * self.cost * PENALTY_RATE
+    
+    def resource_capacity(self, name: str) -> np.ndarray:
+        """資源名の年度別利用可能量"""
+        return self.capacity[self.resource_names.index(name)]
+    
+    def effective(self, years: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """配置結果に対する有効タスクのマスクとペナルティ係数（ライフサイクル計画では代替案・不要化した修繕を除外）"""
+        if self.lifecycle is None:
+            return np.ones(self.n_tasks, dtype=bool), self.penalty_coefficient
+        return self.lifecycle.evaluate(years)
+    
+    def objective(self, years: np.ndarray) -> float:
+        """遅延ペナルティ総額（未配置タスクは計画期間終了翌年の実施とみなす、無効タスクは除外）"""
+        active, penalty_coefficient = self.effective(years)
+        effective = np.where(years >= 0, years, self.end_year + 1)
+        delay = np.maximum(effective - self.earliest_start, 0)
+        return float(np.sum((penalty_coefficient * delay * self.cost * PENALTY_RATE)[active]))
+    
+    def task_demand(self, t: int) -> List[Tuple[int, float]]:
+        """タスクtの(資源, 消費量)リスト"""
+        column = self.demand[:, t]
+        consumed = np.flatnonzero(column)
+        return list(zip(consumed.tolist(), column[consumed].tolist()))
+    
+    def usage(self, years: np.ndarray) -> np.ndarray:
+        """配置結果の資源×年度の使用量行列"""
+        usage = np.zeros_like(self.capacity, dtype=float)
+        placed = np.flatnonzero(years >= 0)
+        for r in range(len(self.capacity)):
+            np.add.at(usage[r], years[placed] - self.start_year, self.demand[r, placed])
+        return usage
+
+
+class YearSlotIndex:
+    """残容量のある最初の年度を高速に探索する年度スロット索引
+    
+    - union-find: 全タスク共通の資源（予算・施工件数など）が尽きた年度を読み飛ばす（経路圧縮）
+    - セグメント木: 主資源（既定は予算）の残量の区間最大値から候補年度をO(log Y)で探索
+    - 候補年度では資源×年度の容量行列のうち、タスクが消費する資源の要素のみを確認
+      （タスク別消費量は疎形式で保持し、対象外の資源を追加しても確認コストは増えない）
+    """
+    
+    def __init__(self, capacity: np.ndarray, demand: np.ndarray, primary: Optional[int] = None):
+        capacity = np.asarray(capacity, dtype=float)
+        demand = np.asarray(demand, dtype=float)
+        self.n_resources, self.n_years = capacity.shape
+        self.capacity = capacity.tolist()
+        self.used = [[0.0] * self.n_years for _ in range(self.n_resources)]
+        
+        # 全タスクが消費する資源は、最小消費量を賄えない年度を無効年度として扱う
+        if demand.shape[1]:
+            shared = np.flatnonzero(np.all(demand > 0, axis=1))
+        else:
+            shared = np.zeros(0, dtype=np.int64)
+        self._shared = [(int(r), float(demand[r].min())) for r in shared]
+        
+        if primary is None:
+            # 消費量が最もばらつく共通資源を主資源とする
+            primary = int(shared[np.argmax(demand[shared].std(axis=1))]) if shared.size else -1
+        self.primary = primary
+        
+        self._size = 1
+        while self._size < max(self.n_years, 1):
+            self._size *= 2
+        self._rebuild()
+    
+    def load(self, used: np.ndarray) -> None:
+        """資源×年度の使用量行列を一括設定して索引を再構築"""
+        self.used = np.asarray(used, dtype=float).reshape(self.n_resources, self.n_years).tolist()
+        self._rebuild()
+    
+    def _rebuild(self) -> None:
+        self._tree = [-math.inf] * (2 * self._size)
+        for i in range(self.n_years):
+            self._tree[self._size + i] = self._leaf_value(i)
+        for node in range(self._size - 1, 0, -1):
+            self._tree[node] = max(self._tree[2 * node], self._tree[2 * node + 1])
+        self._rebuild_skip()
+    
+    @staticmethod
+    def sparse_demand(demand: np.ndarray) -> List[List[Tuple[int, float]]]:
+        """資源×タスクの消費量行列をタスク別の(資源, 消費量)リストに変換"""
+        demand = np.asarray(demand, dtype=float)
+        entries: List[List[Tuple[int, float]]] = [[] for _ in range(demand.shape[1])]
+        task_idx, resource_idx = np.nonzero(demand.T)
+        for t, r, d in zip(task_idx.tolist(), resource_idx.tolist(), demand[resource_idx, task_idx].tolist()):
+            entries[t].append((r, d))
+        return entries
+    
+    @property
+    def used_matrix(self) -> np.ndarray:
+        """資源×年度の使用量行列"""
+        return np.array(self.used, dtype=float).reshape(self.n_resources, self.n_years)
+    
+    def _alive(self, i: int) -> bool:
+        used, capacity = self.used, self.capacity
+        return all(used[r][i] + m <= capacity[r][i] for r, m in self._shared)
+    
+    def _leaf_value(self, i: int) -> float:
+        """主資源の残量（無効年度は-inf）"""
+        if not self._alive(i):
+            return -math.inf
+        if self.primary < 0:
+            return 0.0
+        return self.capacity[self.primary][i] - self.used[self.primary][i]
+    
+    def _rebuild_skip(self) -> None:
+        # _next[i]: i以降で最初の有効年度候補（n_yearsは番兵）
+        self._next = [i if self._alive(i) else i + 1 for i in range(self.n_years)] + [self.n_years]
+    
+    def _find(self, i: int) -> int:
+        nxt = self._next
+        while nxt[i] != i:
+            nxt[i] = nxt[nxt[i]]  # 経路半減
+            i = nxt[i]
+        return i
+    
+    def _update(self, i: int) -> None:
+        node = self._size + i
+        self._tree[node] = self._leaf_value(i)
+        node //= 2
+        while node:
+            self._tree[node] = max(self._tree[2 * node], self._tree[2 * node + 1])
+            node //= 2
+    
+    def _first_at_least(self, lo: int, hi: int, value: float) -> int:
+        """[lo, hi]で主資源の残量がvalue以上の最初の年度インデックス（なければ-1）"""
+        tree = self._tree
+        if tree[self._size + lo] >= value:
+            return lo  # 先頭年度で足りる場合は木を降りない
+        stack = [(1, 0, self._size - 1)]
+        while stack:
+            node, left, right = stack.pop()
+            if right < lo or left > hi or tree[node] < value:
+                continue
+            if left == right:
+                return left
+            mid = (left + right) // 2
+            stack.append((2 * node + 1, mid + 1, right))
+            stack.append((2 * node, left, mid))
+        return -1
+    
+    def fits(self, i: int, entries: List[Tuple[int, float]]) -> bool:
+        """年度iでタスクの消費する全資源が容量内に収まるか"""
+        used, capacity = self.used, self.capacity
+        return all(used[r][i] + d <= capacity[r][i] for r, d in entries)
+    
+    def first_fit(self, first: int, last: int, entries: List[Tuple[int, float]]) -> int:
+        """[first, last]で全資源の制約を満たす最初の年度インデックス（なければ-1）"""
+        first, last = max(first, 0), min(last, self.n_years - 1)
+        if first > last:
+            return -1
+        primary_demand = 0.0
+        for r, d in entries:
+            if r == self.primary:
+                primary_demand = d
+        
+        i = self._find(first)
+        while i <= last:
+            i = self._first_at_least(i, last, primary_demand)
+            if i < 0:
+                return -1
+            # 丸め誤差を避けるため累積量で全資源を最終確認
+            if self.fits(i, entries):
+                return i
+            i = self._find(i + 1)
+        return -1
+    
+    def reserve(self, i: int, entries: List[Tuple[int, float]]) -> None:
+        """年度iにタスクの消費量を割り当て"""
+        used = self.used
+        for r, d in entries:
+            used[r][i] += d
+        self._update(i)
+        if not self._alive(i):
+            self._next[i] = i + 1
+    
+    def release(self, i: int, entries: List[Tuple[int, float]]) -> None:
+        """年度iからタスクの消費量を解放"""
+        was_alive = self._alive(i)
+        used = self.used
+        for r, d in entries:
+            used[r][i] -= d
+        self._update(i)
+        if not was_alive and self._alive(i):
+            self._rebuild_skip()
+
+
+def greedy_first_fit(problem: SchedulingProblem, order: np.ndarray) -> np.ndarray:
+    """指定順に各タスクを制約を満たす最も早い年度へ配置（未配置は-1）
+    
+    ライフサイクル計画では確定ごとに状態射影を更新し、配置済みの代替案がある・不要化したタスクは配置しない。
+    """
+    start_year = problem.start_year
+    index = YearSlotIndex(problem.capacity, problem.demand)
+    entries = YearSlotIndex.sparse_demand(problem.demand)
+    tracker = problem.lifecycle.tracker() if problem.lifecycle is not None else None
+    
+    earliest_starts = problem.earliest_start.tolist()
+    latest_ends = problem.latest_end.tolist()
+    years = [-1] * problem.n_tasks
+    
+    for t in order.tolist():
+        if tracker is not None and not tracker.admits(t):
+            continue
+        i = index.first_fit(earliest_starts[t] - start_year, latest_ends[t] - start_year, entries[t])
+        if i >= 0:
+            index.reserve(i, entries[t])
+            years[t] = start_year + i
+            if tracker is not None:
+                # 不要化した配置済みの修繕の資源を解放
+                for u in tracker.commit(t, years[t]):
+                    index.release(years[u] - start_year, entries[u])
+                    years[u] = -1
+    
+    return np.array(years, dtype=np.int64)
+
+
+class SolverEngine:
+    """スケジューリング戦略エンジンの基底クラス
+    
+    サブクラスは並べ替えキー sort_keys() を上書きするか、solve() 自体を上書きする。
+    time_budget は1万タスクあたりの解法時間の目安（秒）で、実測値が超過すると警告する。
+    local_search_time > 0 の場合、貪欲配置の後に焼きなまし法による改善フェーズを実行する。
+    """
+    name = ''
+    description = ''
+    time_budget = 1.0
+    info: Dict[str, Any] = {}  # 直近の解法情報（configure()のコピーごとに保持）
+    
+    local_search_time: float = 0.0              # 改善フェーズの時間予算（秒、0は実行しない）
+    local_search_seed: Optional[int] = None     # 改善フェーズの乱数シード
+    local_search_callback: Optional[Any] = None  # 最良解の更新ごとに呼ぶ関数（引数は探索状況の辞書）
+    tie_break_seed: Optional[int] = None        # 同順位タスクの並びを乱数で決めるシード（Noneはタスク番号順）
+    profiler: PhaseProfiler = PhaseProfiler()   # フェーズ計測（solve_parallelがスケジューラーの計測器を設定）
+    
+    def sort_keys(self, problem: SchedulingProblem) -> Tuple[np.ndarray, ...]:
+        """np.lexsort用の並べ替えキー（末尾が第1キー、既定は優先度降順→最遅完了年昇順→ペナルティ係数降順）"""
+        return (
+            -problem.penalty_coefficient,
+            problem.latest_end,
+            -problem.priority.astype(np.int64)
+        )
+    
+    def order(self, problem: SchedulingProblem) -> np.ndarray:
+        """配置順序（sort_keys()による安定ソート、tie_break_seed指定時は同順位を乱数順）"""
+        keys = tuple(self.sort_keys(problem))
+        if self.tie_break_seed is not None:
+            keys = (np.random.default_rng(self.tie_break_seed).permutation(problem.n_tasks),) + keys
+        return np.lexsort(keys)
+    
+    def solve(self, problem: SchedulingProblem) -> np.ndarray:
+        """タスク別の実施年配列（未配置は-1）を返す"""
+        with self.profiler.span('sort'):
+            order = self.order(problem)
+        with self.profiler.span('placement'):
+            years = greedy_first_fit(problem, order)
+        return self.improve(problem, years)
+    
+    def improve(self, problem: SchedulingProblem, years: np.ndarray) -> np.ndarray:
+        """local_search_time が正なら局所探索で改善した解を返す（結果は info['local_search']）"""
+        if self.local_search_time <= 0:
+            return years
+        if problem.lifecycle is not None:
+            logger.warning("Local search does not support lifecycle plans; keeping the greedy schedule")
+            return years
+        localsearch = importlib.import_module('delegator_localsearch_v5_2_1')
+        with self.profiler.span('local_search'):
+            years, stats = localsearch.improve_schedule(problem, years, time_budget=self.local_search_time,
+                                                        seed=self.local_search_seed,
+                                                        callback=self.local_search_callback)
+        self.info = dict(self.info, local_search=stats)
+        return years
+    
+    def configure(self, **options) -> 'SolverEngine':
+        """オプションを上書きした実行用コピーを返す（登録済みインスタンスは変更しない）"""
+        engine = copy.copy(self)
+        for key, value in options.items():
+            if not hasattr(engine, key):
+                raise ValueError(f"Unknown option for strategy {self.name}: {key}")
+            setattr(engine, key, value)
+        engine.info = {}
+        return engine
+    
+    def budget_for(self, n_tasks: int) -> float:
+        """タスク数に応じた解法時間の上限（秒、改善フェーズの時間予算を含む）"""
+        return self.time_budget * max(n_tasks, 1) / 10000 + self.local_search_time
+
+
+class StrategyRegistry:
+    """戦略名→ソルバーエンジンの登録表と実測値の記録"""
+    
+    def __init__(self):
+        self._engines: Dict[str, SolverEngine] = {}
+        self._lazy: Dict[str, str] = {}
+        self.measurements: Dict[str, Dict[str, float]] = {}
+    
+    def register(self, engine: SolverEngine) -> SolverEngine:
+        """エンジンを登録（同名は置き換え）"""
+        if not engine.name:
+            raise ValueError("Solver engine must define a name")
+        self._engines[engine.name] = engine
+        return engine
+    
+    def register_lazy(self, name: str, module: str) -> None:
+        """初回利用時にモジュールをimportして登録する戦略（任意依存のエンジン用）"""
+        self._lazy[name] = module
+    
+    def get(self, name: str) -> SolverEngine:
+        if name not in self._engines and name in self._lazy:
+            importlib.import_module(self._lazy[name])
+        if name not in self._engines:
+            raise ValueError(f"Unknown scheduling strategy: {name} (available: {self.names()})")
+        return self._engines[name]
+    
+    def names(self) -> List[str]:
+        return list(dict.fromkeys(list(self._engines) + list(self._lazy)))
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self._engines or name in self._lazy
+    
+    def record(self, name: str, solve_time: float, n_tasks: int, objective: float,
+               engine: Optional['SolverEngine'] = None) -> Dict[str, float]:
+        """実測した解法時間と目的関数値を記録（engineは設定済みの実行用コピー、省略時は登録済みエンジン）"""
+        engine = engine or self.get(name)
+        measurement = {
+            'solve_time': solve_time,
+            'n_tasks': n_tasks,
+            'objective': objective,
+            'time_budget': engine.budget_for(n_tasks),
+            'within_budget': solve_time <= engine.budget_for(n_tasks)
+        }
+        self.measurements[name] = measurement
+        return measurement
+    
+    def select(self, quality_target: float = 0.05, candidates: Optional[List[str]] = None) -> str:
+        """目的関数値が最良値の(1+quality_target)倍以内の戦略のうち最速のものを返す"""
+        measured = {
+            name: m for name, m in self.measurements.items()
+            if (candidates is None or name in candidates) and name in self._engines
+        }
+        if not measured:
+            raise ValueError("No measured strategies; run benchmark_strategies() first")
+        
+        best = min(m['objective'] for m in measured.values())
+        qualified = [name for name, m in measured.items() if m['objective'] <= best * (1 + quality_target) + 1e-9]
+        return min(qualified, key=lambda name: measured[name]['solve_time'])
+
+
+# 登録済みスケジューリング戦略
+SOLVER_STRATEGIES = StrategyRegistry()
+
+
+def register_strategy(engine_cls: type) -> type:
+    """クラスデコレータ: ソルバーエンジンを戦略登録表に追加"""
+    SOLVER_STRATEGIES.register(engine_cls())
+    return engine_cls
+
+
+@register_strategy
+class GreedyPriorityEngine(SolverEngine):
+    """優先度降順→最遅完了年昇順→ペナルティ係数降順で先着配置（従来方式）"""
+    name = 'greedy_priority'
+    description = '劣化優先度順の先着配置'
+
+
+@register_strategy
+class CostOptimalEngine(SolverEngine):
+    """予算1円あたりの回避ペナルティが大きい順（同率は低コスト順）に先着配置"""
+    name = 'cost_optimal'
+    description = '予算効率優先の先着配置'
+    
+    def sort_keys(self, problem: SchedulingProblem) -> Tuple[np.ndarray, ...]:
+        # 1円・1年あたりの回避ペナルティはペナルティ係数に比例
+        return (
+            problem.latest_end,
+            problem.cost,
+            -problem.penalty_coefficient
+        )
+
+
+@register_strategy
+class PenaltyMinimizationEngine(SolverEngine):
+    """1年遅延あたりのペナルティ額が大きい順に先着配置"""
+    name = 'penalty_minimization'
+    description = '遅延ペナルティ額優先の先着配置'
+    
+    def sort_keys(self, problem: SchedulingProblem) -> Tuple[np.ndarray, ...]:
+        return (
+            problem.latest_end,
+            -problem.penalty_per_year
+        )
+
+
+# 厳密整数計画エンジン（pulp同梱CBCを使用、初回利用時に読み込み）
+SOLVER_STRATEGIES.register_lazy('milp', 'delegator_milp_v5_2_1')
+
+# 複数構成をプロセスプールで競わせるポートフォリオエンジン（初回利用時に読み込み）
+SOLVER_STRATEGIES.register_lazy('portfolio', 'delegator_portfolio_v5_2_1')
+
+# 公園・地区単位の分割と共有資源の配分調整による分解エンジン（初回利用時に読み込み）
+SOLVER_STRATEGIES.register_lazy('decomposition', 'delegator_decomposition_v5_2_1')
+
+# 長期計画を詳細＋集約年度のウィンドウで1年ずつ前進して解くローリングホライズン（初回利用時に読み込み）
+SOLVER_STRATEGIES.register_lazy('rolling', 'delegator_rolling_v5_2_1')
+
+
+class _ScheduleItems(ItemsView):
+    """行順に項目を生成する items() ビュー（キー索引を作らない）"""
+    
+    def __iter__(self):
+        return self._mapping._iter_entries()
+
+
+class _ScheduleValues(ValuesView):
+    def __iter__(self):
+        return (entry for _, entry in self._mapping._iter_entries())
+
+
+class ScheduleTable(Mapping):
+    """スケジュール結果の列指向テーブル（タスクID→項目辞書の互換ビュー）
+    
+    配置順の1行ごとにタスク行・遊具行・実施年・遅延年数・コスト・優先度・ペナルティを配列で保持し、
+    項目辞書は参照時に生成する。ID文字列は遊具ストアの一覧を共有して複製しない。
+    削除した行は墓標（task=-1）として残し、追加は末尾に行う（辞書のpop・再登録と同じ順序）。
+    """
+    COLUMNS = {
+        'task': np.int32,
+        'equipment': np.int32,
+        'scheduled_year': np.int16,
+        'delay_years': np.int16,
+        'cost': np.float64,
+        'priority': np.int8,
+        'penalty': np.float64
+    }
+    FIELDS = ('task_id', 'equipment_id', 'scheduled_year', 'cost', 'priority', 'delay_years', 'penalty')
+    CHUNK_ROWS = 65536  # 走査時にPythonオブジェクトへ変換する行数
+    
+    def __init__(self, task_ids, task_index: Mapping, equipment_ids):
+        self.task_ids = task_ids            # タスク行→タスクID（リストまたは辞書）
+        self.task_index = task_index        # タスクID→タスク行
+        self.equipment_ids = equipment_ids  # 遊具行→遊具ID
+        self.table = ColumnTable(self.COLUMNS)
+        self._count = 0
+        self._positions: Optional[np.ndarray] = None  # タスク行→テーブル行（初回の参照時に構築）
+    
+    @classmethod
+    def for_fleet(cls, fleet: FleetStore) -> 'ScheduleTable':
+        return cls(fleet.task_ids, fleet._task_index, fleet.equipment_ids)
+    
+    # --- 追加・削除 ---
+    
+    def append(self, task, equipment, scheduled_year, delay_years, cost, priority, penalty) -> None:
+        """未登録のタスク列を末尾に一括追加"""
+        values = (task, equipment, scheduled_year, delay_years, cost, priority, penalty)
+        n = len(task)
+        start = self.table.grow(n)
+        for name, column in zip(self.COLUMNS, values):
+            self.table[name][start:] = column
+        self._count += n
+        if self._positions is not None:
+            self._positions = self._fit_positions(self._positions, int(np.max(task, initial=-1)))
+            self._positions[np.asarray(task)] = np.arange(start, start + n)
+    
+    def pop_task(self, t: int) -> Optional[Dict[str, Any]]:
+        """タスク行tの項目を削除して返す（未登録はNone）"""
+        i = self._position(t)
+        if i < 0:
+            return None
+        entry = self._row_entry(i)
+        self.table['task'][i] = -1
+        self._positions[t] = -1
+        self._count -= 1
+        return entry
+    
+    def pop(self, key: str, *default):
+        t = self.task_index.get(key)
+        entry = None if t is None else self.pop_task(t)
+        if entry is None:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        return entry
+    
+    # --- 参照 ---
+    
+    @staticmethod
+    def _fit_positions(positions: np.ndarray, max_task: int) -> np.ndarray:
+        if max_task < len(positions):
+            return positions
+        grown = np.full(max(max_task + 1, len(positions) * 2), -1, dtype=np.int64)
+        grown[:len(positions)] = positions
+        return grown
+    
+    def _position(self, t: int) -> int:
+        if self._positions is None:
+            tasks = self.table['task']
+            live = np.flatnonzero(tasks >= 0)
+            self._positions = np.full(int(np.max(tasks, initial=-1)) + 1, -1, dtype=np.int64)
+            self._positions[tasks[live]] = live
+        return int(self._positions[t]) if 0 <= t < len(self._positions) else -1
+    
+    def _entry(self, task, equipment, scheduled_year, delay_years, cost, priority, penalty) -> Dict[str, Any]:
+        return {
+            'task_id': self.task_ids[task],
+            'equipment_id': self.equipment_ids[equipment],
+            'scheduled_year': scheduled_year,
+            'cost': cost,
+            'priority': priority,
+            'delay_years': delay_years,
+            'penalty': penalty
+        }
+    
+    def _row_entry(self, i: int) -> Dict[str, Any]:
+        return self._entry(*(self.table[name][i].item() for name in self.COLUMNS))
+    
+    def _iter_entries(self):
+        """(タスクID, 項目辞書)を配置順に生成（CHUNK_ROWS行ずつ変換）"""
+        for start in range(0, self.table.size, self.CHUNK_ROWS):
+            chunk = [self.table[name][start:start + self.CHUNK_ROWS].tolist() for name in self.COLUMNS]
+            for row in zip(*chunk):
+                if row[0] >= 0:
+                    entry = self._entry(*row)
+                    yield entry['task_id'], entry
+    
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        t = self.task_index.get(key)
+        i = -1 if t is None else self._position(t)
+        if i < 0:
+            raise KeyError(key)
+        return self._row_entry(i)
+    
+    def __contains__(self, key) -> bool:
+        t = self.task_index.get(key) if isinstance(key, str) else None
+        return t is not None and self._position(t) >= 0
+    
+    def __iter__(self):
+        ids = self.task_ids
+        for start in range(0, self.table.size, self.CHUNK_ROWS):
+            for t in self.table['task'][start:start + self.CHUNK_ROWS].tolist():
+                if t >= 0:
+                    yield ids[t]
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def items(self) -> ItemsView:
+        return _ScheduleItems(self)
+    
+    def values(self) -> ValuesView:
+        return _ScheduleValues(self)
+    
+    def __repr__(self) -> str:
+        return f"<ScheduleTable ({len(self)} tasks, {self.nbytes / 1e6:.1f}MB)>"
+    
+    @property
+    def nbytes(self) -> int:
+        return self.table.nbytes
+    
+    # --- 列・表形式への変換 ---
+    
+    def _live(self) -> np.ndarray:
+        return np.flatnonzero(self.table['task'] >= 0)
+    
+    def column(self, name: str) -> np.ndarray:
+        """削除行を除いた列配列（配置順）"""
+        return self.table[name][self._live()]
+    
+    def task_years(self, n_tasks: int) -> np.ndarray:
+        """タスク行順の実施年配列（未配置は-1）"""
+        years = np.full(n_tasks, -1, dtype=np.int64)
+        live = self._live()
+        years[self.table['task'][live]] = self.table['scheduled_year'][live]
+        return years
+    
+    def columns(self, rows: Optional[slice] = None) -> Dict[str, Any]:
+        """項目名をキーとする列の辞書（ID列はリスト、その他は配列、rowsは配置順の行範囲）"""
+        live = self._live() if rows is None else self._live()[rows]
+        task_ids, equipment_ids = self.task_ids, self.equipment_ids
+        columns = {name: self.table[name][live] for name in self.COLUMNS}
+        columns['task_id'] = [task_ids[t] for t in columns.pop('task').tolist()]
+        columns['equipment_id'] = [equipment_ids[e] for e in columns.pop('equipment').tolist()]
+        return {name: columns[name] for name in self.FIELDS}
+    
+    def to_dataframe(self, rows: Optional[slice] = None) -> pd.DataFrame:
+        return pd.DataFrame(self.columns(rows))
+    
+    def to_arrow(self):
+        """pyarrow.Table に変換（pyarrowが必要）"""
+        try:
+            pyarrow = importlib.import_module('pyarrow')
+        except ImportError as e:
+            raise ImportError("Arrow export requires pyarrow (pip install pyarrow)") from e
+        return pyarrow.table(self.columns())
+    
+    # --- シリアライズ ---
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        """削除行を除いた列と、参照するID文字列のみを保存（遊具ストアのID一覧全体は含めない）"""
+        live = self._live()
+        columns = {name: self.table[name][live] for name in self.COLUMNS}
+        equipment = np.unique(columns['equipment'])
+        return {
+            'columns': columns,
+            'task_ids': [self.task_ids[t] for t in columns['task'].tolist()],
+            'equipment_rows': equipment,
+            'equipment_ids': [self.equipment_ids[e] for e in equipment.tolist()]
+        }
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        columns = state['columns']
+        tasks = columns['task'].tolist()
+        self.task_ids = dict(zip(tasks, state['task_ids']))
+        self.task_index = dict(zip(state['task_ids'], tasks))
+        self.equipment_ids = dict(zip(state['equipment_rows'].tolist(), state['equipment_ids']))
+        self.table = ColumnTable(self.COLUMNS)
+        self.table.attach(columns)
+        self._count = len(tasks)
+        self._positions = None
+
+
+def result_nbytes(result: Mapping) -> int:
+    """結果辞書の推定メモリ量（スケジュール列の配列サイズ＋その他の項目のpickleサイズ）"""
+    schedule = result.get('schedule')
+    rest = {key: value for key, value in result.items() if key != 'schedule'}
+    nbytes = schedule.nbytes if isinstance(schedule, ScheduleTable) else 0
+    if schedule is not None and not isinstance(schedule, ScheduleTable):
+        rest['schedule'] = schedule
+    try:
+        return nbytes + len(pickle.dumps(rest, protocol=pickle.HIGHEST_PROTOCOL))
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return nbytes + sys.getsizeof(rest)
+
+
+class ResultCache:
+    """求解結果のLRUキャッシュ（推定サイズの合計がmax_bytesを超えたら参照の古い順に破棄）
+    
+    キーには結果を左右する入力（データセット・計画期間・資源容量・戦略など）をすべて含める。
+    複数スレッド（Streamlitのセッション等）から共有できるよう操作はロックで直列化する。
+    """
+    
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Any, Tuple[Any, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key: Any, value: Any, nbytes: Optional[int] = None) -> None:
+        """値を登録（nbytes省略時は結果辞書として推定、上限を超える単独の値は登録しない）"""
+        nbytes = result_nbytes(value) if nbytes is None else nbytes
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                logger.debug(f"Result of {nbytes} bytes exceeds the cache limit of {self.max_bytes} bytes")
+                return
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+    
+    def __contains__(self, key: Any) -> bool:
+        with self._lock:
+            return key in self._entries
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'nbytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+@dataclass
+class SchedulePlan:
+    """直近の解と局所修復用の索引（点検結果の差分更新で再利用）"""
+    problem: SchedulingProblem
+    years: np.ndarray   # タスク別実施年（未配置は-1）
+    engine: SolverEngine
+    result: Dict[str, Any]
+    index: Optional[YearSlotIndex] = None
+    members: Optional[List[set]] = None  # 年度別の配置済みタスク集合
+    
+    def ensure_index(self) -> None:
+        """年度スロット索引と年度別タスク集合を初回のみ構築"""
+        if self.index is not None:
+            return
+        problem = self.problem
+        self.index = YearSlotIndex(problem.capacity, problem.demand)
+        self.index.load(problem.usage(self.years))
+        
+        placed = np.flatnonzero(self.years >= 0)
+        slots = self.years[placed] - problem.start_year
+        by_slot = placed[np.argsort(slots, kind='stable')]
+        bounds = np.searchsorted(np.sort(slots), np.arange(problem.n_years + 1))
+        self.members = [set(by_slot[bounds[i]:bounds[i + 1]].tolist()) for i in range(problem.n_years)]
+    
+    def assign(self, t: int, i: int) -> None:
+        self.index.reserve(i, self.problem.task_demand(t))
+        self.members[i].add(t)
+        self.years[t] = self.problem.start_year + i
+    
+    def unassign(self, t: int) -> None:
+        if self.years[t] < 0:
+            return
+        i = int(self.years[t]) - self.problem.start_year
+        self.index.release(i, self.problem.task_demand(t))
+        self.members[i].discard(t)
+        self.years[t] = -1
+    
+    @staticmethod
+    def _after(keys: Tuple[np.ndarray, ...], t: int, candidates: np.ndarray) -> np.ndarray:
+        """candidatesのうち配置順でタスクtより後になるもの（同順位はタスク番号順）"""
+        after = np.zeros(len(candidates), dtype=bool)
+        tied = np.ones(len(candidates), dtype=bool)
+        for key in reversed(keys):
+            values, value = key[candidates], key[t]
+            after |= tied & (values > value)
+            tied &= values == value
+        return after | (tied & (candidates > t))
+    
+    def first_fit(self, t: int) -> int:
+        problem = self.problem
+        return self.index.first_fit(int(problem.earliest_start[t]) - problem.start_year,
+                                    int(problem.latest_end[t]) - problem.start_year,
+                                    problem.task_demand(t))
+    
+    def place(self, t: int, keys: Tuple[np.ndarray, ...]) -> Dict[int, int]:
+        """未配置のタスクtを再配置し、押し出したタスクの元の実施年を返す
+        
+        先着配置で空きがない年度は、配置順でtより後のタスクを遅い順に退避して場所を空ける。
+        退避タスクは最も早い空き年度へ再配置する（連鎖的な押し出しは行わない）。
+        """
+        problem, index = self.problem, self.index
+        entries = problem.task_demand(t)
+        first = max(int(problem.earliest_start[t]) - problem.start_year, 0)
+        target = self.first_fit(t)
+        stop = target if target >= 0 else min(int(problem.latest_end[t]) - problem.start_year + 1, problem.n_years)
+        
+        displaced: List[int] = []
+        for i in range(first, stop):
+            candidates = np.fromiter(self.members[i], dtype=np.int64, count=len(self.members[i]))
+            victims = candidates[self._after(keys, t, candidates)]
+            if not victims.size:
+                continue
+            # 配置順の遅いタスクから退避
+            victims = victims[np.lexsort((victims,) + tuple(key[victims] for key in keys))[::-1]]
+            evicted = []
+            for u in victims.tolist():
+                if index.fits(i, entries):
+                    break
+                self.unassign(u)
+                evicted.append(u)
+            if index.fits(i, entries):
+                target, displaced = i, evicted
+                break
+            for u in evicted:
+                self.assign(u, i)
+        
+        if target >= 0:
+            self.assign(t, target)
+        for u in displaced:
+            j = self.first_fit(u)
+            if j >= 0:
+                self.assign(u, j)
+        return {u: problem.start_year + target for u in displaced}
+
+
 class OptSeqSchedulerScalable:
     """OptSeq風スケジューラー（100設備対応スケーラブル版）"""
     
-    def __init__(self, start_year: int = 2025, end_year: int = 2040, max_equipment: int = 100):
+    def __init__(self, start_year: int = 2025, end_year: int = 2040, max_equipment: int = 100,
+                 degradation_curve: Any = 'linear'):
         self.start_year = start_year
         self.end_year = end_year
         self.years = list(range(start_year, end_year + 1))
         self.max_equipment = max_equipment
         
-        self.states: Dict[str, State] = {}
-        self.tasks: Dict[str, Task] = {}
+        # 遊具・状態・タスクは列指向ストアで保持し、辞書互換ビューで公開
+        self.fleet = FleetStore()
+        self.states = StateView(self.fleet)
+        self.tasks = TaskView(self.fleet)
         self.resources: Dict[str, Resource] = {}
-        self.equipment: Dict[str, Equipment] = {}
+        self.equipment = EquipmentView(self.fleet)
+        
+        # 直近の解（update_inspectionによる局所修復に使用）
+        self._plan: Optional[SchedulePlan] = None
+        
+        # 複数年ライフサイクル計画（generate_lifecycle_tasksで設定、単発タスクはNone）
+        self.lifecycle = None
+        
+        # 読み込んだ点検履歴のパスと、そこから推定した年次グレード遷移行列（evaluate_riskで使用）
+        self.inspection_csv: Optional[str] = None
+        self._calibrated_transitions: Optional[np.ndarray] = None
+        
+        # 劣化スコア計算エンジン（linear / weibull / markov または DegradationCurve インスタンス）
+        self.degradation_engine = DegradationEngine(degradation_curve)
+        
+        # フェーズ別計測（enable_profilingで有効化、無効時はほぼ無償）
+        self.profiler = PhaseProfiler()
         
         # パフォーマンス追跡
         self.performance_metrics = {
             'load_time': 0,
             'solve_time': 0,
-            'memory_usage': 0,
-            'cpu_cores': mp.cpu_count()
+            'memory_usage': 0
         }
         
-        logger.info(f"OptSeqSchedulerScalable initialized for {start_year}-{end_year}, max {max_equipment} equipment")
-        logger.info(f"Available CPU cores: {self.performance_metrics['cpu_cores']}")
+        logger.debug(f"OptSeqSchedulerScalable initialized for {start_year}-{end_year}, max {max_equipment} equipment")
     
     def add_state(self, state: State) -> None:
         """状態を追加"""
-        self.states[state.id] = state
+        self.fleet.put_state(state)
         logger.debug(f"Added state: {state.id}, grade: {state.grade}, score: {state.score}")
     
     def add_task(self, task: Task) -> None:
         """タスクを追加"""
-        self.tasks[task.id] = task
+        self.fleet.put_task(task)
+        self._plan = None
         logger.debug(f"Added task: {task.id}, priority: {task.priority}")
     
     def add_resource(self, resource: Resource) -> None:
         """リソースを追加"""
         self.resources[resource.name] = resource
+        self._plan = None
         logger.debug(f"Added resource: {resource.name}")
     
     def add_equipment(self, equipment: Equipment) -> None:
         """遊具を追加"""
-        self.equipment[equipment.id] = equipment
+        self.fleet.put_equipment(equipment)
         logger.debug(f"Added equipment: {equipment.id} at {equipment.park_name}")
     
     def compute_degradation_batch(self, equipment_list: List[Equipment], inspection_dict: Dict) -> List[float]:
-        """バッチ処理で劣化スコアを計算（並列処理対応）"""
-        
-        def compute_single_degradation(equipment: Equipment) -> float:
-            # 年数ベースの劣化
-            age = 2025 - equipment.install_year
-            age_factor = min(age / 60, 1.0)  # 60年で完全劣化
-            
-            # 点検結果による補正
-            grade_scores = {'a': 0.1, 'b': 0.3, 'c': 0.5, 'd': 0.7, 'e': 0.9}
-            inspection_data = inspection_dict.get(equipment.id, {'劣化判定': 'b'})
-            inspection_grade = inspection_data.get('劣化判定', 'b')
-            inspection_factor = grade_scores.get(inspection_grade, 0.3)
-            
-            # 加重平均
-            degradation_score = 0.6 * age_factor + 0.4 * inspection_factor
-            return min(max(degradation_score, 0.0), 1.0)
-        
-        # 並列処理で劣化スコア計算
-        n_jobs = min(self.performance_metrics['cpu_cores'], len(equipment_list))
-        degradation_scores = Parallel(n_jobs=n_jobs)(
-            delayed(compute_single_degradation)(eq) for eq in equipment_list
-        )
-        
-        return degradation_scores
+        """複数設備の劣化スコアを一括計算（ベクトル化）"""
+        install_years = np.fromiter((eq.install_year for eq in equipment_list), dtype=float, count=len(equipment_list))
+        inspection_grades = grade_codes([
+            inspection_dict.get(eq.id, {}).get('劣化判定', DEFAULT_INSPECTION_GRADE)
+            for eq in equipment_list
+        ])
+        return self.degradation_engine.scores(install_years, inspection_grades).tolist()
     
     def compute_degradation(self, equipment: Equipment, inspection_data: Dict) -> float:
         """単一設備の劣化スコア計算（互換性維持）"""
-        # 年数ベースの劣化
-        age = 2025 - equipment.install_year
-        age_factor = min(age / 60, 1.0)  # 60年で完全劣化
-        
-        # 点検結果による補正
-        grade_scores = {'a': 0.1, 'b': 0.3, 'c': 0.5, 'd': 0.7, 'e': 0.9}
-        inspection_grade = inspection_data.get('劣化判定', 'b')
-        inspection_factor = grade_scores.get(inspection_grade, 0.3)
-        
-        # 加重平均
-        degradation_score = 0.6 * age_factor + 0.4 * inspection_factor
-        return min(max(degradation_score, 0.0), 1.0)
+        return self.compute_degradation_batch([equipment], {equipment.id: inspection_data})[0]
     
     def degradation_priority(self, state: State) -> int:
         """劣化状態に基づく優先度計算"""
@@ -176,215 +1957,243 @@ class OptSeqSchedulerScalable:
         else:  # a判定
             return 1
     
-    def load_equipment_data(self, equipment_csv: str, inspection_csv: str) -> None:
-        """設備データと点検データを読み込み（100設備対応）"""
+    def enable_profiling(self, memory: bool = False, function_profiler: Optional[str] = None,
+                         listener=None) -> PhaseProfiler:
+        """読み込み・最適化などのフェーズ別計測を有効化（memory=Trueでtracemallocの確保量も記録）
+        
+        function_profilerは 'cprofile' または 'pyinstrument'、listenerは区間の開始・終了イベントを受け取る関数。
+        """
+        self.profiler.enable(memory=memory, function_profiler=function_profiler, listener=listener)
+        return self.profiler
+    
+    def disable_profiling(self) -> None:
+        """フェーズ別計測を無効化（記録は self.profiler.report() で参照可能）"""
+        self.profiler.disable()
+    
+    @profiled('load')
+    def load_equipment_data(self, equipment_csv: str, inspection_csv: str,
+                            cache_dir: Optional[str] = None, seed: Optional[int] = None) -> None:
+        """設備データと点検データを読み込み（列指向のベクトル化ローダー）
+        
+        cache_dirを指定すると、入力CSVの内容・計画期間・劣化設定をキーに構築済みフリートを保存し、
+        次回以降はメモリマップで復元する。修繕費の乱数はseed（省略時は入力内容のハッシュ）で再現可能。
+        """
         start_time = time.time()
-        logger.info(f"Loading equipment and inspection data for up to {self.max_equipment} equipment...")
+        use_cache = cache_dir is not None and self.fleet.is_empty
+        self.inspection_csv = inspection_csv
+        self._calibrated_transitions = None
         
-        # 点検データの読み込み
-        try:
-            inspection_df = pd.read_csv(inspection_csv)
-            inspection_dict = {}
-            for _, row in inspection_df.iterrows():
-                inspection_dict[row['equipment_id']] = row.to_dict()
-        except FileNotFoundError:
-            logger.warning(f"Inspection file {inspection_csv} not found, using default values")
-            inspection_dict = {}
+        # 入力内容のハッシュはキャッシュキーと既定の乱数シードにのみ使用（どちらも不要なら読まない）
+        content_digest = file_digest([equipment_csv, inspection_csv]) if use_cache or seed is None else None
         
-        # 設備データの処理
-        equipment_df = pd.read_csv(equipment_csv)
+        cache_path = None
+        if use_cache:
+            cache_key = hashlib.sha256(json.dumps({
+                'content': content_digest,
+                'start_year': self.start_year,
+                'end_year': self.end_year,
+                'max_equipment': self.max_equipment,
+                'degradation': self.degradation_engine.fingerprint(),
+                'seed': seed
+            }, sort_keys=True).encode()).hexdigest()
+            cache_path = os.path.join(cache_dir, cache_key)
+            if os.path.isdir(cache_path):
+                try:
+                    with self.profiler.span('cache_restore'):
+                        self.fleet.restore(cache_path)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Ignoring unreadable fleet cache {cache_path}: {e}")
+                    self.fleet.__init__()
+                else:
+                    self._plan = None
+                    self.lifecycle = None
+                    load_time = time.time() - start_time
+                    self.performance_metrics['load_time'] = load_time
+                    self.performance_metrics['memory_usage'] = peak_rss_mb()
+                    logger.info(f"Restored {len(self.equipment)} equipment items and {len(self.tasks)} tasks "
+                                f"from cache in {load_time:.3f}s")
+                    return
         
-        count = 0
-        equipment_list = []
+        logger.info(f"Loading equipment and inspection data for up to {self.max_equipment} equipment...")
+        rng = np.random.default_rng(seed if seed is not None else int(content_digest[:16], 16))
         
-        for _, row in equipment_df.iterrows():
-            if count >= self.max_equipment:
-                break
-                
-            # 各遊具タイプに対してequipmentを作成
-            equipment_types = ['踏み板式ブランコ', 'スベリ台', 'ﾌｨｰﾙﾄﾞｱｽﾚﾁｯｸ遊具', 'スプリング遊具', 'ベンチ']
+        # 点検履歴のチャンク読み込み（equipment_id単位で最新判定と劣化傾向に縮約）と設備データの読み込み
+        profiler = self.profiler
+        with profiler.span('csv_parse'):
+            inspection_df = _load_inspection_frame(inspection_csv)
+            equipment_df = pd.read_csv(equipment_csv)
+        
+        # 設備データを遊具単位に展開し、点検グレードをequipment_idでマージ（未点検はb判定扱い）
+        with profiler.span('expand'):
+            fleet_df = _expand_equipment_frame(equipment_df, self.max_equipment)
+            fleet_df = fleet_df.merge(inspection_df, on='equipment_id', how='left')
+            fleet_df['劣化判定'] = fleet_df['劣化判定'].where(fleet_df['_inspected'].notna(), DEFAULT_INSPECTION_GRADE)
+            fleet_df['grade_trend'] = fleet_df['grade_trend'].fillna(0.0)
+        
+        # 劣化スコアを一括計算
+        logger.info(f"Computing degradation scores for {len(fleet_df)} equipment (vectorized)...")
+        with profiler.span('degradation'):
+            inspection_grades = grade_codes(fleet_df['劣化判定'].tolist())
+            scores = self.degradation_engine.scores(fleet_df['install_year'].to_numpy(), inspection_grades)
             
-            for eq_type in equipment_types:
-                if count >= self.max_equipment:
-                    break
-                    
-                # 空文字列や欠損値のチェック
-                eq_count = row.get(eq_type, 0)
-                if pd.isna(eq_count) or eq_count == '' or eq_count == 0:
-                    continue
-                
-                try:
-                    eq_count = int(eq_count)
-                    if eq_count > 0:  # その遊具が存在する場合
-                        # ベンチの複数設置対応
-                        if eq_type == 'ベンチ' and eq_count > 1:
-                            for bench_num in range(1, eq_count + 1):
-                                if count >= self.max_equipment:
-                                    break
-                                eq_id = f"eq_{count:04d}_ベンチ_{bench_num:02d}"
-                                
-                                equipment = Equipment(
-                                    id=eq_id,
-                                    park_name=row['公園名'],
-                                    equipment_type=eq_type,
-                                    install_year=int(row['西暦年']),
-                                    repair_cost=150000 + np.random.randint(-30000, 50000)
-                                )
-                                equipment_list.append(equipment)
-                                count += 1
-                        else:
-                            # 単一遊具の場合
-                            eq_type_mapped = eq_type.replace('ﾌｨｰﾙﾄﾞｱｽﾚﾁｯｸ遊具', 'Athletic遊具')
-                            eq_id = f"eq_{count:04d}_{eq_type_mapped}"
-                            
-                            equipment = Equipment(
-                                id=eq_id,
-                                park_name=row['公園名'],
-                                equipment_type=eq_type,
-                                install_year=int(row['西暦年']),
-                                repair_cost=150000 + np.random.randint(-30000, 50000)
-                            )
-                            equipment_list.append(equipment)
-                            count += 1
-                        
-                except (ValueError, TypeError):
-                    continue
-        
-        # バッチ処理で劣化スコア計算
-        logger.info(f"Computing degradation scores for {len(equipment_list)} equipment (batch processing)...")
-        degradation_scores = self.compute_degradation_batch(equipment_list, inspection_dict)
-        
-        # オブジェクト作成・登録
-        for equipment, degradation_score in zip(equipment_list, degradation_scores):
-            # State作成
-            state = State(
-                id=equipment.id,
-                score=degradation_score,
-                grade='',  # __post_init__で自動設定
+            priorities = np.searchsorted(PRIORITY_THRESHOLDS, scores, side='right') + 1
+            repair_costs = 150000 + rng.integers(-30000, 50000, size=len(fleet_df))
+            earliest_starts = np.maximum(fleet_df['install_year'].to_numpy() + 5, BASE_YEAR)
+        
+        with profiler.span('object_build'):
+            # 遊具・状態を列指向ストアに一括登録
+            equipment_ids = fleet_df['equipment_id'].tolist()
+            rows = self.fleet.extend_fleet(
+                equipment_ids,
+                park_names=fleet_df['park_name'].tolist(),
+                equipment_types=fleet_df['equipment_type'].tolist(),
+                install_years=fleet_df['install_year'].to_numpy(),
+                repair_costs=repair_costs,
+                scores=scores,
+                inspection_grade_codes=inspection_grades,
+                inspection_trends=fleet_df['grade_trend'].to_numpy(),
                 inspection_date="2025-01"
             )
             
-            equipment.current_state = state
-            
-            # オブジェクト登録
-            self.add_equipment(equipment)
-            self.add_state(state)
-            
-            # Task作成
-            priority = self.degradation_priority(state)
-            penalty_coeff = state.score * 1000  # 劣化が進むほど高ペナルティ（現実的な値に調整）
-            
-            task = Task(
-                id=f"repair_{equipment.id}",
-                equipment_id=equipment.id,
-                duration=1,
-                earliest_start=max(equipment.install_year + 5, 2025),
-                latest_end=2040,
-                cost=equipment.repair_cost,
-                priority=priority,
-                penalty_coefficient=penalty_coeff
+            # 修繕タスクを一括登録（劣化が進むほど高ペナルティ）
+            self.fleet.extend_tasks(
+                [f"repair_{eq_id}" for eq_id in equipment_ids],
+                equipment_rows=rows,
+                durations=1,
+                earliest_starts=earliest_starts,
+                latest_ends=self.end_year,
+                costs=repair_costs,
+                priorities=priorities,
+                penalty_coefficients=scores * PENALTY_COEFFICIENT_SCALE
             )
-            
-            self.add_task(task)
         
+        if cache_path is not None:
+            try:
+                with profiler.span('cache_save'):
+                    self.fleet.save(cache_path)
+            except OSError as e:
+                logger.warning(f"Could not write fleet cache {cache_path}: {e}")
+        
+        self._plan = None
+        self.lifecycle = None
         load_time = time.time() - start_time
         self.performance_metrics['load_time'] = load_time
+        self.performance_metrics['memory_usage'] = peak_rss_mb()
         
         logger.info(f"Loaded {len(self.equipment)} equipment items and {len(self.tasks)} tasks in {load_time:.3f}s")
     
-    def solve_parallel(self, strategy: str = "greedy_priority") -> Dict[str, Any]:
-        """並列処理対応のスケジュール最適化"""
+    @profiled('lifecycle')
+    def generate_lifecycle_tasks(self, repair_interval: int = 5, repair_threshold: float = 0.4,
+                                 renewal_threshold: float = 0.6):
+        """設備ごとの単発修繕を計画期間内の介入候補（周期修繕・更新・相互排他の代替案）に置き換える
+        
+        劣化スコアは設備別の表で事前計算し、求解中は確定した介入に合わせて後続タスクの射影を差分更新する。
+        """
+        lifecycle = importlib.import_module('delegator_lifecycle_v5_2_1')
+        self.lifecycle = lifecycle.generate_lifecycle_tasks(self, repair_interval=repair_interval,
+                                                            repair_threshold=repair_threshold,
+                                                            renewal_threshold=renewal_threshold)
+        self._plan = None
+        return self.lifecycle
+    
+    @profiled('solve')
+    def solve_parallel(self, strategy: str = "greedy_priority", **options) -> Dict[str, Any]:
+        """並列処理対応のスケジュール最適化（optionsは戦略エンジンの設定を上書き）"""
         start_time = time.time()
         logger.info(f"Solving schedule with strategy: {strategy} (parallel processing)")
         
-        # 予算・資源制約の設定（100設備対応）
-        # 設備数に応じてスケーリング
-        equipment_count = len(self.equipment)
-        annual_budget = max(2000000, equipment_count * 40000)  # 設備1つあたり4万円/年
-        annual_crew_capacity = max(5, equipment_count // 10)  # 設備10つあたり1件/年
-        
-        budget_resource = Resource(
-            name="Budget",
-            capacity_per_year={year: annual_budget for year in self.years}
-        )
-        crew_resource = Resource(
-            name="Crew", 
-            capacity_per_year={year: annual_crew_capacity for year in self.years}
-        )
+        # 登録済み資源（Budget/Crew未登録時は設備数に応じた既定値）で問題を作成
+        engine = SOLVER_STRATEGIES.get(strategy).configure(**options)
+        engine.profiler = self.profiler
+        with self.profiler.span('build_problem'):
+            problem = self.build_problem()
         
-        self.add_resource(budget_resource)
-        self.add_resource(crew_resource)
+        # 複数コアの活用は strategy="portfolio"（構成を並列に競わせる）で行う
+        logger.info(f"Processing {problem.n_tasks} tasks with {engine.name}")
         
-        # 優先度ベースでタスクをソート（並列処理対応）
-        def sort_key(t):
-            return (-t.priority, t.latest_end, -t.penalty_coefficient)
+        engine_start = time.time()
+        years = engine.solve(problem)
+        if problem.lifecycle is not None:
+            years = problem.lifecycle.prune(years)
+        return self.apply_solution(problem, years, engine, strategy, start_time, time.time() - engine_start)
+    
+    def apply_solution(self, problem: SchedulingProblem, years: np.ndarray, engine: SolverEngine, strategy: str,
+                       start_time: float, engine_time: float) -> Dict[str, Any]:
+        """求めた解（別プロセスで解いたものを含む）の実測値を記録し、結果辞書を組み立てて直近の解として保持"""
+        measurement = SOLVER_STRATEGIES.record(strategy, engine_time, problem.n_tasks, problem.objective(years), engine)
+        if not measurement['within_budget']:
+            logger.warning(f"Strategy {strategy} exceeded its time budget: "
+                           f"{engine_time:.3f}s > {measurement['time_budget']:.3f}s")
         
-        sorted_tasks = sorted(self.tasks.values(), key=sort_key)
+        with self.profiler.span('stats'):
+            result = self._assemble_result(problem, years, engine, strategy, start_time)
         
-        # 年度別リソース追跡
-        schedule = {}
-        annual_cost = {year: 0 for year in self.years}
-        annual_count = {year: 0 for year in self.years}
+        self._plan = SchedulePlan(problem, years, engine, result)
+        return result
+    
+    def _assemble_result(self, problem: SchedulingProblem, years: np.ndarray, engine: SolverEngine,
+                         strategy: str, start_time: float) -> Dict[str, Any]:
+        """解（タスク別実施年）からスケジュール・年度別集計・統計・性能の結果辞書を組み立てる"""
+        # 年度別資源使用量
+        usage = problem.usage(years)
+        annual_usage = {
+            name: dict(zip(self.years, usage[r].tolist()))
+            for r, name in enumerate(problem.resource_names)
+        }
         
-        # バッチ処理でタスクスケジューリング
-        batch_size = max(1, len(sorted_tasks) // self.performance_metrics['cpu_cores'])
-        task_batches = [sorted_tasks[i:i+batch_size] for i in range(0, len(sorted_tasks), batch_size)]
+        # 結果の組み立て（配置順を維持、項目は列配列で保持）
+        active, penalty_coefficients = problem.effective(years)
+        order = engine.order(problem)
+        placed = order[active[order]]
+        if logger.isEnabledFor(logging.DEBUG):
+            for t in placed[years[placed] < 0].tolist():
+                logger.debug(f"Could not schedule task: {self.fleet.task_ids[t]}")
+        placed = placed[years[placed] >= 0]
         
-        logger.info(f"Processing {len(sorted_tasks)} tasks in {len(task_batches)} batches")
+        columns = self._schedule_columns(problem, placed, years, penalty_coefficients)
+        schedule = ScheduleTable.for_fleet(self.fleet)
+        schedule.append(**columns)
         
-        # シーケンシャル処理（リソース競合回避のため）
-        for task in sorted_tasks:
-            scheduled = False
-            
-            # 最優先年から順に配置を試行
-            for year in range(task.earliest_start, min(task.latest_end + 1, self.end_year + 1)):
-                # 制約チェック
-                if (annual_cost[year] + task.cost <= annual_budget and
-                    annual_count[year] + 1 <= annual_crew_capacity):
-                    
-                    # スケジュール決定
-                    schedule[task.id] = {
-                        'task_id': task.id,
-                        'equipment_id': task.equipment_id,
-                        'scheduled_year': year,
-                        'cost': task.cost,
-                        'priority': task.priority,
-                        'delay_years': max(0, year - task.earliest_start),
-                        'penalty': task.penalty_late(max(0, year - task.earliest_start))
-                    }
-                    
-                    annual_cost[year] += task.cost
-                    annual_count[year] += 1
-                    scheduled = True
-                    break
-            
-            if not scheduled:
-                logger.debug(f"Could not schedule task: {task.id}")
+        slots = columns['scheduled_year'] - problem.start_year
+        annual_cost = dict(zip(self.years, np.bincount(slots, weights=columns['cost'],
+                                                       minlength=problem.n_years).tolist()))
+        annual_count = dict(zip(self.years, np.bincount(slots, minlength=problem.n_years).tolist()))
         
         # 結果統計
-        total_cost = sum(item['cost'] for item in schedule.values())
-        total_penalty = sum(item['penalty'] for item in schedule.values())
+        total_cost = float(columns['cost'].sum())
+        total_penalty = float(columns['penalty'].sum())
         scheduled_count = len(schedule)
         
         solve_time = time.time() - start_time
         self.performance_metrics['solve_time'] = solve_time
+        self.performance_metrics['memory_usage'] = peak_rss_mb()
         
         result = {
             'schedule': schedule,
             'annual_cost': annual_cost,
             'annual_count': annual_count,
+            'annual_usage': annual_usage,
             'statistics': {
                 'total_cost': total_cost,
                 'total_penalty': total_penalty,
                 'scheduled_tasks': scheduled_count,
-                'total_tasks': len(self.tasks),
-                'scheduling_ratio': scheduled_count / len(self.tasks) if self.tasks else 0,
-                'annual_budget': annual_budget,
-                'annual_capacity': annual_crew_capacity
+                'total_tasks': int(active.sum()),
+                'scheduling_ratio': scheduled_count / int(active.sum()) if active.any() else 0,
+                'annual_budget': float(problem.resource_capacity('Budget')[0]),
+                'annual_capacity': float(problem.resource_capacity('Crew')[0]),
+                'resource_capacity': {
+                    name: dict(zip(self.years, problem.capacity[r].tolist()))
+                    for r, name in enumerate(problem.resource_names)
+                },
+                'strategy': strategy,
+                'penalty_reduction': engine.info.get('local_search', {}).get('penalty_reduction', 0.0),
+                'penalty_reduction_ratio': engine.info.get('local_search', {}).get('penalty_reduction_ratio', 0.0),
+                'solver_info': engine.info
             },
             'performance': {
                 'solve_time': solve_time,
                 'load_time': self.performance_metrics['load_time'],
+                'memory_usage': self.performance_metrics['memory_usage'],
                 'equipment_per_second': len(self.equipment) / solve_time if solve_time > 0 else 0,
                 'tasks_per_second': len(self.tasks) / solve_time if solve_time > 0 else 0
             }
@@ -393,37 +2202,377 @@ class OptSeqSchedulerScalable:
         logger.info(f"Scheduling completed: {scheduled_count}/{len(self.tasks)} tasks scheduled in {solve_time:.3f}s")
         logger.info(f"Performance: {len(self.equipment):.0f} equipment/s, {len(self.tasks):.0f} tasks/s")
         logger.info(f"Total cost: ¥{total_cost:,.0f}, Total penalty: ¥{total_penalty:,.0f}")
-        
         return result
     
+    @profiled('update_inspection')
+    def update_inspection(self, equipment_id: str, grade: str, inspection_date: Optional[str] = None) -> Dict[str, Any]:
+        """1設備の点検結果を反映し、直近のスケジュールを局所修復（全体の再計算は行わない）
+        
+        ライフサイクル計画では修繕・更新の連鎖で後続タスクの有効性が変わるため局所修復できず、
+        直近の解と同じ設定のエンジンで全設備の問題を解き直す。戻り値の priority は対象設備の
+        タスクに設定した優先度の最大値（タスクがなければ劣化スコアからの優先度）。
+        """
+        start_time = time.time()
+        grade_code = GRADE_CODES.get(grade)
+        if grade_code is None:
+            raise ValueError(f"Unknown inspection grade: {grade} (available: {GRADES})")
+        
+        # 状態（劣化スコア・グレード）を再計算
+        fleet = self.fleet
+        row = fleet.equipment_row(equipment_id)
+        rows = fleet.rows
+        score = float(self.degradation_engine.scores(rows['install_year'][row:row + 1], [grade_code])[0])
+        rows['inspection_grade'][row] = grade_code
+        rows['score'][row] = score
+        rows['grade'][row] = score_to_grade_code(score)
+        if inspection_date is not None:
+            rows['inspection_date'][row] = fleet.inspection_dates.intern(inspection_date)
+        
+        # 対象設備のタスクの優先度・ペナルティ係数を更新
+        task_table = fleet.task_table
+        affected = np.flatnonzero(task_table['equipment'] == row)
+        priority = int(np.searchsorted(PRIORITY_THRESHOLDS, score, side='right')) + 1
+        penalty_coefficient = score * PENALTY_COEFFICIENT_SCALE
+        if self.lifecycle is not None:
+            # ライフサイクル計画は設備の判定項の表を引き直し、タスクごとに最早開始年時点の射影で更新
+            self.lifecycle.refresh(rows, [row])
+            task_scores = self.lifecycle.initial_scores(affected)
+            penalty_coefficient = task_scores * PENALTY_COEFFICIENT_SCALE
+            task_table['priority'][affected] = np.searchsorted(PRIORITY_THRESHOLDS, task_scores, side='right') + 1
+        else:
+            task_table['priority'][affected] = priority
+        task_table['penalty_coefficient'][affected] = penalty_coefficient
+        
+        moved = {}
+        plan = self._plan
+        if plan is not None and plan.problem.lifecycle is not None:
+            # 介入の連鎖は局所修復の対象外のため、同じ設定のエンジンで解き直して差分を返す
+            previous = plan.years.copy()
+            problem = self.build_problem(plan.problem.end_year)
+            engine_start = time.time()
+            current = plan.engine.solve(problem)
+            if problem.lifecycle is not None:
+                current = problem.lifecycle.prune(current)
+            self.apply_solution(problem, current, plan.engine, plan.engine.name, start_time,
+                                time.time() - engine_start)
+            moved = {
+                self.fleet.task_ids[t]: {
+                    'from': int(previous[t]) if previous[t] >= 0 else None,
+                    'to': int(current[t]) if current[t] >= 0 else None
+                }
+                for t in np.flatnonzero(previous != current).tolist()
+            }
+        elif plan is not None:
+            plan.ensure_index()
+            problem = plan.problem
+            problem.priority[affected] = task_table['priority'][affected]
+            problem.penalty_coefficient[affected] = penalty_coefficient
+            previous = {t: int(plan.years[t]) for t in affected.tolist()}
+            
+            # 対象タスクの枠を解放し、配置順に再配置（必要なら後順位のタスクを押し出す）
+            for t in previous:
+                plan.unassign(t)
+            keys = plan.engine.sort_keys(problem)
+            affected_order = affected[np.lexsort((affected,) + tuple(key[affected] for key in keys))]
+            for t in affected_order.tolist():
+                for u, year in plan.place(t, keys).items():
+                    previous.setdefault(u, year)
+            
+            moved = self._refresh_plan_result(plan, previous)
+        
+        elapsed = time.time() - start_time
+        logger.info(f"Inspection update for {equipment_id}: grade {grade}, score {score:.3f}, "
+                    f"{len(moved)} tasks moved in {elapsed * 1000:.1f}ms")
+        
+        return {
+            'equipment_id': equipment_id,
+            'score': score,
+            'grade': GRADES[int(score_to_grade_code(score))],
+            'priority': int(task_table['priority'][affected].max()) if affected.size else priority,
+            'moved': moved,
+            'update_time': elapsed
+        }
+    
+    def _schedule_columns(self, problem: SchedulingProblem, tasks: np.ndarray, years: np.ndarray,
+                          penalty_coefficients: np.ndarray) -> Dict[str, np.ndarray]:
+        """配置済みタスク列のスケジュール結果の列（ScheduleTable.append の引数）"""
+        scheduled = years[tasks]
+        delays = np.maximum(scheduled - problem.earliest_start[tasks], 0)
+        costs = problem.cost[tasks]
+        return {
+            'task': tasks,
+            'equipment': self.fleet.task_table['equipment'][tasks],
+            'scheduled_year': scheduled,
+            'delay_years': delays,
+            'cost': costs,
+            'priority': problem.priority[tasks],
+            'penalty': penalty_coefficients[tasks] * delays * costs * PENALTY_RATE
+        }
+    
+    def _refresh_plan_result(self, plan: SchedulePlan, previous: Dict[int, int]) -> Dict[str, Dict[str, Optional[int]]]:
+        """変更のあったタスク分だけ直近の結果を差分更新し、移動したタスクを返す"""
+        result = plan.result
+        schedule = result['schedule']
+        statistics = result['statistics']
+        moved = {}
+        
+        for t, old_year in previous.items():
+            old_entry = schedule.pop_task(t)
+            if old_entry is not None:
+                statistics['total_cost'] -= old_entry['cost']
+                statistics['total_penalty'] -= old_entry['penalty']
+                statistics['scheduled_tasks'] -= 1
+                result['annual_cost'][old_entry['scheduled_year']] -= old_entry['cost']
+                result['annual_count'][old_entry['scheduled_year']] -= 1
+            
+            new_year = int(plan.years[t])
+            if new_year != old_year:
+                moved[self.fleet.task_ids[t]] = {
+                    'from': old_year if old_year >= 0 else None,
+                    'to': new_year if new_year >= 0 else None
+                }
+        
+        # 再配置されたタスクを変更順に末尾へ追加
+        tasks = np.fromiter(previous, dtype=np.int64, count=len(previous))
+        tasks = tasks[plan.years[tasks] >= 0]
+        columns = self._schedule_columns(plan.problem, tasks, plan.years, plan.problem.penalty_coefficient)
+        schedule.append(**columns)
+        statistics['total_cost'] += float(columns['cost'].sum())
+        statistics['total_penalty'] += float(columns['penalty'].sum())
+        statistics['scheduled_tasks'] += len(tasks)
+        for year, cost in zip(columns['scheduled_year'].tolist(), columns['cost'].tolist()):
+            result['annual_cost'][year] += cost
+            result['annual_count'][year] += 1
+        
+        statistics['scheduling_ratio'] = statistics['scheduled_tasks'] / statistics['total_tasks'] if statistics['total_tasks'] else 0
+        result['annual_usage'] = {
+            name: dict(zip(self.years, plan.index.used[r]))
+            for r, name in enumerate(plan.problem.resource_names)
+        }
+        return moved
+    
+    def default_resources(self, years: Optional[List[int]] = None) -> Dict[str, Resource]:
+        """設備数に応じた既定の予算・施工件数資源（yearsの既定は計画期間）"""
+        years = self.years if years is None else years
+        equipment_count = len(self.equipment)
+        annual_budget = max(2000000, equipment_count * 40000)  # 設備1つあたり4万円/年
+        annual_crew_capacity = max(5, equipment_count // 10)  # 設備10つあたり1件/年
+        return {
+            'Budget': Resource(
+                name="Budget",
+                capacity_per_year={year: annual_budget for year in years},
+                demand='cost'
+            ),
+            'Crew': Resource(
+                name="Crew",
+                capacity_per_year={year: annual_crew_capacity for year in years},
+                demand='count'
+            )
+        }
+    
+    def resource_demand(self, resource: Resource) -> np.ndarray:
+        """資源のタスク別消費量ベクトル"""
+        task_table = self.fleet.task_table
+        demand = resource.demand
+        if demand is None:
+            demand = 'cost' if resource.name == 'Budget' else 'count'
+        
+        if demand == 'cost':
+            values = task_table['cost'].astype(float)
+        elif demand == 'count':
+            values = np.ones(task_table.size)
+        elif isinstance(demand, Mapping):
+            values = np.fromiter((demand.get(task_id, 0.0) for task_id in self.fleet.task_ids),
+                                 dtype=float, count=task_table.size)
+        else:
+            raise ValueError(f"Unknown demand for resource {resource.name}: {demand!r}")
+        
+        # 公園・遊具種類で対象を限定
+        task_rows = task_table['equipment']
+        if resource.parks is not None:
+            codes = self.fleet.park_names.lookup(resource.parks)
+            values = np.where(np.isin(self.fleet.rows['park'][task_rows], codes), values, 0.0)
+        if resource.equipment_types is not None:
+            codes = self.fleet.equipment_types.lookup(resource.equipment_types)
+            values = np.where(np.isin(self.fleet.rows['equipment_type'][task_rows], codes), values, 0.0)
+        return values
+    
+    def build_problem(self, end_year: Optional[int] = None) -> SchedulingProblem:
+        """タスク列と登録済み資源から配列形式のスケジューリング問題を作成（end_yearで計画期間を変更）"""
+        end_year = self.end_year if end_year is None else end_year
+        years = list(range(self.start_year, end_year + 1))
+        task_table = self.fleet.task_table
+        resources = {**self.default_resources(years), **self.resources}
+        
+        lifecycle = self.lifecycle
+        if lifecycle is not None and lifecycle.n_tasks != task_table.size:
+            logger.warning(f"Lifecycle plan covers {lifecycle.n_tasks} tasks but {task_table.size} are registered; "
+                           f"solving without lifecycle projection")
+            lifecycle = None
+        
+        capacity = np.array([
+            [resource.capacity_per_year.get(year, 0.0) for year in years]
+            for resource in resources.values()
+        ], dtype=float).reshape(len(resources), len(years))
+        demand = np.array([self.resource_demand(resource) for resource in resources.values()],
+                          dtype=float).reshape(len(resources), task_table.size)
+        
+        # 計画期間末を期限とする単発修繕は、延長した計画期間の末まで実施可能とする（ライフサイクル候補は期間固定）
+        latest_end = task_table['latest_end'].astype(np.int64)
+        if end_year > self.end_year and lifecycle is None:
+            latest_end[latest_end >= self.end_year] = end_year
+        
+        return SchedulingProblem(
+            start_year=self.start_year,
+            end_year=end_year,
+            earliest_start=task_table['earliest_start'].astype(np.int64),
+            latest_end=latest_end,
+            cost=task_table['cost'].copy(),
+            priority=task_table['priority'].astype(np.int64),
+            penalty_coefficient=task_table['penalty_coefficient'].copy(),
+            capacity=capacity,
+            demand=demand,
+            resource_names=list(resources),
+            lifecycle=lifecycle
+        )
+    
+    def benchmark_strategies(self, quality_target: float = 0.05, strategies: Optional[List[str]] = None) -> Dict[str, Any]:
+        """登録済み戦略を現在のデータで実測し、品質目標を満たす最速戦略を選択"""
+        strategies = strategies or SOLVER_STRATEGIES.names()
+        for strategy in strategies:
+            self.solve_parallel(strategy)
+        
+        selected = SOLVER_STRATEGIES.select(quality_target, candidates=strategies)
+        logger.info(f"Selected strategy: {selected} (quality target {quality_target:.1%})")
+        return {
+            'selected': selected,
+            'measurements': {name: SOLVER_STRATEGIES.measurements[name] for name in strategies}
+        }
+    
+    def solve_milp(self, time_limit: Optional[float] = 60.0, mip_gap: float = 0.01,
+                   threads: Optional[int] = None, warm_start: bool = True) -> Dict[str, Any]:
+        """CBCによる厳密整数計画で解く（貪欲解で初期化、時間制限・MIPギャップ指定）"""
+        return self.solve_parallel('milp', time_limit=time_limit, mip_gap=mip_gap,
+                                   threads=threads, warm_start=warm_start)
+    
+    def solve_scenarios(self, grid: Any, strategy: str = "greedy_priority",
+                        max_workers: Optional[int] = None, **options) -> pd.DataFrame:
+        """予算・施工能力・計画期間の組み合わせをプロセスプールで一括計算（Pareto判定付きの結果表）"""
+        scenarios = importlib.import_module('delegator_scenarios_v5_2_1')
+        return scenarios.solve_scenarios(self, grid, strategy=strategy, max_workers=max_workers, **options)
+    
+    def solve_rolling(self, detail_years: int = 5, aggregate_years: int = 10, block_years: int = 5,
+                      strategy: str = "greedy_priority", warm_start: bool = True, **options) -> Dict[str, Any]:
+        """直近detail_years年度を詳細・その先を集約して解き、1年ずつ確定・前進する（30〜50年の長期計画向け）"""
+        return self.solve_parallel('rolling', detail_years=detail_years, aggregate_years=aggregate_years,
+                                   block_years=block_years, sub_strategy=strategy, warm_start=warm_start, **options)
+    
+    def task_regions(self, districts: Optional[Mapping[str, str]] = None) -> np.ndarray:
+        """タスク別の地区番号（districtsは公園名→地区名、記載のない公園は公園単位）"""
+        parks = self.fleet.rows['park'][self.fleet.task_table['equipment']]
+        if districts is None:
+            return parks.astype(np.int64)
+        park_names = np.array(self.fleet.park_names.values, dtype=object)
+        labels = np.array([districts.get(name, name) for name in park_names], dtype=object)
+        return pd.factorize(labels)[0][parks]
+    
+    def solve_decomposed(self, districts: Optional[Mapping[str, str]] = None, **options) -> Dict[str, Any]:
+        """公園（またはdistrictsの地区）単位に分割して並列に解き、共有の予算・施工件数の配分を反復調整"""
+        return self.solve_parallel('decomposition', regions=self.task_regions(districts), **options)
+    
+    def schedule_years(self, schedule_result: Dict[str, Any]) -> np.ndarray:
+        """スケジュール結果をタスク行順の実施年配列（未配置は-1）に変換"""
+        schedule = schedule_result['schedule']
+        if isinstance(schedule, ScheduleTable) and schedule.task_ids is self.fleet.task_ids:
+            return schedule.task_years(self.fleet.task_table.size)
+        years = np.full(self.fleet.task_table.size, -1, dtype=np.int64)
+        for task_id, item in schedule.items():
+            years[self.fleet.task_row(task_id)] = item['scheduled_year']
+        return years
+    
+    def schedule_frame(self, schedule_result: Dict[str, Any], rows: Optional[slice] = None) -> pd.DataFrame:
+        """スケジュール結果を遊具の公園名・種類・設置年・劣化判定付きの表に変換（未登録の遊具は除外）
+        
+        rowsを指定するとスケジュールの配置順でその範囲の行のみ変換する（画面のページ表示用）。
+        """
+        schedule = schedule_result['schedule']
+        if isinstance(schedule, ScheduleTable):
+            frame = schedule.to_dataframe(rows)
+        else:
+            values = list(schedule.values())
+            frame = pd.DataFrame(values if rows is None else values[rows], columns=list(ScheduleTable.FIELDS))
+        
+        table = self.fleet.rows
+        index = self.fleet._equipment_index
+        rows = np.fromiter((index.get(equipment_id, -1) for equipment_id in frame['equipment_id']),
+                           dtype=np.int64, count=len(frame))
+        known = rows >= 0
+        known[known] = (table['flags'][rows[known]] & FLAG_EQUIPMENT) > 0
+        if not known.all():
+            logger.warning(f"{int((~known).sum())} scheduled tasks refer to unknown equipment; skipping them")
+            frame, rows = frame[known].reset_index(drop=True), rows[known]
+        
+        has_state = (table['flags'][rows] & FLAG_CURRENT_STATE) > 0
+        grade_labels = np.array([grade.upper() for grade in GRADES] + ['N/A'], dtype=object)
+        frame.insert(2, 'park_name', np.array(self.fleet.park_names.values, dtype=object)[table['park'][rows]])
+        frame.insert(3, 'equipment_type',
+                     np.array(self.fleet.equipment_types.values, dtype=object)[table['equipment_type'][rows]])
+        frame.insert(4, 'install_year', table['install_year'][rows])
+        frame.insert(5, 'degradation_grade', grade_labels[np.where(has_state, table['grade'][rows], -1)])
+        frame.insert(6, 'degradation_score', np.where(has_state, table['score'][rows], 0.0))
+        return frame
+    
+    def evaluate_risk(self, candidates: Any = None, n_samples: int = 10000, seed: Optional[int] = 0,
+                      alpha: float = 0.95, transition_matrix: Optional[np.ndarray] = None,
+                      calibrate: bool = True) -> pd.DataFrame:
+        """判定遷移のモンテカルロ標本でスケジュールの期待ペナルティ・VaR・CVaRを評価
+        
+        candidatesは結果辞書、または{名前: 結果辞書/実施年配列}（省略時は直近の解）。
+        transition_matrixは年次グレード遷移行列（a〜eの5×5、各行の和が1）。省略時は calibrate=True なら
+        読み込んだ点検履歴から calibrate_transition_matrix で推定し（読み込みごとに1回）、点検履歴が無い場合や
+        calibrate=False では既定行列（各グレードに平均15年滞留）を使う。同じseed・n_samplesの結果は再現可能。
+        """
+        montecarlo = importlib.import_module('delegator_montecarlo_v5_2_1')
+        if transition_matrix is None and calibrate and self.inspection_csv and os.path.isfile(self.inspection_csv):
+            if self._calibrated_transitions is None:
+                self._calibrated_transitions = montecarlo.calibrate_transition_matrix(self.inspection_csv)
+            transition_matrix = self._calibrated_transitions
+        if candidates is None:
+            if self._plan is None:
+                raise ValueError("No schedule to evaluate: run solve_parallel first or pass candidates")
+            candidates = {self._plan.result['statistics']['strategy']: self._plan.years}
+        elif isinstance(candidates, Mapping) and 'schedule' in candidates:
+            candidates = {candidates['statistics']['strategy']: candidates}
+        years = {
+            name: self.schedule_years(candidate) if isinstance(candidate, Mapping) else np.asarray(candidate)
+            for name, candidate in candidates.items()
+        }
+        simulator = montecarlo.MonteCarloDegradation(self, transition_matrix=transition_matrix,
+                                                     n_samples=n_samples, seed=seed)
+        return simulator.evaluate(years, alpha=alpha)
+    
     def solve(self, strategy: str = "greedy_priority") -> Dict[str, Any]:
         """互換性維持のためのsolveメソッド"""
         return self.solve_parallel(strategy)
     
-    def export_gantt_data(self, schedule_result: Dict[str, Any]) -> List[Dict]:
-        """ガントチャート用データを生成（100設備対応）"""
-        gantt_data = []
+    @profiled('export')
+    def export_gantt_data(self, schedule_result: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """ガントチャート用データを列配列で生成（配置順、未登録の遊具は除外）
         
-        for task_id, task_data in schedule_result['schedule'].items():
-            equipment_id = task_data['equipment_id']
-            if equipment_id not in self.equipment:
-                logger.warning(f"Equipment ID {equipment_id} not found in equipment list. Skipping.")
-                continue
-                
-            equipment = self.equipment[equipment_id]
-            state = equipment.current_state
-            
-            gantt_data.append({
-                'Task': f"{equipment.park_name} - {equipment.equipment_type}",
-                'Start': task_data['scheduled_year'],
-                'Finish': task_data['scheduled_year'],
-                'Resource': f"Grade-{state.grade.upper()}",
-                'Cost': task_data['cost'],
-                'Priority': task_data['priority'],
-                'Penalty': task_data['penalty']
-            })
-        
-        return gantt_data
+        キーは Task（公園名 - 種類）・Park・Start・Finish・Resource（Grade-X）・Grade・Cost・Priority・Penalty。
+        """
+        frame = self.schedule_frame(schedule_result)
+        return {
+            'Task': (frame['park_name'] + ' - ' + frame['equipment_type']).to_numpy(dtype=object),
+            'Park': frame['park_name'].to_numpy(dtype=object),
+            'Start': frame['scheduled_year'].to_numpy(dtype=np.int64),
+            'Finish': frame['scheduled_year'].to_numpy(dtype=np.int64),
+            'Resource': ('Grade-' + frame['degradation_grade']).to_numpy(dtype=object),
+            'Grade': frame['degradation_grade'].to_numpy(dtype=object),
+            'Cost': frame['cost'].to_numpy(),
+            'Priority': frame['priority'].to_numpy(dtype=np.int64),
+            'Penalty': frame['penalty'].to_numpy()
+        }
     
     def get_performance_summary(self) -> Dict[str, Any]:
         """パフォーマンスサマリーを取得"""
@@ -432,15 +2581,18 @@ class OptSeqSchedulerScalable:
             'task_count': len(self.tasks),
             'load_time': self.performance_metrics.get('load_time', 0),
             'solve_time': self.performance_metrics.get('solve_time', 0),
-            'cpu_cores': self.performance_metrics['cpu_cores'],
+            'memory_usage': self.performance_metrics.get('memory_usage', 0),
+            'cpu_cores': os.cpu_count(),
             'equipment_per_second': len(self.equipment) / self.performance_metrics.get('solve_time', 1),
-            'memory_efficient': len(self.equipment) <= self.max_equipment
+            'memory_efficient': len(self.equipment) <= self.max_equipment,
+            'phases': self.profiler.report()
         }
 
 
 # テスト用メイン関数
 def main():
     """テスト実行用メイン関数（100設備対応）"""
+    logging.basicConfig(level=logging.INFO)
     scheduler = OptSeqSchedulerScalable(2025, 2040, max_equipment=100)
     
     # データ読み込み
@@ -462,7 +2614,7 @@ def main():
             equipment = scheduler.equipment[task_data['equipment_id']]
             print(f"{equipment.park_name} - {equipment.equipment_type}: "
                   f"{task_data['scheduled_year']} (Priority: {task_data['priority']}, "
-                  f"Cost: ¥{task_data['cost']:,})")
+                  f"Cost: ¥{task_data['cost']:,.0f})")
             count += 1
         
         if len(result['schedule']) > 10:
@@ -476,7 +2628,7 @@ def main():
         print(f"Total Cost: ¥{stats['total_cost']:,.0f}")
         print(f"Total Penalty: ¥{stats['total_penalty']:,.0f}")
         print(f"Annual Budget: ¥{stats['annual_budget']:,.0f}")
-        print(f"Annual Capacity: {stats['annual_capacity']} tasks/year")
+        print(f"Annual Capacity: {stats['annual_capacity']:.0f} tasks/year")
         
         # パフォーマンス表示
         print(f"\n=== Performance ===")
@@ -488,10 +2640,10 @@ def main():
         
         # ガントチャートデータ生成
         gantt_data = scheduler.export_gantt_data(result)
-        print(f"\nGantt chart data generated: {len(gantt_data)} entries")
+        print(f"\nGantt chart data generated: {len(gantt_data['Start'])} entries")
         
         return result
-        
+    
     except Exception as e:
         logger.error(f"Error in main execution: {e}")
         return None
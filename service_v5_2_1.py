@@ -0,0 +1,899 @@
+"""
+Delegator v5.2.1 スケジューリングサービス（asyncio / ASGI）
+複数の社内ツールから同時に最適化を依頼できるHTTPサービス。読み込んだフリートはメモリに常駐させ、
+求解はプロセスプールで実行し、同一条件の実行中リクエストは1回の求解にまとめる
+
+- データセットはバッチ実行と同じマニフェスト（JSON/CSV）で定義し、初回のリクエスト（または --preload）で読み込む
+- 求解は問題配列を共有メモリ（SharedProblem）で子プロセスへ渡し、結果の組み立ては常駐フリート側で行う
+- 同じ条件（データセット・計画期間・資源容量・戦略・オプション）の依頼は実行中のジョブに合流し、
+  完了した結果はResultCacheから返す
+- 進捗はジョブ単位のイベント（queued / loading / loaded / solving / progress / solved / done / failed）で
+  NDJSONとしてストリーミングする（局所探索中は最良解の更新を progress として通知）
+
+エンドポイント:
+    GET  /health                 稼働状況（常駐フリート・ジョブ数・キャッシュ統計）
+    GET  /datasets               マニフェストのデータセット一覧（常駐中かどうか）
+    POST /fleets/{name}          フリートを読み込んで常駐させる（本文で start_year / end_year を指定可）
+    POST /jobs                   最適化を依頼（?stream=1 で進捗イベントをそのままストリーミング）
+    GET  /jobs/{id}              ジョブの状態と結果サマリー
+    GET  /jobs/{id}/events       進捗イベント（NDJSON、過去分を再送してから完了まで）
+    GET  /jobs/{id}/schedule     スケジュール表（CSV）
+
+依頼の本文（dataset以外は省略時マニフェストの値）:
+    {"dataset": "city_a", "strategy": "greedy_priority", "budget": 50000000, "capacity": 200,
+     "start_year": 2025, "end_year": 2040, "options": {"local_search_time": 5}}
+
+使用例:
+    python service_v5_2_1.py manifest.json --port 8765 --workers 2 --preload
+    DELEGATOR_MANIFEST=manifest.json uvicorn --factory service_v5_2_1:create_app
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing as mp
+import os
+import re
+import signal
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+import numpy as np
+
+from batch_v5_2_1 import LOG_FORMAT, WRITE_CHUNK_ROWS, load_manifest
+from delegator_scenarios_v5_2_1 import SharedProblem
+from delegator_v5_2_1 import (
+    SOLVER_STRATEGIES,
+    OptSeqSchedulerScalable,
+    Resource,
+    ResultCache,
+    peak_rss_mb,
+    result_nbytes
+)
+
+logger = logging.getLogger(__name__)
+
+# 局所探索の進捗を親プロセスへ送る最小間隔（秒）
+PROGRESS_INTERVAL = 0.5
+
+# 保持する完了済みジョブの上限（結果本体はResultCacheの上限に従う）
+MAX_FINISHED_JOBS = 1000
+
+# 依頼で上書きできる項目
+REQUEST_FIELDS = ('dataset', 'strategy', 'budget', 'capacity', 'start_year', 'end_year', 'options')
+
+# HTTPで受け付ける本文の上限（バイト）
+MAX_BODY_BYTES = 1024 * 1024
+
+# 求解プロセスはspawnで起動（イベントループ・スレッドを持つ親プロセスを複製しない）
+SPAWN_CONTEXT = mp.get_context('spawn')
+
+
+# --- 子プロセス側（initializerで進捗キューを受け取る） ---
+
+_progress_queue = None
+
+
+def _init_worker(progress_queue, log_level: int) -> None:
+    global _progress_queue
+    _progress_queue = progress_queue
+    logging.basicConfig(level=log_level, format=LOG_FORMAT)
+
+
+class _ProgressReporter:
+    """局所探索のコールバック（最良解の更新をPROGRESS_INTERVALごとに親プロセスへ送る）"""
+    
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.last = 0.0
+    
+    def send(self, event: str, **fields) -> None:
+        if _progress_queue is not None:
+            _progress_queue.put((self.job_id, event, fields))
+    
+    def __call__(self, state: Dict[str, Any]) -> None:
+        now = time.time()
+        if now - self.last >= PROGRESS_INTERVAL:
+            self.last = now
+            self.send('progress', objective=float(state['objective']), iteration=int(state['iteration']),
+                      elapsed=float(state['elapsed']))
+
+
+def _warm_up() -> int:
+    return os.getpid()
+
+
+def _solve_job(job_id: str, spec: Dict[str, Any], strategy: str,
+               options: Dict[str, Any]) -> Tuple[np.ndarray, Dict[str, Any], float]:
+    """共有メモリ上の問題を解き、タスク別実施年・解法情報・解法時間を返す（子プロセスで実行）"""
+    problem, blocks = SharedProblem.attach(spec)
+    try:
+        engine = SOLVER_STRATEGIES.get(strategy).configure(**options)
+        reporter = _ProgressReporter(job_id)
+        engine.local_search_callback = reporter
+        reporter.send('started', pid=os.getpid(), tasks=problem.n_tasks)
+        
+        start = time.time()
+        years = engine.solve(problem)
+        if problem.lifecycle is not None:
+            years = problem.lifecycle.prune(years)
+        engine_time = time.time() - start
+        years, info = np.array(years, dtype=np.int64), engine.info
+    finally:
+        # 共有メモリを閉じる前に配列ビューへの参照を手放す
+        problem = engine = None
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                logger.debug(f"Shared memory {block.name} is still referenced; leaving it mapped")
+    return years, info, engine_time
+
+
+# --- 親プロセス側 ---
+
+def _apply_resources(scheduler: OptSeqSchedulerScalable, budget: Optional[float], capacity: Optional[float]) -> None:
+    """予算・施工能力を一律の年度別容量として登録（Noneは設備数に応じた既定値）"""
+    for name in ('Budget', 'Crew'):
+        scheduler.resources.pop(name, None)
+    if budget is not None:
+        scheduler.add_resource(Resource(name="Budget", capacity_per_year={year: budget for year in scheduler.years},
+                                        demand='cost'))
+    if capacity is not None:
+        scheduler.add_resource(Resource(name="Crew", capacity_per_year={year: capacity for year in scheduler.years},
+                                        demand='count'))
+
+
+def summarize(result: Dict[str, Any]) -> Dict[str, Any]:
+    """結果辞書からJSONで返すサマリー（統計・年度別集計・性能）を作成"""
+    statistics = result['statistics']
+    return {
+        'statistics': {
+            key: statistics[key]
+            for key in ('strategy', 'scheduled_tasks', 'total_tasks', 'scheduling_ratio', 'total_cost',
+                        'total_penalty', 'annual_budget', 'annual_capacity')
+        },
+        'annual_cost': result['annual_cost'],
+        'annual_count': result['annual_count'],
+        'performance': result['performance']
+    }
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def dumps(payload: Any) -> str:
+    return json.dumps(payload, ensure_ascii=False, default=_json_default)
+
+
+class Fleet:
+    """常駐フリート（読み込み済みスケジューラーと、資源設定・結果組み立てを直列化するロック）"""
+    
+    def __init__(self, key: Tuple[str, int, int]):
+        self.key = key
+        self.scheduler: Optional[OptSeqSchedulerScalable] = None
+        self.load_time = 0.0
+        self.lock = asyncio.Lock()
+        self.loaded: 'asyncio.Future[Fleet]' = asyncio.get_running_loop().create_future()
+    
+    def describe(self) -> Dict[str, Any]:
+        name, start_year, end_year = self.key
+        return {
+            'dataset': name,
+            'start_year': start_year,
+            'end_year': end_year,
+            'loaded': self.scheduler is not None,
+            'equipment': len(self.scheduler.equipment) if self.scheduler is not None else None,
+            'tasks': len(self.scheduler.tasks) if self.scheduler is not None else None,
+            'load_time': self.load_time
+        }
+
+
+class Job:
+    """1件の求解（同一条件の依頼が合流する単位）と進捗イベントの記録"""
+    
+    TERMINAL = ('done', 'failed')
+    
+    def __init__(self, job_id: str, key: Tuple, request: Dict[str, Any]):
+        self.id = job_id
+        self.key = key
+        self.request = request
+        self.status = 'queued'
+        self.requests = 1                   # 合流した依頼の数
+        self.summary: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.events: List[Dict[str, Any]] = []
+        self._subscribers: List[asyncio.Queue] = []
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in self.TERMINAL
+    
+    def publish(self, event: str, **fields) -> None:
+        """イベントを記録して購読中のストリームへ配信（done / failed でジョブの状態を確定）"""
+        if self.finished:
+            return
+        if event in self.TERMINAL or event in ('loading', 'solving'):
+            self.status = event
+        record = {'job': self.id, 'event': event, 'time': round(time.time() - self.created, 3), **fields}
+        self.events.append(record)
+        for queue in self._subscribers:
+            queue.put_nowait(record)
+    
+    async def stream(self) -> AsyncIterator[Dict[str, Any]]:
+        """記録済みのイベントを再送し、完了まで新しいイベントを順に返す"""
+        queue: asyncio.Queue = asyncio.Queue()
+        for record in self.events:
+            queue.put_nowait(record)
+        if not self.finished:
+            self._subscribers.append(queue)
+        try:
+            while True:
+                record = await queue.get()
+                yield record
+                if record['event'] in self.TERMINAL:
+                    return
+        finally:
+            if queue in self._subscribers:
+                self._subscribers.remove(queue)
+    
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'job': self.id,
+            'status': self.status,
+            'request': self.request,
+            'requests': self.requests,
+            'summary': self.summary,
+            'error': self.error,
+            'events': len(self.events)
+        }
+
+
+class SchedulingService:
+    """常駐フリート・プロセスプール・実行中ジョブの合流・結果キャッシュを持つスケジューリングサービス
+    
+    start() / close() はイベントループ内で呼ぶ。submit() は同一条件の実行中ジョブがあればそれを返す。
+    """
+    
+    def __init__(self, datasets: List[Dict[str, Any]], workers: Optional[int] = None, max_fleets: int = 4,
+                 cache_bytes: int = 256 * 1024 * 1024, cache_dir: Optional[str] = None,
+                 log_level: int = logging.WARNING):
+        self.datasets = {dataset['name']: dataset for dataset in datasets}
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.max_fleets = max(1, max_fleets)
+        self.cache_dir = cache_dir
+        self.log_level = log_level
+        self.results = ResultCache(cache_bytes)
+        self.fleets: 'OrderedDict[Tuple[str, int, int], Fleet]' = OrderedDict()
+        self.jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._inflight: Dict[Tuple, Job] = {}
+        self._next_id = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._progress_queue = None
+        self._pump: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    async def start(self) -> None:
+        """プロセスプールと進捗の中継スレッドを起動（起動済みなら何もしない）"""
+        if self._pool is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._progress_queue = SPAWN_CONTEXT.Queue()
+        self._pool = self._create_pool()
+        self._pump = threading.Thread(target=self._relay_progress, name='progress-relay', daemon=True)
+        self._pump.start()
+        logger.info(f"Scheduling service started with {self.workers} solver processes, "
+                    f"{len(self.datasets)} datasets")
+    
+    def _create_pool(self) -> ProcessPoolExecutor:
+        pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=SPAWN_CONTEXT, initializer=_init_worker,
+                                   initargs=(self._progress_queue, self.log_level))
+        # 子プロセスを先に起動しておき、初回の依頼でspawn・importを待たせない
+        for _ in range(self.workers):
+            pool.submit(_warm_up)
+        return pool
+    
+    async def close(self) -> None:
+        """実行中の求解の完了を待ってプロセスプールを停止"""
+        if self._pool is None:
+            return
+        pool, self._pool = self._pool, None
+        await self._loop.run_in_executor(None, pool.shutdown)
+        self._progress_queue.put(None)
+        self._pump.join()
+        self._progress_queue.close()
+    
+    def _relay_progress(self) -> None:
+        """子プロセスの進捗をイベントループへ中継（中継スレッドで実行）"""
+        while True:
+            message = self._progress_queue.get()
+            if message is None:
+                return
+            job_id, event, fields = message
+            self._loop.call_soon_threadsafe(self._publish, job_id, event, fields)
+    
+    def _publish(self, job_id: str, event: str, fields: Dict[str, Any]) -> None:
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job.publish(event, **fields)
+    
+    # --- フリート ---
+    
+    def dataset(self, name: str) -> Dict[str, Any]:
+        if name not in self.datasets:
+            raise KeyError(f"Unknown dataset: {name} (available: {sorted(self.datasets)})")
+        return self.datasets[name]
+    
+    async def fleet(self, name: str, start_year: Optional[int] = None, end_year: Optional[int] = None,
+                    job: Optional[Job] = None) -> Fleet:
+        """常駐フリートを返す（未読み込みなら読み込む、同じフリートの同時読み込みは1回にまとめる）"""
+        dataset = self.dataset(name)
+        key = (name, int(start_year or dataset['start_year']), int(end_year or dataset['end_year']))
+        if key[2] < key[1]:
+            raise ValueError(f"end_year {key[2]} is before start_year {key[1]}")
+        
+        fleet = self.fleets.get(key)
+        if fleet is None:
+            fleet = self.fleets[key] = Fleet(key)
+            self._evict_fleets()
+            asyncio.ensure_future(self._load(fleet, dataset))
+        self.fleets.move_to_end(key)
+        
+        if not fleet.loaded.done() and job is not None:
+            job.publish('loading', dataset=name)
+        try:
+            return await asyncio.shield(fleet.loaded)
+        finally:
+            if job is not None and fleet.scheduler is not None:
+                job.publish('loaded', equipment=len(fleet.scheduler.equipment), load_time=fleet.load_time)
+    
+    async def _load(self, fleet: Fleet, dataset: Dict[str, Any]) -> None:
+        _, start_year, end_year = fleet.key
+        
+        def load() -> OptSeqSchedulerScalable:
+            scheduler = OptSeqSchedulerScalable(start_year, end_year, max_equipment=dataset['max_equipment'])
+            scheduler.load_equipment_data(dataset['equipment_csv'], dataset['inspection_csv'],
+                                          cache_dir=self.cache_dir, seed=dataset['seed'])
+            return scheduler
+        
+        start = time.perf_counter()
+        try:
+            fleet.scheduler = await self._loop.run_in_executor(None, load)
+        except Exception as e:
+            # 失敗したフリートは常駐させない（次の依頼で読み込みをやり直す）
+            if self.fleets.get(fleet.key) is fleet:
+                del self.fleets[fleet.key]
+            fleet.loaded.set_exception(e)
+            return
+        fleet.load_time = time.perf_counter() - start
+        logger.info(f"Loaded fleet {fleet.key}: {len(fleet.scheduler.equipment)} equipment "
+                    f"in {fleet.load_time:.2f}s")
+        fleet.loaded.set_result(fleet)
+    
+    def _evict_fleets(self) -> None:
+        """常駐数がmax_fleetsを超えたら参照の古い読み込み済みフリートを手放す（実行中の求解は参照を保持）"""
+        for key in list(self.fleets):
+            if len(self.fleets) <= self.max_fleets:
+                return
+            if self.fleets[key].loaded.done():
+                logger.info(f"Evicting fleet {key}")
+                del self.fleets[key]
+    
+    # --- ジョブ ---
+    
+    def normalize(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """依頼をマニフェストの既定値で補完・検証（誤りはValueError、未知のデータセットはKeyError）"""
+        if not isinstance(request, dict):
+            raise ValueError("request body must be a JSON object")
+        unknown = set(request) - set(REQUEST_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown request fields {sorted(unknown)}")
+        if 'dataset' not in request:
+            raise ValueError("request is missing 'dataset'")
+        dataset = self.dataset(str(request['dataset']))
+        merged = {field: request.get(field, dataset.get(field)) for field in REQUEST_FIELDS}
+        merged['dataset'] = dataset['name']
+        
+        try:
+            for field in ('start_year', 'end_year'):
+                merged[field] = int(merged[field])
+            for field in ('budget', 'capacity'):
+                if merged[field] is not None:
+                    merged[field] = float(merged[field])
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"invalid number: {e}") from None
+        
+        options = merged['options'] or {}
+        if not isinstance(options, dict):
+            raise ValueError("options must be an object")
+        if merged['strategy'] not in SOLVER_STRATEGIES:
+            raise ValueError(f"unknown strategy {merged['strategy']!r} (available: {SOLVER_STRATEGIES.names()})")
+        engine = SOLVER_STRATEGIES.get(merged['strategy'])
+        for option in options:
+            if option.endswith('_callback') or option == 'profiler' or not hasattr(engine, option):
+                raise ValueError(f"option {option!r} cannot be set for strategy {merged['strategy']}")
+        merged['options'] = options
+        return merged
+    
+    @staticmethod
+    def request_key(request: Dict[str, Any]) -> Tuple:
+        """結果を左右する入力をすべて含むキー（合流・キャッシュ用）"""
+        return (request['dataset'], request['start_year'], request['end_year'], request['budget'],
+                request['capacity'], request['strategy'], json.dumps(request['options'], sort_keys=True))
+    
+    def submit(self, request: Dict[str, Any]) -> Tuple[Job, bool]:
+        """最適化を依頼して (ジョブ, 合流したか) を返す（キャッシュ済みなら完了済みのジョブ）"""
+        request = self.normalize(request)
+        key = self.request_key(request)
+        job = self._inflight.get(key)
+        if job is not None:
+            job.requests += 1
+            job.publish('joined', requests=job.requests)
+            return job, True
+        
+        self._next_id += 1
+        job = Job(f"{self._next_id:06d}", key, request)
+        self.jobs[job.id] = job
+        self._trim_jobs()
+        
+        result = self.results.get(key)
+        if result is not None:
+            job.summary = summarize(result)
+            job.publish('done', cached=True, summary=job.summary)
+            return job, False
+        
+        self._inflight[key] = job
+        job.publish('queued')
+        asyncio.ensure_future(self._run(job))
+        return job, False
+    
+    def _trim_jobs(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[job_id]
+    
+    async def _run(self, job: Job) -> None:
+        request = job.request
+        shared = None
+        try:
+            fleet = await self.fleet(request['dataset'], request['start_year'], request['end_year'], job=job)
+            scheduler = fleet.scheduler
+            start_time = time.time()
+            
+            # 資源設定と問題の作成はフリート単位で直列化（求解中は他の依頼が同じフリートを使える）
+            async with fleet.lock:
+                def build():
+                    _apply_resources(scheduler, request['budget'], request['capacity'])
+                    return scheduler.build_problem()
+                problem = await self._loop.run_in_executor(None, build)
+            shared = SharedProblem(problem)
+            
+            job.publish('solving', strategy=request['strategy'], tasks=problem.n_tasks)
+            pool = self._pool
+            try:
+                years, info, engine_time = await asyncio.wrap_future(
+                    pool.submit(_solve_job, job.id, shared.spec, request['strategy'], request['options']))
+            except BrokenProcessPool:
+                # 子プロセスの異常終了（メモリ不足等）で壊れたプールは作り直し、以降の依頼を受け付ける
+                if self._pool is pool:
+                    logger.error("Solver process pool broke; starting a new one")
+                    self._pool = self._create_pool()
+                    pool.shutdown(wait=False)
+                raise
+            job.publish('solved', engine_time=engine_time)
+            
+            async with fleet.lock:
+                def assemble():
+                    engine = SOLVER_STRATEGIES.get(request['strategy']).configure(**request['options'])
+                    engine.info = info
+                    return scheduler.apply_solution(problem, years, engine, request['strategy'], start_time,
+                                                    engine_time)
+                result = await self._loop.run_in_executor(None, assemble)
+            
+            self.results.put(job.key, result, nbytes=result_nbytes(result))
+            job.summary = summarize(result)
+            job.publish('done', cached=False, summary=job.summary)
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            logger.error(f"Job {job.id} failed: {job.error}\n{traceback.format_exc()}")
+            job.publish('failed', error=job.error)
+        finally:
+            if shared is not None:
+                shared.close()
+            self._inflight.pop(job.key, None)
+    
+    def job(self, job_id: str) -> Job:
+        if job_id not in self.jobs:
+            raise KeyError(f"Unknown job: {job_id}")
+        return self.jobs[job_id]
+    
+    async def schedule_csv(self, job_id: str) -> AsyncIterator[bytes]:
+        """完了したジョブのスケジュール表をCSVの断片で返す（結果がキャッシュから外れていればLookupError）"""
+        job = self.job(job_id)
+        result = self.results.get(job.key) if job.status == 'done' else None
+        fleet = self.fleets.get(job.key[:3])
+        if result is None or fleet is None or fleet.scheduler is None:
+            raise LookupError(f"Schedule of job {job_id} is not available; submit the request again")
+        frame = await self._loop.run_in_executor(None, fleet.scheduler.schedule_frame, result)
+        for start in range(0, max(len(frame), 1), WRITE_CHUNK_ROWS):
+            chunk = frame.iloc[start:start + WRITE_CHUNK_ROWS]
+            yield (await self._loop.run_in_executor(None, lambda: chunk.to_csv(index=False, header=start == 0))
+                   ).encode('utf-8')
+    
+    def health(self) -> Dict[str, Any]:
+        return {
+            'status': 'ok',
+            'workers': self.workers,
+            'fleets': [fleet.describe() for fleet in self.fleets.values()],
+            'jobs': {
+                'total': len(self.jobs),
+                'running': len(self._inflight)
+            },
+            'cache': self.results.stats(),
+            'peak_rss_mb': peak_rss_mb()
+        }
+
+
+# --- ASGIアプリケーション ---
+
+class ServiceApp:
+    """SchedulingServiceのHTTP API（ASGI、uvicorn等または serve() で実行）"""
+    
+    ROUTES = [
+        ('GET', re.compile(r'^/health$'), 'health'),
+        ('GET', re.compile(r'^/datasets$'), 'datasets'),
+        ('POST', re.compile(r'^/fleets/(?P<name>[^/]+)$'), 'load_fleet'),
+        ('POST', re.compile(r'^/jobs$'), 'submit'),
+        ('GET', re.compile(r'^/jobs/(?P<job_id>[^/]+)$'), 'get_job'),
+        ('GET', re.compile(r'^/jobs/(?P<job_id>[^/]+)/events$'), 'events'),
+        ('GET', re.compile(r'^/jobs/(?P<job_id>[^/]+)/schedule$'), 'schedule'),
+    ]
+    
+    def __init__(self, service: SchedulingService):
+        self.service = service
+    
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        await self.service.start()
+        
+        path = scope['path'].rstrip('/') or '/'
+        allowed = []
+        for method, pattern, handler in self.ROUTES:
+            match = pattern.match(path)
+            if match is None:
+                continue
+            if method != scope['method']:
+                allowed.append(method)
+                continue
+            try:
+                await getattr(self, handler)(scope, receive, send, **match.groupdict())
+            except KeyError as e:
+                await self._send_json(send, 404, {'error': e.args[0] if e.args else str(e)})
+            except LookupError as e:
+                await self._send_json(send, 410, {'error': str(e)})
+            except ValueError as e:
+                await self._send_json(send, 400, {'error': str(e)})
+            return
+        if allowed:
+            await self._send_json(send, 405, {'error': f"method {scope['method']} not allowed"},
+                                  headers=[(b'allow', ', '.join(allowed).encode())])
+        else:
+            await self._send_json(send, 404, {'error': f"not found: {path}"})
+    
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.service.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.service.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    # --- 応答 ---
+    
+    @staticmethod
+    async def _read_json(receive) -> Any:
+        body = b''
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            body += message.get('body', b'')
+            if len(body) > MAX_BODY_BYTES:
+                raise ValueError(f"request body exceeds {MAX_BODY_BYTES} bytes")
+            if not message.get('more_body'):
+                break
+        if not body.strip():
+            return {}
+        try:
+            return json.loads(body)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"invalid JSON: {e}") from None
+    
+    @staticmethod
+    async def _send_json(send, status: int, payload: Any, headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+        body = dumps(payload).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json; charset=utf-8'),
+                        (b'content-length', str(len(body)).encode())] + (headers or [])
+        })
+        await send({'type': 'http.response.body', 'body': body})
+    
+    @staticmethod
+    async def _send_stream(receive, send, status: int, content_type: bytes, chunks: AsyncIterator[bytes],
+                           headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+        """断片を順に送信（クライアントが切断したら打ち切る、ジョブ自体は継続）"""
+        async def disconnected() -> None:
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+        
+        watcher = asyncio.ensure_future(disconnected())
+        try:
+            await send({'type': 'http.response.start', 'status': status,
+                        'headers': [(b'content-type', content_type), (b'cache-control', b'no-cache')] + (headers or [])})
+            async for chunk in chunks:
+                if watcher.done():
+                    return
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        except (ConnectionError, OSError):
+            logger.debug("Client disconnected during streaming")
+        finally:
+            watcher.cancel()
+    
+    async def _send_events(self, receive, send, job: Job, status: int = 200,
+                           headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+        async def lines() -> AsyncIterator[bytes]:
+            async for record in job.stream():
+                yield (dumps(record) + '\n').encode('utf-8')
+        
+        await self._send_stream(receive, send, status, b'application/x-ndjson', lines(), headers=headers)
+    
+    # --- ハンドラー ---
+    
+    async def health(self, scope, receive, send) -> None:
+        await self._send_json(send, 200, self.service.health())
+    
+    async def datasets(self, scope, receive, send) -> None:
+        resident = {fleet.key[0] for fleet in self.service.fleets.values() if fleet.scheduler is not None}
+        await self._send_json(send, 200, [
+            {
+                'name': name,
+                'start_year': dataset['start_year'],
+                'end_year': dataset['end_year'],
+                'strategy': dataset['strategy'],
+                'budget': dataset['budget'],
+                'capacity': dataset['capacity'],
+                'resident': name in resident
+            }
+            for name, dataset in self.service.datasets.items()
+        ])
+    
+    async def load_fleet(self, scope, receive, send, name: str) -> None:
+        body = await self._read_json(receive)
+        if not isinstance(body, dict):
+            raise ValueError("request body must be a JSON object")
+        fleet = await self.service.fleet(name, body.get('start_year'), body.get('end_year'))
+        await self._send_json(send, 200, fleet.describe())
+    
+    async def submit(self, scope, receive, send) -> None:
+        job, coalesced = self.service.submit(await self._read_json(receive))
+        headers = [(b'location', f"/jobs/{job.id}".encode()), (b'x-job-id', job.id.encode())]
+        query = parse_qs(scope.get('query_string', b'').decode())
+        if query.get('stream', ['0'])[0] not in ('0', 'false', ''):
+            await self._send_events(receive, send, job, status=202, headers=headers)
+        else:
+            await self._send_json(send, 202, {**job.describe(), 'coalesced': coalesced}, headers=headers)
+    
+    async def get_job(self, scope, receive, send, job_id: str) -> None:
+        await self._send_json(send, 200, self.service.job(job_id).describe())
+    
+    async def events(self, scope, receive, send, job_id: str) -> None:
+        await self._send_events(receive, send, self.service.job(job_id))
+    
+    async def schedule(self, scope, receive, send, job_id: str) -> None:
+        chunks = self.service.schedule_csv(job_id)
+        # 先頭の断片を作ってから応答を開始（結果が無い場合は410で返す）
+        first = await chunks.__anext__()
+        
+        async def rest() -> AsyncIterator[bytes]:
+            yield first
+            async for chunk in chunks:
+                yield chunk
+        
+        await self._send_stream(receive, send, 200, b'text/csv; charset=utf-8', rest())
+
+
+def create_app(manifest: Optional[str] = None, **options) -> ServiceApp:
+    """マニフェスト（省略時は環境変数 DELEGATOR_MANIFEST）からASGIアプリケーションを作成"""
+    manifest = manifest or os.environ.get('DELEGATOR_MANIFEST')
+    if not manifest:
+        raise ValueError("manifest path is required (argument or DELEGATOR_MANIFEST)")
+    return ServiceApp(SchedulingService(load_manifest(manifest), **options))
+
+
+# --- 組み込みHTTPサーバー（ASGIサーバー未導入の環境でのローカル実行用） ---
+
+HTTP_STATUS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               410: 'Gone', 411: 'Length Required', 500: 'Internal Server Error'}
+
+
+async def _handle_connection(app, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """1接続1リクエストのHTTP/1.1をASGIアプリケーションへ中継（応答は本文長または chunked）"""
+    try:
+        request_line = (await reader.readline()).decode('latin-1').rstrip('\r\n')
+        if not request_line:
+            return
+        method, target, _ = request_line.split(' ', 2)
+        headers = []
+        while True:
+            line = (await reader.readline()).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers.append((name.strip().lower().encode('latin-1'), value.strip().encode('latin-1')))
+        header_map = dict(headers)
+        if b'chunked' in header_map.get(b'transfer-encoding', b''):
+            writer.write(b'HTTP/1.1 411 Length Required\r\ncontent-length: 0\r\nconnection: close\r\n\r\n')
+            return
+        length = int(header_map.get(b'content-length', b'0'))
+        if length > MAX_BODY_BYTES:
+            writer.write(b'HTTP/1.1 400 Bad Request\r\ncontent-length: 0\r\nconnection: close\r\n\r\n')
+            return
+        body = await reader.readexactly(length) if length else b''
+    except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+        writer.close()
+        return
+    
+    path, _, query = target.partition('?')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method.upper(),
+        'path': path,
+        'raw_path': path.encode('latin-1'),
+        'query_string': query.encode('latin-1'),
+        'headers': headers,
+        'client': writer.get_extra_info('peername'),
+        'server': writer.get_extra_info('sockname')
+    }
+    # 本文の後は接続が閉じられるまで待ち、切断として通知
+    closed = asyncio.ensure_future(reader.read())
+    pending_body = [body]
+    chunked = False
+    
+    async def receive() -> Dict[str, Any]:
+        if pending_body:
+            return {'type': 'http.request', 'body': pending_body.pop(), 'more_body': False}
+        await closed
+        return {'type': 'http.disconnect'}
+    
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal chunked
+        if message['type'] == 'http.response.start':
+            status = message['status']
+            response_headers = list(message.get('headers', []))
+            chunked = not any(name.lower() == b'content-length' for name, _ in response_headers)
+            if chunked:
+                response_headers.append((b'transfer-encoding', b'chunked'))
+            lines = [f"HTTP/1.1 {status} {HTTP_STATUS.get(status, '')}".encode('latin-1')]
+            lines += [name + b': ' + value for name, value in response_headers]
+            lines.append(b'connection: close')
+            writer.write(b'\r\n'.join(lines) + b'\r\n\r\n')
+        elif message['type'] == 'http.response.body':
+            data = message.get('body', b'')
+            if chunked:
+                if data:
+                    writer.write(f"{len(data):x}\r\n".encode() + data + b'\r\n')
+                if not message.get('more_body'):
+                    writer.write(b'0\r\n\r\n')
+            else:
+                writer.write(data)
+        await writer.drain()
+    
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        logger.error(f"Unhandled error for {method} {target}\n{traceback.format_exc()}")
+    finally:
+        closed.cancel()
+        writer.close()
+
+
+async def serve(app, host: str = '127.0.0.1', port: int = 8765, ready=None,
+                stop: Optional[asyncio.Event] = None) -> None:
+    """組み込みHTTPサーバーで app を実行（ready は待ち受け開始後に呼ぶ関数、stop が設定されたら終了）"""
+    server = await asyncio.start_server(lambda r, w: _handle_connection(app, r, w), host, port)
+    if ready is not None:
+        ready(server)
+    async with server:
+        if stop is None:
+            await server.serve_forever()
+        else:
+            await stop.wait()
+
+
+async def _serve_service(app: ServiceApp, host: str, port: int, preload: bool) -> None:
+    service = app.service
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windowsでは Ctrl+C（KeyboardInterrupt）で終了
+    
+    await service.start()
+    try:
+        if preload:
+            # 読み込みに失敗したデータセットは記録のみ（依頼時に再度読み込みを試みる）
+            names = list(service.datasets)
+            loaded = await asyncio.gather(*(service.fleet(name) for name in names), return_exceptions=True)
+            for name, fleet in zip(names, loaded):
+                if isinstance(fleet, Exception):
+                    logger.warning(f"Could not preload dataset {name}: {type(fleet).__name__}: {fleet}")
+        await serve(app, host, port, stop=stop,
+                    ready=lambda server: print(f"Delegator v5.2.1 service listening on http://{host}:{port} "
+                                               f"({len(service.datasets)} datasets, {service.workers} workers)",
+                                               flush=True))
+    finally:
+        await service.close()
+        logger.info("Scheduling service stopped")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Delegator v5.2.1 スケジューリングサービス（HTTP API）')
+    parser.add_argument('manifest', help='データセット一覧（JSON/CSV、バッチ実行と同じ形式）')
+    parser.add_argument('--host', default='127.0.0.1', help='待ち受けアドレス')
+    parser.add_argument('--port', type=int, default=8765, help='待ち受けポート')
+    parser.add_argument('--workers', type=int, default=None, help='求解プロセス数（省略時はCPU数）')
+    parser.add_argument('--max-fleets', type=int, default=4, help='常駐させるフリートの上限')
+    parser.add_argument('--cache-mb', type=int, default=256, help='結果キャッシュの上限（MB）')
+    parser.add_argument('--cache-dir', default=None, help='構築済みフリートのキャッシュ先（読み込みの再利用）')
+    parser.add_argument('--preload', action='store_true', help='起動時に全データセットを読み込む')
+    parser.add_argument('--log-level', default='INFO', help='ログレベル（子プロセスを含む）')
+    args = parser.parse_args(argv)
+    
+    log_level = logging.getLevelName(args.log_level.upper())
+    if not isinstance(log_level, int):
+        parser.error(f"unknown log level {args.log_level!r}")
+    logging.basicConfig(level=log_level, format=LOG_FORMAT)
+    
+    try:
+        app = create_app(args.manifest, workers=args.workers, max_fleets=args.max_fleets,
+                         cache_bytes=args.cache_mb * 1024 * 1024, cache_dir=args.cache_dir, log_level=log_level)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    try:
+        asyncio.run(_serve_service(app, args.host, args.port, args.preload))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
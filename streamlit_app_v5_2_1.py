@@ -5,13 +5,16 @@ Streamlit UI for Delegator v5.2.1
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import json
+import logging
 from datetime import datetime
 import sys
 import os
+import threading
 import time
 import psutil
 
@@ -19,11 +22,15 @@ import psutil
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from delegator_v5_2_1 import OptSeqSchedulerScalable, State, Task, Equipment
+    from delegator_v5_2_1 import (OptSeqSchedulerScalable, State, Task, Equipment, Resource, ResultCache,
+                                  DEFAULT_FLEET_CACHE_DIR, result_nbytes)
 except ImportError:
     st.error("delegator_v5_2_1.py が見つかりません。同じディレクトリに配置してください。")
     st.stop()
 
+# ログ設定（スケジューラーのINFOログを表示）
+logging.basicConfig(level=logging.INFO)
+
 # ページ設定
 st.set_page_config(
     page_title="Delegator v5.2.1 - 大規模スケーリング対応メンテナンス計画",
@@ -148,8 +155,8 @@ tab1, tab2, tab3, tab4, tab5 = st.tabs([
     "📋 詳細レポート"
 ])
 
-# データ読み込み関数
-@st.cache_data
+# データ読み込み関数（遊具データは全セッションで共有し、再実行ごとの複製を避ける）
+@st.cache_resource
 def load_scheduler_data(dataset_option, start_year, end_year):
     """データセットに応じたスケジューラーの初期化"""
     config = dataset_config[dataset_option]
@@ -159,6 +166,7 @@ def load_scheduler_data(dataset_option, start_year, end_year):
         end_year, 
         max_equipment=config["max_equipment"]
     )
+    scheduler.enable_profiling()  # フェーズ別の処理時間（パフォーマンスタブで表示）
     
     # データファイルの確認
     equipment_file = config["equipment_file"]
@@ -167,7 +175,7 @@ def load_scheduler_data(dataset_option, start_year, end_year):
     if os.path.exists(equipment_file) and os.path.exists(inspection_file):
         try:
             start_time = time.time()
-            scheduler.load_equipment_data(equipment_file, inspection_file)
+            scheduler.load_equipment_data(equipment_file, inspection_file, cache_dir=DEFAULT_FLEET_CACHE_DIR)
             load_time = time.time() - start_time
             return scheduler, load_time, None
         except Exception as e:
@@ -176,6 +184,85 @@ def load_scheduler_data(dataset_option, start_year, end_year):
         error_msg = f"データファイルが見つかりません: {equipment_file}, {inspection_file}"
         return None, 0, error_msg
 
+RESULT_CACHE_BYTES = 256 * 1024 * 1024  # 求解結果キャッシュの上限（推定サイズ）
+
+
+@st.cache_resource
+def solve_cache():
+    """全セッション共有の求解結果キャッシュと、共有スケジューラーへの資源登録・求解を直列化するロック"""
+    return ResultCache(max_bytes=RESULT_CACHE_BYTES), threading.Lock()
+
+# ガントチャート描画（劣化判定ごとに1トレース）
+GRADE_COLORS = {'A': 'green', 'B': 'blue', 'C': 'orange', 'D': 'red', 'E': 'darkred'}
+WEBGL_THRESHOLD = 1000  # これを超える件数はWebGL（Scattergl）で描画
+LABELED_ROWS = 200      # これ以下の件数のみ縦軸に設備名を表示
+
+
+def gantt_figure(gantt, rows, title):
+    """指定行のガントチャート（タスクはNaN区切りの線分として劣化判定ごとの1トレースにまとめる）"""
+    rows = rows[np.argsort(-gantt['Priority'][rows], kind='stable')]  # 優先度の高い順に下から配置
+    n = len(rows)
+    positions = np.arange(n, dtype=float)
+    trace_type = go.Scattergl if n > WEBGL_THRESHOLD else go.Scatter
+    
+    fig = go.Figure()
+    grades = gantt['Grade'][rows]
+    for grade in [g for g in list(GRADE_COLORS) + ['N/A'] if np.any(grades == g)]:
+        mask = grades == grade
+        selected = rows[mask]
+        gap = np.full(len(selected), np.nan)
+        hover = np.column_stack([gantt['Task'][selected], gantt['Cost'][selected],
+                                 gantt['Priority'][selected], gantt['Penalty'][selected]])
+        color = GRADE_COLORS.get(grade, 'gray')
+        fig.add_trace(trace_type(
+            x=np.column_stack([gantt['Start'][selected], gantt['Finish'][selected], gap]).ravel(),
+            y=np.column_stack([positions[mask], positions[mask], gap]).ravel(),
+            customdata=np.repeat(hover, 3, axis=0),
+            mode='lines+markers',
+            line=dict(color=color, width=8),
+            marker=dict(color=color, size=8),
+            name=f"{grade}判定",
+            hovertemplate=(
+                "<b>%{customdata[0]}</b><br>"
+                "年度: %{x}<br>"
+                f"劣化判定: {grade}<br>"
+                "コスト: ¥%{customdata[1]:,.0f}<br>"
+                "優先度: %{customdata[2]}<br>"
+                "ペナルティ: ¥%{customdata[3]:,.0f}"
+                "<extra></extra>"
+            )
+        ))
+    
+    if n <= LABELED_ROWS:
+        labels = [f"{i + 1}. {task[:20]}..." if len(task) > 20 else f"{i + 1}. {task}"
+                  for i, task in enumerate(gantt['Task'][rows])]
+        yaxis = dict(tickmode='array', tickvals=list(range(n)), ticktext=labels)
+    else:
+        yaxis = dict(showticklabels=False)
+    fig.update_layout(
+        title=title,
+        xaxis_title="年度",
+        yaxis_title="設備",
+        yaxis=yaxis,
+        height=max(400, min(n * 25, 1200)),
+        legend_title_text="劣化判定"
+    )
+    return fig
+
+
+def park_year_table(gantt, metric):
+    """公園×年度の集計表（サーバー側で集計し、行は集計値の大きい順）"""
+    frame = pd.DataFrame({
+        '公園': gantt['Park'],
+        '年度': gantt['Start'],
+        '件数': np.ones(len(gantt['Start']), dtype=np.int64),
+        'コスト': gantt['Cost'],
+        'ペナルティ': gantt['Penalty']
+    })
+    table = frame.pivot_table(index='公園', columns='年度', values=metric, aggfunc='sum', fill_value=0)
+    return table.loc[table.sum(axis=1).sort_values(ascending=False, kind='stable').index]
+
+
 # データ読み込み
 scheduler, load_time, error_msg = load_scheduler_data(dataset_option, start_year, end_year)
 
@@ -313,40 +400,65 @@ with tab1:
 with tab2:
     st.header("📅 最適化スケジュール結果")
     
+    # 求解結果は入力条件をキーにキャッシュ（同じ条件への切り替えは再計算しない）
+    result_cache, solve_lock = solve_cache()
+    cache_key = (dataset_option, start_year, end_year, annual_budget, annual_capacity, strategy)
+    cached = result_cache.get(cache_key)
+    
     if 'execute_scheduling' in st.session_state and st.session_state.execute_scheduling:
         # データセットが変更された場合の警告
         if 'dataset_option' in st.session_state and st.session_state.dataset_option != dataset_option:
             st.warning("⚠️ データセットが変更されています。再度実行ボタンを押してください。")
-            st.session_state.execute_scheduling = False
+        elif cached is not None:
+            st.info("♻️ 同じ条件の計算結果を再利用しました")
         else:
             with st.spinner(f"スケジュールを最適化中... ({dataset_option})"):
                 try:
-                    # パフォーマンス測定開始
-                    start_time = time.time()
-                    start_memory = psutil.Process().memory_info().rss / 1024 / 1024  # MB
-                    
-                    # スケジュール実行
-                    if enable_parallel:
-                        result = scheduler.solve_parallel(strategy)
-                    else:
-                        result = scheduler.solve(strategy)
-                    
-                    # パフォーマンス測定終了
-                    end_time = time.time()
-                    end_memory = psutil.Process().memory_info().rss / 1024 / 1024  # MB
+                    # 共有スケジューラーの資源を書き換えるため、他セッションの求解と直列化
+                    with solve_lock:
+                        # パフォーマンス測定開始
+                        start_time = time.time()
+                        start_memory = psutil.Process().memory_info().rss / 1024 / 1024  # MB
+                        
+                        # サイドバーの予算・施工件数を資源として登録
+                        years = range(start_year, end_year + 1)
+                        scheduler.add_resource(Resource(
+                            name="Budget",
+                            capacity_per_year={year: annual_budget for year in years},
+                            demand='cost'
+                        ))
+                        scheduler.add_resource(Resource(
+                            name="Crew",
+                            capacity_per_year={year: annual_capacity for year in years},
+                            demand='count'
+                        ))
+                        
+                        # スケジュール実行
+                        if enable_parallel:
+                            result = scheduler.solve_parallel(strategy)
+                        else:
+                            result = scheduler.solve(strategy)
+                        
+                        # パフォーマンス測定終了
+                        end_time = time.time()
+                        end_memory = psutil.Process().memory_info().rss / 1024 / 1024  # MB
+                        phases = scheduler.profiler.report()
                     
                     execution_time = end_time - start_time
                     memory_usage = end_memory - start_memory
                     
-                    # 結果とパフォーマンス情報を保存
-                    st.session_state.schedule_result = result
-                    st.session_state.performance_info = {
-                        'execution_time': execution_time,
-                        'memory_usage': memory_usage,
-                        'parallel_enabled': enable_parallel,
-                        'dataset_size': len(scheduler.equipment)
+                    # 結果とパフォーマンス情報をキャッシュ
+                    cached = {
+                        'result': result,
+                        'performance_info': {
+                            'execution_time': execution_time,
+                            'memory_usage': memory_usage,
+                            'parallel_enabled': enable_parallel,
+                            'dataset_size': len(scheduler.equipment),
+                            'phases': phases
+                        }
                     }
-                    st.session_state.execute_scheduling = False
+                    result_cache.put(cache_key, cached, nbytes=result_nbytes(result))
                     
                     # 成功メッセージ
                     if show_performance:
@@ -354,7 +466,15 @@ with tab2:
                 
                 except Exception as e:
                     st.error(f"❌ スケジュール実行エラー: {str(e)}")
-                    st.session_state.execute_scheduling = False
+        st.session_state.execute_scheduling = False
+    
+    # キャッシュ済みの条件なら結果を差し替え（セッションには参照のみ保持）
+    if cached is not None:
+        st.session_state.schedule_result = cached['result']
+        st.session_state.performance_info = cached['performance_info']
+        st.session_state.schedule_key = cache_key
+    elif 'schedule_result' in st.session_state and st.session_state.get('schedule_key') != cache_key:
+        st.info("ℹ️ 条件が変更されています。表示中は前回の条件の結果です（実行ボタンで再計算）")
     
     if 'schedule_result' in st.session_state:
         result = st.session_state.schedule_result
@@ -437,45 +557,38 @@ with tab2:
         
         # スケジュール詳細表
         st.subheader("スケジュール詳細")
-        schedule_data = []
-        for task_id, task_data in result['schedule'].items():
-            # 設備IDの安全な取得
-            equipment_id = task_data['equipment_id']
-            if equipment_id not in scheduler.equipment:
-                st.warning(f"設備ID {equipment_id} が見つかりません。スキップします。")
-                continue
-                
-            equipment = scheduler.equipment[equipment_id]
-            state = equipment.current_state
-            
-            schedule_data.append({
-                '公園名': equipment.park_name,
-                '設備種類': equipment.equipment_type,
-                '劣化判定': state.grade.upper() if state else 'N/A',
-                'スケジュール年': task_data['scheduled_year'],
-                '優先度': task_data['priority'],
-                'コスト': f"¥{task_data['cost']:,.0f}",
-                '遅延年数': task_data['delay_years'],
-                'ペナルティ': f"¥{task_data['penalty']:,.0f}"
-            })
         
-        schedule_df = pd.DataFrame(schedule_data)
+        def schedule_page(rows: slice) -> pd.DataFrame:
+            # 結果は列配列で保持されているため、表示用の表は指定行のみ整形
+            schedule_frame = scheduler.schedule_frame(result, rows=rows)
+            return pd.DataFrame({
+                '公園名': schedule_frame['park_name'],
+                '設備種類': schedule_frame['equipment_type'],
+                '劣化判定': schedule_frame['degradation_grade'],
+                'スケジュール年': schedule_frame['scheduled_year'],
+                '優先度': schedule_frame['priority'],
+                'コスト': schedule_frame['cost'],
+                '遅延年数': schedule_frame['delay_years'],
+                'ペナルティ': schedule_frame['penalty']
+            })
+        money_format = {'コスト': "¥{:,.0f}", 'ペナルティ': "¥{:,.0f}"}
+        n_scheduled = len(result['schedule'])
         
         # 大規模データの場合はページング
-        if len(schedule_df) > 50:
-            st.write(f"総スケジュール件数: {len(schedule_df)}件")
+        if n_scheduled > 50:
+            st.write(f"総スケジュール件数: {n_scheduled}件")
             page_size = 50
-            total_pages = (len(schedule_df) - 1) // page_size + 1
+            total_pages = (n_scheduled - 1) // page_size + 1
             page = st.selectbox("ページ選択", range(1, total_pages + 1), key="schedule_page")
             
             start_idx = (page - 1) * page_size
-            end_idx = min(start_idx + page_size, len(schedule_df))
-            display_schedule_df = schedule_df.iloc[start_idx:end_idx]
+            end_idx = min(start_idx + page_size, n_scheduled)
+            display_schedule_df = schedule_page(slice(start_idx, end_idx))
             
-            st.write(f"表示: {start_idx + 1} - {end_idx} / {len(schedule_df)}")
-            st.dataframe(display_schedule_df, use_container_width=True)
+            st.write(f"表示: {start_idx + 1} - {end_idx} / {n_scheduled}")
+            st.dataframe(display_schedule_df.style.format(money_format), use_container_width=True)
         else:
-            st.dataframe(schedule_df, use_container_width=True)
+            st.dataframe(schedule_page(slice(None)).style.format(money_format), use_container_width=True)
     
     else:
         st.info("サイドバーの「スケジュール実行」ボタンを押してください。")
@@ -486,61 +599,40 @@ with tab3:
     
     if 'schedule_result' in st.session_state:
         result = st.session_state.schedule_result
-        gantt_data = scheduler.export_gantt_data(result)
-        
-        if gantt_data:
-            # 大規模データの場合は表示件数を制限
-            max_display = 200
-            if len(gantt_data) > max_display:
-                st.warning(f"⚠️ 表示件数制限: {len(gantt_data)}件中{max_display}件を表示")
-                # 優先度の高いもの順にソート
-                gantt_data_sorted = sorted(gantt_data, key=lambda x: x['Priority'], reverse=True)
-                gantt_data_display = gantt_data_sorted[:max_display]
-            else:
-                gantt_data_display = gantt_data
-            
-            # Plotlyガントチャート
-            fig = go.Figure()
-            
-            colors = {'A': 'green', 'B': 'blue', 'C': 'orange', 'D': 'red', 'E': 'darkred'}
+        gantt = scheduler.export_gantt_data(result)
+        n_tasks = len(gantt['Start'])
+        
+        if n_tasks:
+            view = st.radio("表示モード", ["全件ガントチャート", "公園×年度ヒートマップ"], horizontal=True)
             
-            for i, task in enumerate(gantt_data_display):
-                grade = task['Resource'].split('-')[1]
-                color = colors.get(grade, 'gray')
+            if view == "全件ガントチャート":
+                fig = gantt_figure(gantt, np.arange(n_tasks), f"修繕スケジュール ガントチャート ({n_tasks}件表示)")
+                st.plotly_chart(fig, use_container_width=True)
+            else:
+                col1, col2 = st.columns(2)
+                with col1:
+                    metric = st.selectbox("集計値", ["件数", "コスト", "ペナルティ"])
+                table = park_year_table(gantt, metric)
+                with col2:
+                    top_n = st.number_input("表示公園数（集計値の上位）", min_value=1, max_value=len(table),
+                                            value=min(50, len(table)))
                 
-                fig.add_trace(go.Scatter(
-                    x=[task['Start'], task['Finish']],
-                    y=[i, i],
-                    mode='lines+markers',
-                    line=dict(color=color, width=8),
-                    name=f"{task['Task'][:30]}... ({grade})" if len(task['Task']) > 30 else f"{task['Task']} ({grade})",
-                    hovertemplate=f"""
-                    <b>{task['Task']}</b><br>
-                    年度: {task['Start']}<br>
-                    劣化判定: {grade}<br>
-                    コスト: ¥{task['Cost']:,.0f}<br>
-                    優先度: {task['Priority']}<br>
-                    ペナルティ: ¥{task['Penalty']:,.0f}
-                    <extra></extra>
-                    """
-                ))
-            
-            fig.update_layout(
-                title=f"修繕スケジュール ガントチャート ({len(gantt_data_display)}件表示)",
-                xaxis_title="年度",
-                yaxis_title="設備",
-                yaxis=dict(
-                    tickmode='array',
-                    tickvals=list(range(len(gantt_data_display))),
-                    ticktext=[f"{i+1}. {task['Task'][:20]}..." if len(task['Task']) > 20 
-                             else f"{i+1}. {task['Task']}" 
-                             for i, task in enumerate(gantt_data_display)]
-                ),
-                height=max(400, min(len(gantt_data_display) * 25, 1200)),
-                showlegend=False
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
+                heatmap = table.iloc[:top_n]
+                fig_heatmap = px.imshow(
+                    heatmap,
+                    aspect='auto',
+                    color_continuous_scale='Reds',
+                    labels={'x': '年度', 'y': '公園', 'color': metric},
+                    title=f"公園×年度 {metric}（上位{len(heatmap)} / {len(table)}公園）"
+                )
+                fig_heatmap.update_layout(height=max(400, min(len(heatmap) * 20, 1200)))
+                st.plotly_chart(fig_heatmap, use_container_width=True)
+                
+                # ドリルダウン: 選択した公園のタスクをガントチャートで表示
+                park = st.selectbox("詳細を表示する公園", list(heatmap.index))
+                park_rows = np.flatnonzero(gantt['Park'] == park)
+                st.plotly_chart(gantt_figure(gantt, park_rows, f"{park} の修繕スケジュール ({len(park_rows)}件)"),
+                                use_container_width=True)
             
             # 劣化判定別の凡例
             st.subheader("劣化判定凡例")
@@ -556,10 +648,6 @@ with tab3:
                 st.markdown("🔴 **D判定**: 3ヶ月以内")
             with col5:
                 st.markdown("🔴 **E判定**: 緊急対応")
-            
-            # 統計情報
-            if len(gantt_data) != len(gantt_data_display):
-                st.info(f"📊 全{len(gantt_data)}件中、優先度上位{len(gantt_data_display)}件を表示中")
         
         else:
             st.warning("ガントチャートデータがありません。")
@@ -637,7 +725,24 @@ with tab4:
         # パフォーマンスグラフ
         st.subheader("📊 処理時間内訳")
         
-        if 'performance' in result:
+        if perf.get('phases'):
+            # フェーズ別計測（読み込み・最適化の内部フェーズの直近の処理時間）
+            phase_df = pd.DataFrame([
+                {'フェーズ': path, '上位フェーズ': path.split('/')[0], '時間(秒)': record['last_time'],
+                 '呼び出し回数': record['calls'], 'ピークRSS(MB)': record['peak_rss_mb']}
+                for path, record in perf['phases'].items() if record['depth'] == 1
+            ])
+            if not phase_df.empty:
+                fig_breakdown = px.bar(
+                    phase_df,
+                    x='フェーズ',
+                    y='時間(秒)',
+                    color='上位フェーズ',
+                    title="処理時間内訳（フェーズ別）"
+                )
+                st.plotly_chart(fig_breakdown, use_container_width=True)
+                st.dataframe(phase_df, use_container_width=True)
+        elif 'performance' in result:
             perf_data = result['performance']
             
             # 処理時間の内訳
@@ -763,7 +868,9 @@ with tab5:
         # JSON出力
         st.subheader("スケジュール結果（JSON）")
         with st.expander("JSON データを表示"):
-            st.json(result)
+            # スケジュール本体は件数のみ（全件はCSVダウンロードで取得）
+            schedule = result['schedule']
+            st.json({**result, 'schedule': f"{len(schedule)} tasks ({getattr(schedule, 'nbytes', 0) / 1e6:.1f}MB)"})
         
         # CSV ダウンロード
         st.subheader("📥 データダウンロード")
@@ -772,31 +879,7 @@ with tab5:
         
         with col1:
             if st.button("📥 スケジュール結果をCSVでダウンロード"):
-                schedule_data = []
-                for task_id, task_data in result['schedule'].items():
-                    equipment_id = task_data['equipment_id']
-                    if equipment_id not in scheduler.equipment:
-                        continue  # 見つからない設備IDはスキップ
-                        
-                    equipment = scheduler.equipment[equipment_id]
-                    state = equipment.current_state
-                    
-                    schedule_data.append({
-                        'task_id': task_id,
-                        'equipment_id': task_data['equipment_id'],
-                        'park_name': equipment.park_name,
-                        'equipment_type': equipment.equipment_type,
-                        'install_year': equipment.install_year,
-                        'degradation_grade': state.grade.upper() if state else 'N/A',
-                        'degradation_score': state.score if state else 0,
-                        'scheduled_year': task_data['scheduled_year'],
-                        'priority': task_data['priority'],
-                        'cost': task_data['cost'],
-                        'delay_years': task_data['delay_years'],
-                        'penalty': task_data['penalty']
-                    })
-                
-                schedule_csv = pd.DataFrame(schedule_data)
+                schedule_csv = scheduler.schedule_frame(result)
                 csv_string = schedule_csv.to_csv(index=False, encoding='utf-8-sig')
                 
                 st.download_button(
@@ -3,10 +3,11 @@ Delegator v5.2.1 超大規模1331遊具パフォーマンステスト
 241公園1331遊具での極限スケーリング性能検証
 """
 
+import logging
 import time
 import psutil
 import os
-from delegator_v5_2_1 import OptSeqSchedulerScalable
+from delegator_v5_2_1 import OptSeqSchedulerScalable, DEFAULT_FLEET_CACHE_DIR
 import json
 from datetime import datetime
 import pandas as pd
@@ -96,7 +97,8 @@ def ultra_scale_performance_test():
     try:
         scheduler.load_equipment_data(
             'input_park_playequipment_241.csv',
-            'inspectionList_parkEquipment_1331.csv'
+            'inspectionList_parkEquipment_1331.csv',
+            cache_dir=DEFAULT_FLEET_CACHE_DIR
         )
         load_time = time.time() - start_time
         
@@ -325,4 +327,5 @@ def ultra_scale_performance_test():
     return results
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     ultra_scale_performance_test()
@@ -0,0 +1,307 @@
+"""
+Delegator v5.2.1 回帰テスト
+小規模な合成CSVで読み込み・計画期間・分割解法などの不具合の再発を確認する
+
+使用例:
+    python -m pytest -q test_regression_v5_2_1.py
+    python test_regression_v5_2_1.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from delegator_montecarlo_v5_2_1 import calibrate_transition_matrix
+from delegator_v5_2_1 import (
+    DEFAULT_INSPECTION_GRADE,
+    GRADE_CODES,
+    SOLVER_STRATEGIES,
+    OptSeqSchedulerScalable,
+    Resource,
+    SchedulingProblem,
+    YearSlotIndex,
+    greedy_first_fit
+)
+
+EQUIPMENT_HEADER = '公園名,西暦年,踏み板式ブランコ,スベリ台,ﾌｨｰﾙﾄﾞｱｽﾚﾁｯｸ遊具,スプリング遊具,ベンチ\n'
+
+
+def write_equipment_csv(directory: str, n_parks: int = 20, seed: int = 0) -> str:
+    """公園単位の設備CSV（設置年1970〜2015、各タイプ0〜2台）を書き出してパスを返す"""
+    rng = np.random.default_rng(seed)
+    path = os.path.join(directory, 'equipment.csv')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(EQUIPMENT_HEADER)
+        for park in range(n_parks):
+            counts = ','.join(str(c) for c in rng.integers(0, 3, size=5))
+            f.write(f"park{park},{int(rng.integers(1970, 2016))},{counts}\n")
+    return path
+
+
+def test_missing_inspection_file_uses_default_grade():
+    """点検CSVが無い場合は既定の判定で読み込む（キャッシュ有無どちらも）"""
+    with tempfile.TemporaryDirectory() as directory:
+        equipment_csv = write_equipment_csv(directory)
+        missing = os.path.join(directory, 'no_such_inspection.csv')
+        
+        for cache_dir in (None, os.path.join(directory, 'cache')):
+            scheduler = OptSeqSchedulerScalable(2025, 2040, max_equipment=1000)
+            scheduler.load_equipment_data(equipment_csv, missing, cache_dir=cache_dir)
+            assert len(scheduler.equipment) > 0
+            assert len(scheduler.tasks) == len(scheduler.equipment)
+            grades = scheduler.fleet.rows['inspection_grade'][:len(scheduler.equipment)]
+            assert np.all(grades == GRADE_CODES[DEFAULT_INSPECTION_GRADE])
+        
+        # キャッシュから復元しても同じ内容（欠損もキャッシュキーに含まれる）
+        restored = OptSeqSchedulerScalable(2025, 2040, max_equipment=1000)
+        restored.load_equipment_data(equipment_csv, missing, cache_dir=os.path.join(directory, 'cache'))
+        assert list(restored.tasks) == list(scheduler.tasks)
+
+
+
+def test_repairs_use_scheduler_end_year():
+    """単発修繕の期限は計画期間末（2040年を超える計画期間でも後半の年度に配置できる）"""
+    with tempfile.TemporaryDirectory() as directory:
+        scheduler = OptSeqSchedulerScalable(2025, 2050, max_equipment=1000)
+        scheduler.load_equipment_data(write_equipment_csv(directory), os.path.join(directory, 'none.csv'), seed=0)
+        assert np.all(scheduler.fleet.task_table['latest_end'] == 2050)
+        
+        scheduler.add_resource(Resource('Budget', {year: 4e5 for year in scheduler.years}))
+        result = scheduler.solve_parallel('greedy_priority')
+        assert sum(count for year, count in result['annual_count'].items() if year > 2040) > 0
+
+
+def test_scenario_penalty_counts_deferred_tasks():
+    """シナリオのtotal_penaltyは先送り分を含み、予算を絞るほど費用は下がりペナルティは上がる"""
+    with tempfile.TemporaryDirectory() as directory:
+        scheduler = OptSeqSchedulerScalable(2025, 2040, max_equipment=1000)
+        scheduler.load_equipment_data(write_equipment_csv(directory), os.path.join(directory, 'none.csv'), seed=0)
+        frame = scheduler.solve_scenarios({'Budget': [2e5, 1e6, 1e9]}, max_workers=1)
+        assert frame['total_cost'].is_monotonic_increasing
+        assert frame['total_penalty'].is_monotonic_decreasing
+        assert frame['total_penalty'].iloc[0] > frame['total_penalty'].iloc[-1]
+        assert np.all(frame['total_penalty'] >= frame['scheduled_penalty'])
+
+
+def test_scenario_end_year_requires_registered_capacity():
+    """計画期間を超えるend_yearは、容量未定義の登録済み資源をgridで指定しない限り拒否する"""
+    with tempfile.TemporaryDirectory() as directory:
+        scheduler = OptSeqSchedulerScalable(2025, 2040, max_equipment=1000)
+        scheduler.load_equipment_data(write_equipment_csv(directory), os.path.join(directory, 'none.csv'), seed=0)
+        scheduler.add_resource(Resource('Crew', {year: 20 for year in scheduler.years}, demand='count'))
+        try:
+            scheduler.solve_scenarios({'end_year': [2045]}, max_workers=1)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("end_year beyond registered capacity was accepted")
+        frame = scheduler.solve_scenarios({'end_year': [2045], 'Crew': [20]}, max_workers=1)
+        assert frame['scheduled_tasks'].iloc[0] > 0
+
+
+
+def test_decomposition_allocates_crews_by_penalty():
+    """分割解法は施工件数を地区の遅延ペナルティに応じて配分し、優先度順の全体貪欲解より目的関数が小さい
+    
+    地区0は優先度が高いが安価な修繕、地区1は優先度が低いが高額で1件あたりの遅延ペナルティが大きい修繕。
+    """
+    n, n_years = 1000, 10
+    district = np.repeat([0, 1], n)
+    problem = SchedulingProblem(
+        start_year=2025,
+        end_year=2025 + n_years - 1,
+        earliest_start=np.full(2 * n, 2025),
+        latest_end=np.full(2 * n, 2025 + n_years - 1),
+        cost=np.where(district == 0, 1e5, 1e6),
+        priority=np.where(district == 0, 3, 2),
+        penalty_coefficient=np.where(district == 0, 400.0, 300.0),
+        capacity=np.full((1, n_years), n / n_years),
+        demand=np.ones((1, 2 * n)),
+        resource_names=['Crew']
+    )
+    greedy = SOLVER_STRATEGIES.get('greedy_priority').solve(problem)
+    engine = SOLVER_STRATEGIES.get('decomposition').configure(regions=district, max_workers=1)
+    years = engine.solve(problem)
+    
+    assert np.all(problem.usage(years) <= problem.capacity + 1e-9)
+    assert problem.objective(years) < problem.objective(greedy)
+    history = engine.info['objective_history']
+    assert all(later <= earlier for earlier, later in zip(history, history[1:]))
+
+
+def test_inspection_updates_keep_capacity_and_totals():
+    """点検結果の局所修復を繰り返しても資源容量を超えず、同じ配置から組み立て直した結果と集計が一致する"""
+    with tempfile.TemporaryDirectory() as directory:
+        scheduler = OptSeqSchedulerScalable(2025, 2040, max_equipment=1000)
+        scheduler.load_equipment_data(write_equipment_csv(directory, n_parks=40), os.path.join(directory, 'none.csv'),
+                                      seed=0)
+        scheduler.add_resource(Resource('Budget', {year: 6e5 for year in scheduler.years}))
+        scheduler.add_resource(Resource('Crew', {year: 4 for year in scheduler.years}, demand='count'))
+        scheduler.solve_parallel('greedy_priority')
+        
+        rng = np.random.default_rng(0)
+        equipment_ids = scheduler.fleet.equipment_ids
+        moved = 0
+        for _ in range(50):
+            equipment_id = equipment_ids[int(rng.integers(len(equipment_ids)))]
+            moved += len(scheduler.update_inspection(equipment_id, str(rng.choice(list(GRADE_CODES))))['moved'])
+            
+            plan = scheduler._plan
+            problem = scheduler.build_problem()
+            assert np.all(problem.usage(plan.years) <= problem.capacity + 1e-6)
+            for r, name in enumerate(problem.resource_names):
+                usage = np.array([plan.result['annual_usage'][name][year] for year in scheduler.years])
+                assert np.all(usage <= problem.capacity[r] + 1e-6)
+            
+            fresh = scheduler._assemble_result(problem, plan.years, plan.engine, 'greedy_priority', time.time())
+            result = plan.result
+            for year in scheduler.years:
+                assert np.isclose(result['annual_cost'][year], fresh['annual_cost'][year], rtol=1e-9, atol=1e-6)
+                assert result['annual_count'][year] == fresh['annual_count'][year]
+            for key in ('total_cost', 'total_penalty', 'scheduled_tasks'):
+                assert np.isclose(result['statistics'][key], fresh['statistics'][key], rtol=1e-9, atol=1e-6)
+        assert moved > 0
+
+
+def write_inspection_history(directory: str, equipment_ids, seed: int = 0) -> str:
+    """設備ごとに2019〜2023年の毎年の点検（判定は確率0.5で1段階悪化）と、その2年前のe判定の点検を書き出す"""
+    rng = np.random.default_rng(seed)
+    path = os.path.join(directory, 'inspection.csv')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('equipment_id,劣化判定,点検年月\n')
+        for equipment_id in equipment_ids:
+            code = int(rng.integers(0, 2))
+            for year in range(2019, 2024):
+                f.write(f"{equipment_id},{'abcde'[code]},{year}-06\n")
+                code = min(code + int(rng.random() < 0.5), 4)
+            f.write(f"{equipment_id},e,2017-06\n")
+    return path
+
+
+def test_risk_transitions_calibrated_from_inspection_history():
+    """evaluate_riskは既定で読み込んだ点検履歴から遷移行列を推定し、同じseedの結果は再現可能"""
+    with tempfile.TemporaryDirectory() as directory:
+        equipment_csv = write_equipment_csv(directory)
+        scheduler = OptSeqSchedulerScalable(2025, 2040, max_equipment=1000)
+        scheduler.load_equipment_data(equipment_csv, os.path.join(directory, 'none.csv'), seed=0)
+        inspection_csv = write_inspection_history(directory, scheduler.fleet.equipment_ids)
+        
+        # 観測のみ（prior_weight=0）では1年間隔の組の頻度そのもの、2年間隔の組（e→）は数えない
+        matrix = calibrate_transition_matrix(inspection_csv, prior_weight=0.0)
+        assert np.allclose(matrix.sum(axis=1), 1.0)
+        for code in range(3):
+            assert 0.3 < matrix[code, code] < 0.7
+            assert np.isclose(matrix[code, code] + matrix[code, code + 1], 1.0)
+        assert matrix[4, 4] == 1.0
+        
+        scheduler.load_equipment_data(equipment_csv, inspection_csv, seed=0)
+        scheduler.add_resource(Resource('Budget', {year: 4e5 for year in scheduler.years}))
+        scheduler.solve_parallel('greedy_priority')
+        calibrated = scheduler.evaluate_risk(n_samples=200, seed=3)
+        pd.testing.assert_frame_equal(calibrated, scheduler.evaluate_risk(n_samples=200, seed=3))
+        pd.testing.assert_frame_equal(calibrated, scheduler.evaluate_risk(
+            n_samples=200, seed=3, transition_matrix=calibrate_transition_matrix(inspection_csv)))
+        
+        # 推定した行列は既定行列（平均15年滞留）より速く劣化する
+        default = scheduler.evaluate_risk(n_samples=200, seed=3, calibrate=False)
+        assert calibrated['expected_penalty'].iloc[0] > default['expected_penalty'].iloc[0]
+        assert not calibrated.equals(scheduler.evaluate_risk(n_samples=200, seed=4))
+
+
+def random_problem(rng: np.random.Generator, n_tasks: int = 40, n_years: int = 6) -> SchedulingProblem:
+    """整数の消費量・容量による小規模な問題（施工件数は全タスク共通、予算・重機は一部のタスクのみ消費）"""
+    earliest = rng.integers(0, n_years, n_tasks)
+    demand = np.vstack([
+        rng.integers(1, 10, n_tasks) * (rng.random(n_tasks) < 0.8),
+        np.ones(n_tasks),
+        rng.integers(1, 4, n_tasks) * (rng.random(n_tasks) < 0.3)
+    ]).astype(float)
+    return SchedulingProblem(
+        start_year=2025,
+        end_year=2025 + n_years - 1,
+        earliest_start=2025 + earliest,
+        latest_end=2025 + np.minimum(earliest + rng.integers(0, n_years, n_tasks), n_years - 1),
+        cost=rng.integers(1, 100, n_tasks).astype(float),
+        priority=rng.integers(1, 6, n_tasks),
+        penalty_coefficient=rng.random(n_tasks),
+        capacity=rng.integers([[5], [2], [1]], [[30], [8], [5]], (3, n_years)).astype(float),
+        demand=demand,
+        resource_names=['Budget', 'Crew', 'Machine']
+    )
+
+
+def naive_first_fit(problem: SchedulingProblem, order: np.ndarray) -> np.ndarray:
+    """全年度を先頭から走査して全資源が容量内に収まる最初の年度へ配置する参照実装"""
+    used = np.zeros_like(problem.capacity)
+    years = np.full(problem.n_tasks, -1, dtype=np.int64)
+    for t in order:
+        for i in range(problem.earliest_start[t] - problem.start_year, problem.latest_end[t] - problem.start_year + 1):
+            if np.all(used[:, i] + problem.demand[:, t] <= problem.capacity[:, i]):
+                used[:, i] += problem.demand[:, t]
+                years[t] = problem.start_year + i
+                break
+    return years
+
+
+def test_greedy_first_fit_matches_naive_first_fit():
+    """年度スロット索引による先着配置は容量を超えず、全年度を走査する参照実装と同じ年度に配置する"""
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        problem = random_problem(rng)
+        order = rng.permutation(problem.n_tasks)
+        years = greedy_first_fit(problem, order)
+        
+        assert np.all(problem.usage(years) <= problem.capacity)
+        np.testing.assert_array_equal(years, naive_first_fit(problem, order))
+
+
+def test_year_slot_index_finds_released_year():
+    """満杯で読み飛ばされた年度も、解放で容量が戻れば再び探索される"""
+    capacity = np.array([[10.0, 10.0, 10.0], [1.0, 1.0, 1.0]])
+    demand = np.array([[4.0, 6.0, 10.0, 10.0], [1.0, 1.0, 1.0, 1.0]])
+    index = YearSlotIndex(capacity, demand)
+    entries = YearSlotIndex.sparse_demand(demand)
+    for i, t in enumerate([0, 2, 3]):
+        index.reserve(i, entries[t])
+    assert index.first_fit(0, 2, entries[1]) == -1
+    
+    index.release(1, entries[2])
+    assert index.first_fit(0, 2, entries[1]) == 1
+    
+    # 予約・解放を無作為に繰り返しても、先頭から走査した最初の収まる年度と一致する
+    rng = np.random.default_rng(1)
+    problem = random_problem(rng, n_tasks=60, n_years=8)
+    index = YearSlotIndex(problem.capacity, problem.demand)
+    entries = YearSlotIndex.sparse_demand(problem.demand)
+    placed = {}
+    for _ in range(2000):
+        t = int(rng.integers(problem.n_tasks))
+        if t in placed:
+            index.release(placed.pop(t), entries[t])
+            continue
+        first, last = sorted(rng.integers(0, problem.n_years, 2).tolist())
+        used = index.used_matrix
+        expected = next((i for i in range(first, last + 1)
+                         if np.all(used[:, i] + problem.demand[:, t] <= problem.capacity[:, i])), -1)
+        assert index.first_fit(first, last, entries[t]) == expected
+        if expected >= 0:
+            index.reserve(expected, entries[t])
+            placed[t] = expected
+    assert np.all(index.used_matrix <= problem.capacity + 1e-9)
+
+
+if __name__ == "__main__":
+    failed = 0
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except Exception as e:
+                failed += 1
+                print(f"❌ {name}: {type(e).__name__}: {e}")
+    sys.exit(1 if failed else 0)